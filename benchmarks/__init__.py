@@ -0,0 +1 @@
+"""Performance benchmarks for the engine and report builders."""
@@ -0,0 +1,263 @@
+"""Benchmark workloads.
+
+Each case is a ``(name, params, setup)`` triple: ``setup(**params)`` prepares
+inputs outside the timed region and returns the zero-argument callable that
+is timed.  Cases call the engine directly, bypassing the result cache.
+"""
+import numpy as np
+import pandas as pd
+
+from engine.breakeven import breakeven_table
+from engine.comparison import comparison_table
+from engine.cumulative import payback_table
+from engine.depreciation import schedule_from_columns
+from engine.irr import irr_table
+from engine.loan import loan_principal
+from engine.montecarlo import simulate
+from engine.npv import calculate_npv, npv, npv_grid
+from engine.periodic import evaluate_periodic, per_period_rate
+from engine.portfolio import default_assets, optimize_portfolio
+from engine.report import excel_bytes
+from engine.scenario import compute_batch, compute_scenario, compute_scenarios, evaluate, to_columns
+from engine.scenario_file import load_scenarios
+from engine.sensitivity import axis_values, nal_surface, tornado
+
+HORIZONS = (5, 25, 100)
+BATCH_SIZES = (1, 1_000, 100_000)
+
+# The sidebar defaults in main.py
+SIDEBAR_PARAMS = {
+    "purchase_price": 100.0,
+    "useful_life": 7,
+    "residual_value": 15.0,
+    "maintenance": 2.0,
+    "lease_payment": 18.0,
+    "discount_rate": 12.0,
+    "tax_rate": 29.0,
+    "interest_rate": 0.0,
+    "maintenance_included": True,
+}
+
+
+def _stream(horizon):
+    rng = np.random.default_rng(horizon)
+    cf = rng.normal(10.0, 3.0, horizon + 1)
+    cf[0] = -100.0
+    return cf
+
+
+def _scenario_batch(size):
+    scenarios = load_scenarios()
+    params = [scenarios[name]["params"] for name in scenarios]
+    return [params[i % len(params)] for i in range(size)]
+
+
+def calculate_npv_case(horizon):
+    cf = _stream(horizon)
+    return lambda: calculate_npv(0.12, cf)
+
+
+def npv_batch_case(horizon, batch):
+    rng = np.random.default_rng(0)
+    rates = rng.uniform(0.05, 0.30, batch)
+    cf = rng.normal(10.0, 3.0, (batch, horizon + 1))
+    return lambda: npv(rates, cf)
+
+
+def irr_batch_case(horizon, batch):
+    result = compute_batch(_scenario_batch(batch))
+    buy, lease = result.buy_cash_flows[:, :horizon + 1], result.lease_cash_flows[:, :horizon + 1]
+    return lambda: irr_table(buy, lease, result.discount_rate)
+
+
+def sidebar_case(horizon):
+    params = dict(SIDEBAR_PARAMS, useful_life=horizon)
+    return lambda: compute_scenario(params)
+
+
+def scenario_case(scenario):
+    params = load_scenarios()[scenario]["params"]
+
+    def run():
+        result = compute_scenario(params)
+        rates = [params["discount_rate"] / 100 + step for step in (-0.05, -0.025, 0.0, 0.025, 0.05)]
+        npv_grid(rates, [result.buy_cash_flows, result.lease_cash_flows])
+        breakeven_table([params])
+
+    return run
+
+
+def all_scenarios_case():
+    scenarios = load_scenarios()
+    return lambda: compute_scenarios(scenarios)
+
+
+def scenario_comparison_case(scenarios):
+    # The library repeated up to ``scenarios`` entries, as if it had grown that large
+    entries = list(load_scenarios().items())
+    library = {f"{entries[i % len(entries)][0]} #{i}": entries[i % len(entries)][1] for i in range(scenarios)}
+    return lambda: comparison_table(library)
+
+
+def scenario_batch_case(batch):
+    params_list = _scenario_batch(batch)
+    return lambda: compute_batch(params_list)
+
+
+def financed_batch_case(batch, subsidized=False):
+    # Credit purchases mixing amortizing, balloon and grace-period loans
+    rng = np.random.default_rng(0)
+    columns = {key: np.repeat(value, batch) for key, value in to_columns([SIDEBAR_PARAMS]).items()}
+    columns["interest_rate"] = rng.uniform(8.0, 22.0, batch)
+    columns["down_payment"] = columns["purchase_price"] * rng.uniform(0.0, 0.3, batch)
+    columns["grace_period"] = rng.integers(0, 3, batch).astype(float)
+    columns["balloon"] = rng.choice([0.0, 30.0, 100.0], batch)
+    if subsidized:
+        # Half the deals borrow the whole (subsidized) price, with no down payment
+        columns["aedb_subsidy"] = columns["purchase_price"] * rng.uniform(0.1, 0.4, batch)
+        columns["down_payment"][rng.random(batch) < 0.5] = np.nan
+        net_price = columns["purchase_price"] - columns["aedb_subsidy"]
+        if (loan_principal(columns) > net_price).any():
+            raise AssertionError("subsidized deals must not borrow more than their net price")
+    return lambda: evaluate(columns)
+
+
+def depreciation_batch_case(batch):
+    # Every method, with and without a first-year allowance
+    rng = np.random.default_rng(0)
+    columns = to_columns(_scenario_batch(batch))
+    columns["depreciation_rate_declining"] = rng.choice([0.0, 15.0, 20.0, 30.0], batch)
+    columns["depreciation_switch_to_sl"] = rng.choice([0.0, 1.0], batch)
+    columns["initial_allowance"] = rng.choice([0.0, 25.0], batch)
+    return lambda: schedule_from_columns(columns)
+
+
+def breakeven_batch_case(batch):
+    params_list = _scenario_batch(batch)
+    return lambda: breakeven_table(params_list)
+
+
+def periodic_batch_case(years, batch, timing):
+    rng = np.random.default_rng(0)
+    columns = {key: np.repeat(value, batch) for key, value in to_columns([SIDEBAR_PARAMS]).items()}
+    columns["useful_life"] = np.full(batch, float(years))
+    columns["lease_payment"] = rng.uniform(10.0, 30.0, batch)
+    return lambda: evaluate_periodic(columns, 12, timing)
+
+
+def payback_monthly_case(years, batch):
+    rng = np.random.default_rng(0)
+    columns = {key: np.repeat(value, batch) for key, value in to_columns([SIDEBAR_PARAMS]).items()}
+    columns["useful_life"] = np.full(batch, float(years))
+    columns["lease_payment"] = rng.uniform(10.0, 30.0, batch)
+    result = evaluate_periodic(columns, 12)
+    buy, lease = result.buy_cash_flows, result.lease_cash_flows
+    rate = float(per_period_rate(SIDEBAR_PARAMS["discount_rate"], 12))
+    return lambda: payback_table(buy, lease, rate, 12)
+
+
+def portfolio_case(assets):
+    # Lease pricing raised so that buying wins often and both limits bind
+    params = dict(load_scenarios()["Multi-Asset Portfolio"]["params"], num_assets=assets)
+    params["lease_payment"] *= 2.4
+    register = default_assets(params)
+    total = params["purchase_price"]
+    return lambda: optimize_portfolio(register, 0.4 * total, 0.05 * total)
+
+
+def sensitivity_table_case(horizon):
+    params = dict(SIDEBAR_PARAMS, useful_life=horizon)
+    result = compute_scenario(params)
+    rates = [0.12 + step for step in (-0.05, -0.025, 0.0, 0.025, 0.05)]
+    return lambda: npv_grid(rates, [result.buy_cash_flows, result.lease_cash_flows])
+
+
+def sensitivity_surface_case(grid, x_param, y_param):
+    params = load_scenarios()["Production Line Equipment"]["params"]
+    x_values = axis_values(params, x_param, size=grid)
+    y_values = axis_values(params, y_param, size=grid)
+    return lambda: nal_surface(params, x_param, x_values, y_param, y_values)
+
+
+def tornado_case(scenario):
+    params = load_scenarios()[scenario]["params"]
+    return lambda: tornado(params, 0.1)
+
+
+def monte_carlo_case(paths):
+    params = load_scenarios()["Production Line Equipment"]["params"]
+    return lambda: simulate(params, paths, seed=0)
+
+
+def scenario_report_case(horizon):
+    params = dict(SIDEBAR_PARAMS, useful_life=horizon)
+    result = compute_scenario(params)
+    report = pd.DataFrame([{"Scenario": "Benchmark", "NPV (Buy)": result.npv_buy,
+                            "NPV (Lease)": result.npv_lease, "NAL": result.nal}])
+    sensitivity = pd.DataFrame({"Discount Rate": ["7.0%", "9.5%", "12.0%", "14.5%", "17.0%"],
+                                "NAL": np.zeros(5)})
+    cash_flows = pd.DataFrame({
+        "Year": range(horizon + 1),
+        "Buy": result.buy_cash_flows,
+        "Lease": result.lease_cash_flows,
+    }).set_index("Year")
+    sheets = (("Scenario Analysis", report, False), ("Sensitivity Analysis", sensitivity, False),
+              ("Cash Flows", cash_flows, True))
+    return lambda: excel_bytes(sheets)
+
+
+def final_report_case():
+    report = pd.DataFrame({
+        "Metric": ["Total Assets", "Total Liabilities", "Total Debt", "Equity", "EBIT", "Net Profit"] * 2,
+        "Value": np.linspace(1000.0, 160000.0, 12),
+        "Section": ["Historical Financials"] * 6 + ["Financial Impact"] * 6,
+    })
+    return lambda: excel_bytes((("Lease vs Buy Report", report, False),))
+
+
+def all_cases():
+    """Every benchmark case as ``(name, params, setup)``."""
+    cases = []
+    for horizon in HORIZONS:
+        cases.append(("calculate_npv", {"horizon": horizon}, calculate_npv_case))
+    for horizon in (10, 30):
+        for batch in BATCH_SIZES:
+            cases.append(("npv_batch", {"horizon": horizon, "batch": batch}, npv_batch_case))
+    for batch in BATCH_SIZES:
+        cases.append(("irr_batch", {"horizon": 10, "batch": batch}, irr_batch_case))
+    for horizon in HORIZONS:
+        cases.append(("sidebar_model", {"horizon": horizon}, sidebar_case))
+    for scenario in load_scenarios():
+        cases.append(("scenario_pipeline", {"scenario": scenario}, scenario_case))
+    cases.append(("all_scenarios", {}, all_scenarios_case))
+    for scenarios in (25, 500, 5_000):
+        cases.append(("scenario_comparison", {"scenarios": scenarios}, scenario_comparison_case))
+    for batch in BATCH_SIZES:
+        cases.append(("scenario_batch", {"batch": batch}, scenario_batch_case))
+        cases.append(("financed_batch", {"batch": batch}, financed_batch_case))
+        cases.append(("financed_batch", {"batch": batch, "subsidized": True}, financed_batch_case))
+        cases.append(("depreciation_batch", {"batch": batch}, depreciation_batch_case))
+        cases.append(("breakeven_batch", {"batch": batch}, breakeven_batch_case))
+    for batch in BATCH_SIZES:
+        for timing in ("arrears", "advance"):
+            cases.append(("periodic_monthly", {"years": 20, "batch": batch, "timing": timing},
+                          periodic_batch_case))
+    for batch in (1, 1_000, 10_000):
+        cases.append(("payback_monthly", {"years": 50, "batch": batch}, payback_monthly_case))
+    for assets in (15, 1_000, 5_000):
+        cases.append(("portfolio_optimizer", {"assets": assets}, portfolio_case))
+    for horizon in HORIZONS:
+        cases.append(("sensitivity_table", {"horizon": horizon}, sensitivity_table_case))
+    for grid in (50, 200):
+        cases.append(("sensitivity_surface", {"grid": grid, "x_param": "discount_rate",
+                                              "y_param": "lease_payment"}, sensitivity_surface_case))
+        cases.append(("sensitivity_surface", {"grid": grid, "x_param": "tax_rate",
+                                              "y_param": "residual_value"}, sensitivity_surface_case))
+    for scenario in ("Production Line Equipment", "Strategic Flexibility"):
+        cases.append(("tornado", {"scenario": scenario}, tornado_case))
+    for paths in (10_000, 100_000):
+        cases.append(("monte_carlo", {"paths": paths}, monte_carlo_case))
+    for horizon in HORIZONS:
+        cases.append(("excel_scenario_report", {"horizon": horizon}, scenario_report_case))
+    cases.append(("excel_final_report", {}, final_report_case))
+    return cases
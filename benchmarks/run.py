@@ -0,0 +1,142 @@
+"""Run the benchmark suite and gate on regressions.
+
+Results are written as JSON: one record per case with the per-call median and
+minimum over several repeats.  Passing ``--compare`` a previous results file
+fails the run (exit status 1) when any case is slower than the baseline by
+more than ``--threshold``.  The gate compares the minimum, the timing least
+disturbed by other load on the machine.
+
+Usage::
+
+    python -m benchmarks.run --output baseline.json
+    python -m benchmarks.run --compare baseline.json --threshold 1.5
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.cases import all_cases
+
+# Differences below this many seconds per call are treated as timer noise
+NOISE_FLOOR = 5e-6
+
+
+def time_call(func, repeat=5, min_time=0.05):
+    """``(median, min, loops)`` seconds per call of ``func``."""
+    func()  # warm caches and imports outside the timed region
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops *= 10 if elapsed < min_time / 10 else 2
+    samples = [elapsed / loops]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        samples.append((time.perf_counter() - start) / loops)
+    return statistics.median(samples), min(samples), loops
+
+
+def case_id(name, params):
+    if not params:
+        return name
+    return name + "[" + ",".join(f"{key}={value}" for key, value in params.items()) + "]"
+
+
+def run(select=None, repeat=5, min_time=0.05, progress=None):
+    results = []
+    for name, params, setup in all_cases():
+        cid = case_id(name, params)
+        if select and not any(pattern in cid for pattern in select):
+            continue
+        median, fastest, loops = time_call(setup(**params), repeat, min_time)
+        results.append({"id": cid, "name": name, "params": params,
+                        "median_s": median, "min_s": fastest, "loops": loops, "repeat": repeat})
+        if progress:
+            progress(results[-1])
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, threshold=1.5):
+    """Cases whose fastest call is ``threshold`` times slower than the baseline's."""
+    base = {record["id"]: record for record in baseline["results"]}
+    regressions = []
+    for record in results["results"]:
+        previous = base.get(record["id"])
+        if previous is None:
+            continue
+        ratio = record["min_s"] / previous["min_s"]
+        if ratio > threshold and record["min_s"] - previous["min_s"] > NOISE_FLOOR:
+            regressions.append({"id": record["id"], "baseline_s": previous["min_s"],
+                                "current_s": record["min_s"], "ratio": ratio})
+    return regressions
+
+
+def _format_seconds(seconds):
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the lease vs buy benchmark suite.")
+    parser.add_argument("-k", dest="select", action="append",
+                        help="only run cases whose id contains this text (repeatable)")
+    parser.add_argument("--output", help="write results JSON here (default: stdout)")
+    parser.add_argument("--compare", help="baseline results JSON to gate against")
+    parser.add_argument("--threshold", type=float, default=1.5,
+                        help="allowed slowdown ratio versus the baseline (default: 1.5)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="minimum seconds per timed sample (default: 0.05)")
+    args = parser.parse_args(argv)
+
+    progress = lambda r: print(f"{r['id']:<76} {_format_seconds(r['median_s']):>10}", file=sys.stderr)
+    results = run(args.select, args.repeat, args.min_time, progress)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        results["comparison"] = {"baseline": args.compare, "threshold": args.threshold,
+                                 "regressions": regressions}
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.compare and results["comparison"]["regressions"]:
+        for r in results["comparison"]["regressions"]:
+            print(f"REGRESSION {r['id']}: {_format_seconds(r['baseline_s'])} -> "
+                  f"{_format_seconds(r['current_s'])} ({r['ratio']:.2f}x)", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,16 @@
+"""Streamlit-free compute engine for the lease vs buy decision tool."""
+import hashlib
+from pathlib import Path
+
+
+def _sources_digest():
+    digest = hashlib.sha256()
+    for path in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+# A hash of the engine's sources: persisted results (engine.store) are keyed
+# by it, so any change to the engine stops older results from being served
+ENGINE_VERSION = _sources_digest()
@@ -0,0 +1,428 @@
+"""Local HTTP/JSON API in front of the engine.
+
+A small HTTP/1.1 server on ``asyncio`` (standard library only, keep-alive
+connections) for systems that need lease vs buy numbers without the
+Streamlit page.  Deal params use the ``SCENARIOS`` names, and a deal may name
+a predefined ``"scenario"`` whose params the rest of the object overrides.
+
+Endpoints:
+
+* ``GET /health``: liveness;
+* ``GET /scenarios``: names of the predefined scenarios;
+* ``POST /deal``: one deal's NPVs, NAL, IRRs, paybacks and cash flows;
+* ``POST /sensitivity``: NAL surface over two params and its break-even line;
+* ``POST /batch``: a JSON list (or ``{"deals": [...]}``) or NDJSON body of
+  deals, answered as NDJSON with one line per deal, in input order, with the
+  same columns as ``engine.batch``.  ``?id=<field>`` copies a field to the
+  output.
+
+Single deals run on the event loop (they take about a millisecond and are
+memoized in ``RESULT_CACHE``).  Surfaces and batches go to a process pool;
+a batch is cut into chunks that are parsed, evaluated and serialized in the
+workers (a large JSON body is parsed and cut in a worker too), at most
+``2 * workers`` at a time, and each chunk is streamed with
+chunked transfer encoding as soon as it and those before it are done.
+
+Usage::
+
+    python -m engine.api --port 8000 --workers 4
+    curl -s localhost:8000/deal -d '{"scenario": "Solar Power System"}'
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+import pandas as pd
+
+from engine.batch import RESULT_COLUMNS, evaluate_columns, evaluate_frame
+from engine.cache import RESULT_CACHE, memoize
+from engine.scenario import OPTIONAL_PARAMS, REQUIRED_PARAMS, compute_scenario, to_columns
+from engine.scenario_file import load_scenarios
+from engine.sensitivity import SURFACE_PARAMS, axis_values, nal_surface, zero_contour
+
+DEFAULT_PORT = 8000
+BATCH_CHUNK_SIZE = 5_000
+INLINE_ROWS = 256  # smaller batches skip the pool
+INLINE_BODY = 64 * 1024  # smaller JSON batch bodies are parsed on the event loop
+MAX_SURFACE_SIZE = 400
+MAX_BODY = 256 * 1024 * 1024
+MAX_HEADERS = 100
+
+STATUS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+    def __reduce__(self):  # raised in the workers too
+        return HttpError, (self.status, str(self))
+
+
+def _finite(value):
+    # JSON has no NaN; absent metrics (e.g. no IRR) are null
+    value = float(value)
+    return value if np.isfinite(value) else None
+
+
+def _json(obj):
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def _deal_params(body):
+    """Params of a deal object, starting from its ``scenario`` when it names one."""
+    if not isinstance(body, dict):
+        raise HttpError(400, "a deal must be a JSON object")
+    params = dict(body)
+    name = params.pop("scenario", None)
+    if name is not None:
+        scenarios = load_scenarios()
+        if name not in scenarios:
+            raise HttpError(404, f"unknown scenario '{name}'")
+        params = {**scenarios[name]["params"], **params}
+    for key in REQUIRED_PARAMS:
+        value = params.get(key)
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not math.isfinite(value):
+            raise HttpError(400, f"'{key}' must be a number")
+    # to_columns drops values that are not numbers, which would quietly turn the feature off
+    for key in OPTIONAL_PARAMS:
+        value = params.get(key, 0)
+        if not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise HttpError(400, f"'{key}' must be a number")
+    if params["useful_life"] != int(params["useful_life"]) or params["useful_life"] < 1:
+        raise HttpError(400, "'useful_life' must be a whole number of years >= 1")
+    return params
+
+
+@memoize(RESULT_CACHE, "api_deal")
+def deal_response(params):
+    """Encoded ``/deal`` response for one deal's params."""
+    metrics = evaluate_columns(to_columns([params]))
+    result = compute_scenario(params)
+    out = {name: (_finite(values[0]) if values.dtype.kind == "f" else str(values[0]))
+           for name, values in metrics.items() if name != "error"}
+    out["buy_cash_flows"] = result.buy_cash_flows.tolist()
+    out["lease_cash_flows"] = result.lease_cash_flows.tolist()
+    out["initial_outlay"] = result.initial_outlay
+    out["financed_amount"] = result.financed_amount
+    return _json(out)
+
+
+def sensitivity_response(params, x_param, y_param, spread, size):
+    """Encoded ``/sensitivity`` response: the NAL grid (rows follow ``y``) and the NAL = 0 line."""
+    x_values = axis_values(params, x_param, spread, size)
+    y_values = axis_values(params, y_param, spread, size)
+    nal = nal_surface(params, x_param, x_values, y_param, y_values)
+    x_zero, y_zero = zero_contour(x_values, y_values, nal)
+    return _json({
+        "x_param": x_param,
+        "y_param": y_param,
+        "x": x_values.tolist(),
+        "y": y_values.tolist(),
+        "nal": nal.tolist(),
+        "break_even": {"x": x_zero.tolist(), "y": y_zero.tolist()},
+    })
+
+
+def batch_chunk(first_row, deals, id_column=None):
+    """NDJSON lines for a chunk of deals: dicts, or raw NDJSON ``bytes``.
+
+    Runs in the worker processes.  Lines that are not JSON objects, that give
+    an optional param a value that is not a number, or that ``row_errors``
+    rejects (a missing required param, a ``useful_life`` that is not a whole
+    number of years >= 1, a ``loan_term`` under one year, loan terms without
+    an ``interest_rate``), come back with an ``error``; the response is already streaming, so nothing here may fail
+    the chunk.
+    """
+    if isinstance(deals, bytes):
+        rows = []
+        for line in deals.splitlines():
+            try:
+                rows.append(json.loads(line))
+            except ValueError:
+                rows.append(None)
+        deals = rows
+    objects = [deal if isinstance(deal, dict) else {} for deal in deals]
+    frame = pd.DataFrame(objects, index=range(len(objects)))
+    for key in REQUIRED_PARAMS:
+        frame[key] = pd.to_numeric(frame[key], errors="coerce") if key in frame else np.nan
+    # Optional params must be numeric too: one that is not would quietly turn its feature off
+    not_numeric = pd.Series("", index=frame.index)
+    for key in OPTIONAL_PARAMS:
+        if key in frame:
+            values = pd.to_numeric(frame[key], errors="coerce")
+            bad = frame[key].notna() & ~np.isfinite(values.to_numpy(dtype=float, na_value=np.nan))
+            not_numeric[bad & (not_numeric == "")] = f"'{key}' must be a number"
+            frame[key] = values
+    if id_column is not None:
+        # Ids go out as given: an int id stays an int even when a row lacks it
+        ids = np.empty(len(objects), dtype=object)
+        ids[:] = [deal.get(id_column) for deal in objects]
+        frame[id_column] = ids
+    try:
+        out = evaluate_frame(first_row, frame, id_column)
+    except Exception as exc:  # a bug: report it on every row rather than cut the stream short
+        out = pd.DataFrame({
+            "row": np.arange(first_row, first_row + len(frame)),
+            **({} if id_column is None else {id_column: ids}),
+            **{name: np.nan for name in RESULT_COLUMNS},
+            "recommendation": "",
+            "error": f"{type(exc).__name__}: {exc}",
+        })
+    if id_column is not None:
+        out[id_column] = ids
+    rejected = (not_numeric != "").to_numpy()
+    if rejected.any():
+        out.loc[rejected, list(RESULT_COLUMNS)] = np.nan
+        out.loc[rejected, "recommendation"] = ""
+        out.loc[rejected, "error"] = not_numeric[rejected].to_numpy()
+    bad = np.array([not isinstance(deal, dict) for deal in deals], dtype=bool)
+    if bad.any():
+        out.loc[bad, "error"] = "not a JSON object"
+    return (out.to_json(orient="records", lines=True).rstrip("\n") + "\n").encode("utf-8")
+
+
+def split_deals(body, chunk_size):
+    """Chunks of a JSON batch body (a list of deals or ``{"deals": [...]}``) and the deal count."""
+    deals = _parse(body)
+    if isinstance(deals, dict):
+        deals = deals.get("deals")
+    if not isinstance(deals, list):
+        raise HttpError(400, "expected a JSON list of deals or {\"deals\": [...]}")
+    chunks = [deals[i:i + chunk_size] for i in range(0, len(deals), chunk_size)]
+    return chunks, len(deals)
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "malformed request line") from None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(400, "too many headers")
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if "chunked" in headers.get("transfer-encoding", "").lower():
+        parts, size = [], 0
+        while True:
+            chunk = int((await reader.readline()).split(b";")[0], 16)
+            if chunk == 0:
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            size += chunk
+            if size > MAX_BODY:
+                raise HttpError(413, "request body too large")
+            parts.append(await reader.readexactly(chunk))
+            await reader.readexactly(2)
+        body = b"".join(parts)
+    else:
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise HttpError(413, "request body too large")
+        body = await reader.readexactly(length) if length else b""
+
+    keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+    return method.upper(), target, headers, body, keep_alive
+
+
+class ApiServer:
+    """Routes requests to the engine; ``workers`` processes take the heavy ones."""
+
+    def __init__(self, workers=None, chunk_size=BATCH_CHUNK_SIZE):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.pool = None
+
+    async def serve(self, host="127.0.0.1", port=DEFAULT_PORT, ready=None):
+        with ProcessPoolExecutor(max_workers=self.workers) as self.pool:
+            server = await asyncio.start_server(self.handle, host, port)
+            async with server:
+                if ready is not None:
+                    ready(server)
+                await server.serve_forever()
+
+    async def _offload(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except HttpError as exc:
+                    # The stream can't be trusted past a malformed request
+                    await self._respond(writer, exc.status, _json({"error": str(exc)}), keep_alive=False)
+                    break
+                except (ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    await self._respond(writer, 400, _json({"error": "malformed request"}), keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+                try:
+                    await self.dispatch(method, target, headers, body, writer, keep_alive)
+                except HttpError as exc:
+                    await self._respond(writer, exc.status, _json({"error": str(exc)}), keep_alive=keep_alive)
+                except ValueError as exc:  # the engine rejected the inputs
+                    await self._respond(writer, 400, _json({"error": str(exc)}), keep_alive=keep_alive)
+                except KeyError as exc:
+                    await self._respond(writer, 400, _json({"error": f"missing or invalid param {exc}"}),
+                                        keep_alive=keep_alive)
+                except ConnectionError:
+                    break
+                except Exception as exc:  # a bug must not take the server down
+                    await self._respond(writer, 500, _json({"error": f"{type(exc).__name__}: {exc}"}),
+                                        keep_alive=False)
+                    break
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, body, content_type="application/json", keep_alive=True):
+        head = (f"HTTP/1.1 {status} {STATUS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def dispatch(self, method, target, headers, body, writer, keep_alive):
+        url = urlsplit(target)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        routes = {
+            "/health": ("GET", self.health),
+            "/scenarios": ("GET", self.scenarios),
+            "/deal": ("POST", self.deal),
+            "/sensitivity": ("POST", self.sensitivity),
+        }
+        if url.path == "/batch":
+            if method != "POST":
+                raise HttpError(405, "use POST")
+            await self.batch(headers, body, query, writer, keep_alive)
+            return
+        if url.path not in routes:
+            raise HttpError(404, f"no endpoint {url.path}")
+        expected, handler = routes[url.path]
+        if method != expected:
+            raise HttpError(405, f"use {expected}")
+        await self._respond(writer, 200, await handler(body), keep_alive=keep_alive)
+
+    async def health(self, body):
+        return _json({"status": "ok", "workers": self.workers})
+
+    async def scenarios(self, body):
+        return _json(list(load_scenarios()))
+
+    async def deal(self, body):
+        return deal_response(_deal_params(_parse(body)))
+
+    async def sensitivity(self, body):
+        request = _parse(body)
+        if not isinstance(request, dict):
+            raise HttpError(400, "expected a JSON object")
+        params = _deal_params(request.get("params", {}))
+        x_param = request.get("x_param", "discount_rate")
+        y_param = request.get("y_param", "lease_payment")
+        size = int(request.get("size", 50))
+        if not 2 <= size <= MAX_SURFACE_SIZE:
+            raise HttpError(400, f"'size' must be between 2 and {MAX_SURFACE_SIZE}")
+        for name in (x_param, y_param):
+            if name not in SURFACE_PARAMS or not isinstance(params.get(name, 0), (int, float)):
+                raise HttpError(400, f"cannot vary '{name}'; choose from {', '.join(SURFACE_PARAMS)}")
+        if x_param == y_param:
+            raise HttpError(400, "choose two different params")
+        params = {**params, x_param: params.get(x_param, 0.0), y_param: params.get(y_param, 0.0)}
+        return await self._offload(sensitivity_response, params, x_param, y_param,
+                                   float(request.get("spread", 0.5)), size)
+
+    async def batch(self, headers, body, query, writer, keep_alive):
+        id_column = query.get("id")
+        if "ndjson" in headers.get("content-type", "") or "jsonlines" in headers.get("content-type", ""):
+            lines = [line for line in body.splitlines() if line.strip()]
+            chunks = [b"\n".join(lines[i:i + self.chunk_size]) for i in range(0, len(lines), self.chunk_size)]
+            rows = len(lines)
+        elif len(body) <= INLINE_BODY:
+            chunks, rows = split_deals(body, self.chunk_size)
+        else:
+            # Parsing a large body takes a while: keep it off the event loop
+            chunks, rows = await self._offload(split_deals, body, self.chunk_size)
+
+        writer.write((f"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                      f"Transfer-Encoding: chunked\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                      "\r\n\r\n").encode("latin-1"))
+        try:
+            if rows <= INLINE_ROWS:
+                for i, chunk in enumerate(chunks):
+                    await _write_chunk(writer, batch_chunk(i * self.chunk_size, chunk, id_column))
+            else:
+                # Stream in input order while keeping the pool busy
+                loop = asyncio.get_running_loop()
+                pending = []
+                for i, chunk in enumerate(chunks):
+                    pending.append(loop.run_in_executor(self.pool, batch_chunk, i * self.chunk_size,
+                                                        chunk, id_column))
+                    if len(pending) >= 2 * self.workers:
+                        await _write_chunk(writer, await pending.pop(0))
+                for future in pending:
+                    await _write_chunk(writer, await future)
+        except Exception:
+            # The status line is already out, so a failure can only cut the stream short
+            writer.transport.abort()
+            raise ConnectionError("batch aborted") from None
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+
+def _parse(body):
+    try:
+        return json.loads(body or b"{}")
+    except ValueError as exc:
+        raise HttpError(400, f"invalid JSON: {exc}") from None
+
+
+async def _write_chunk(writer, data):
+    if data:
+        writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the lease vs buy engine over HTTP/JSON.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE, help="deals per batch chunk")
+    args = parser.parse_args(argv)
+
+    server = ApiServer(args.workers, args.chunk_size)
+    ready = lambda s: print(f"Serving on http://{args.host}:{args.port} ({server.workers} workers)",
+                            file=sys.stderr)
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""Headless batch evaluation of deal files.
+
+Reads a CSV or Parquet file whose columns use the same names as the
+``SCENARIOS`` params (``purchase_price``, ``useful_life``, ... plus any of the
+optional scenario fields), evaluates it chunk by chunk on a process pool and
+streams the results to disk as chunks complete.  At most ``2 * workers``
+chunks are in flight, so memory stays flat however long the input is.
+
+Usage::
+
+    python -m engine.batch deals.csv results.csv --workers 8 --chunk-size 50000
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from engine.cumulative import payback_table
+from engine.irr import irr_table
+from engine.scenario import columns_from_frame, evaluate, row_errors
+
+DEFAULT_CHUNK_SIZE = 50_000
+
+IRR_COLUMNS = ("irr_buy", "irr_lease", "irr_incremental", "mirr_buy", "mirr_incremental")
+PAYBACK_COLUMNS = ("payback_buy", "discounted_payback_buy", "crossover_year")
+RESULT_COLUMNS = ("npv_buy", "npv_lease", "nal", "net_purchase_price", "terminal_value") + IRR_COLUMNS + PAYBACK_COLUMNS
+
+
+def _is_parquet(path):
+    return str(path).lower().endswith((".parquet", ".pq"))
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet input/output requires pyarrow (pip install pyarrow)") from None
+    return pq
+
+
+def read_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield ``(first_row, DataFrame)`` chunks without loading the whole file."""
+    if _is_parquet(path):
+        pq = _require_pyarrow()
+        batches = (b.to_pandas() for b in pq.ParquetFile(path).iter_batches(batch_size=chunk_size))
+    else:
+        batches = pd.read_csv(path, chunksize=chunk_size)
+    first_row = 0
+    for frame in batches:
+        yield first_row, frame
+        first_row += len(frame)
+
+
+def evaluate_columns(columns, valid=None):
+    """Metric arrays (plus ``recommendation`` and ``error``) for a batch of deal columns.
+
+    Rows where ``valid`` is False, or that ``row_errors`` rejects, come back
+    as NaN with an error message.
+    """
+    errors = row_errors(columns)
+    n = len(errors)
+    valid = errors == "" if valid is None else valid & (errors == "")
+    metrics = {name: np.full(n, np.nan) for name in RESULT_COLUMNS}
+    if valid.any():
+        result = evaluate({key: values[valid] for key, values in columns.items()})
+        for name in metrics:
+            if name not in IRR_COLUMNS + PAYBACK_COLUMNS:
+                metrics[name][valid] = getattr(result, name)
+        irrs = irr_table(result.buy_cash_flows, result.lease_cash_flows, result.discount_rate,
+                         periods=result.useful_life + 1)
+        for name in IRR_COLUMNS:
+            metrics[name][valid] = irrs[name]
+        paybacks = payback_table(result.buy_cash_flows, result.lease_cash_flows, result.discount_rate)
+        for name in PAYBACK_COLUMNS:
+            metrics[name][valid] = paybacks[name]
+    metrics["recommendation"] = np.where(valid, np.where(metrics["nal"] > 0, "Lease", "Buy"), "")
+    metrics["error"] = np.where(valid, "", np.where(errors == "", "invalid row", errors))
+    return metrics
+
+
+def evaluate_frame(first_row, frame, id_column=None):
+    """Evaluate one chunk of deal rows; invalid rows come back as NaN with an ``error``."""
+    columns, valid = columns_from_frame(frame)
+    out = {"row": np.arange(first_row, first_row + len(frame))}
+    if id_column is not None:
+        out[id_column] = frame[id_column].to_numpy()
+    out.update(evaluate_columns(columns, valid))
+    # One construction, not a column insert per metric
+    return pd.DataFrame(out)
+
+
+class _Writer:
+    def __init__(self, path):
+        self.path = path
+        self._parquet = None
+        self._header = True
+        if not _is_parquet(path) and os.path.exists(path):
+            os.remove(path)
+
+    def write(self, frame):
+        if _is_parquet(self.path):
+            import pyarrow as pa
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet is None:
+                self._parquet = _require_pyarrow().ParquetWriter(self.path, table.schema)
+            self._parquet.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a", header=self._header, index=False)
+            self._header = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def run_batch(input_path, output_path, workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+              id_column=None, progress=None):
+    """Evaluate every row of ``input_path`` into ``output_path``; returns the row count.
+
+    Chunks are written in completion order; the ``row`` column gives each
+    result's position in the input.  ``workers=1`` evaluates in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = _Writer(output_path)
+    rows = 0
+    try:
+        chunks = read_chunks(input_path, chunk_size)
+        if workers == 1:
+            for first_row, frame in chunks:
+                out = evaluate_frame(first_row, frame, id_column)
+                writer.write(out)
+                rows += len(out)
+                if progress:
+                    progress(rows)
+            return rows
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < 2 * workers:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                    else:
+                        pending.add(pool.submit(evaluate_frame, *chunk, id_column))
+                if not pending:
+                    break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    out = future.result()
+                    writer.write(out)
+                    rows += len(out)
+                    if progress:
+                        progress(rows)
+    finally:
+        writer.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a file of lease vs buy deals.")
+    parser.add_argument("input", help="CSV or Parquet file of deal params")
+    parser.add_argument("output", help="CSV or Parquet file to write results to")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--id-column", default=None, help="input column copied to the output")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rows = run_batch(args.input, args.output, args.workers, args.chunk_size, args.id_column)
+    elapsed = time.perf_counter() - start
+    print(f"{rows:,} deals in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} deals/s)",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
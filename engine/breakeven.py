@@ -0,0 +1,87 @@
+"""Break-even solver: the parameter value at which NAL is zero.
+
+The lease payment and residual value enter the cash flows linearly, so NAL is
+affine in them and the break-even comes from two batched evaluations.  Rows
+whose NAL turns out not to be affine (a check at the current value catches
+this) and the discount rate, which is not linear, fall back to a bracketed
+vectorized Brent search.  All rows are solved together.
+"""
+import numpy as np
+
+from engine.npv import npv, npv_grid
+from engine.roots import brentq, first_sign_change
+from engine.scenario import build_cash_flows, evaluate, to_columns
+
+SOLVABLE = ("lease_payment", "residual_value", "discount_rate")
+
+# Discount rates (percent) scanned to bracket the break-even rate
+RATE_GRID = np.concatenate([np.arange(-50.0, 100.0, 0.5), [100.0, 150.0, 200.0, 300.0, 500.0]])
+
+
+def _replace(columns, key, values):
+    n = len(values) // len(columns["purchase_price"])
+    out = {k: np.tile(v, n) for k, v in columns.items()}
+    out[key] = values
+    return out
+
+
+def _nal_at(columns, key, values):
+    """NAL with ``key`` set to ``values`` (stacked copies of the batch)."""
+    return evaluate(_replace(columns, key, values)).nal
+
+
+def _solve_linear(columns, key):
+    n = len(columns["purchase_price"])
+    current = columns[key]
+    nal = _nal_at(columns, key, np.concatenate([np.zeros(n), np.ones(n), current]))
+    at_zero, at_one, at_current = nal[:n], nal[n:2 * n], nal[2 * n:]
+    slope = at_one - at_zero
+    with np.errstate(divide="ignore", invalid="ignore"):
+        solution = np.where(slope != 0, -at_zero / slope, np.nan)
+    affine = np.abs(at_zero + slope * current - at_current) <= 1e-7 * (1 + np.abs(at_current))
+    return solution, affine
+
+
+def _solve_bracketed(columns, key, rows):
+    sub = {k: v[rows] for k, v in columns.items()}
+    scale = np.maximum(np.abs(sub[key]), sub["purchase_price"])
+    grid = np.linspace(0.0, 10.0, 81)
+    m = len(rows)
+    nal = _nal_at(sub, key, (grid[:, None] * scale[None, :]).ravel()).reshape(len(grid), m)
+    lo, hi = first_sign_change(grid, nal, near=sub[key] / scale)
+    return brentq(lambda x: _nal_at(sub, key, x * scale), lo, hi) * scale
+
+
+def _solve_rate(columns):
+    buy, lease, _ = build_cash_flows(columns)
+    diff = buy - lease
+    residuals = npv_grid(RATE_GRID / 100, diff)
+    lo, hi = first_sign_change(RATE_GRID / 100, residuals, near=columns["discount_rate"] / 100)
+    return brentq(lambda r: npv(r, diff), lo, hi) * 100
+
+
+def solve_breakeven(params_list, target):
+    """Break-even value of ``target`` for every params dict (NaN if none found).
+
+    ``target`` is one of ``SOLVABLE``; discount rates are returned in percent
+    like the params themselves.
+    """
+    return solve_breakeven_columns(to_columns(list(params_list)), target)
+
+
+def solve_breakeven_columns(columns, target):
+    if target not in SOLVABLE:
+        raise ValueError(f"Cannot solve for '{target}'; choose from {', '.join(SOLVABLE)}")
+    if target == "discount_rate":
+        return _solve_rate(columns)
+    solution, affine = _solve_linear(columns, target)
+    if not affine.all():
+        rows = np.flatnonzero(~affine)
+        solution[rows] = _solve_bracketed(columns, target, rows)
+    return solution
+
+
+def breakeven_table(params_list):
+    """All three break-evens for every params dict, as ``{target: array}``."""
+    columns = to_columns(list(params_list))
+    return {target: solve_breakeven_columns(columns, target) for target in SOLVABLE}
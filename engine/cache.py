@@ -0,0 +1,194 @@
+"""Process-wide memoization for engine results.
+
+Streamlit reruns the whole script on every widget change, but imported modules
+persist for the life of the server process, so a cache held here is shared by
+every session.  Keys are a SHA-256 of a canonical JSON encoding of the inputs:
+dict ordering, int/float spelling and numpy scalar types do not change the key.
+Cached values are shared between sessions and must be treated as read-only.
+
+``memoize`` also keys on a hash of the source file that defines the function
+(``main.py`` for the app's helpers), so editing it never serves results from
+the old code; the engine's own sources version the persistent store.
+
+A cache may sit in front of a persistent ``ResultStore`` (``engine.store``):
+memory misses are looked up there before computing, new results are written
+through, and the store outlives the process and is shared with every other
+process on the host.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+from engine.store import open_store
+
+_MISSING = object()
+
+
+def _canonical(obj):
+    if isinstance(obj, (bool, np.bool_)):
+        return bool(obj)
+    if isinstance(obj, (int, float, np.integer, np.floating)):
+        return float(obj)
+    if isinstance(obj, Mapping):
+        return {str(k): _canonical(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return {"ndarray": hashlib.sha256(np.ascontiguousarray(obj, dtype=float).tobytes()).hexdigest(),
+                "shape": list(obj.shape)}
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        frame = obj.to_frame() if isinstance(obj, pd.Series) else obj
+        digest = hashlib.sha256(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+        return {"frame": digest.hexdigest(), "columns": [str(c) for c in frame.columns]}
+    if obj is None or isinstance(obj, str):
+        return obj
+    raise TypeError(f"Cannot build a cache key from {type(obj).__name__}")
+
+
+def canonical_key(*parts):
+    """Stable hash of arbitrarily nested inputs."""
+    payload = json.dumps(_canonical(list(parts)), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Size-bounded LRU cache with an optional time-to-live per entry."""
+
+    def __init__(self, maxsize=256, ttl=None, clock=time.monotonic, store=None):
+        self.maxsize = maxsize
+        self.store = store
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.store_hits = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING, count=False) is not _MISSING
+
+    def get(self, key, default=None, count=True):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and self.ttl is not None and self._clock() - entry[0] > self.ttl:
+                del self._data[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._data.move_to_end(key)
+                if count:
+                    self.hits += 1
+                return entry[1]
+        # Outside the lock: the store may be another process's to wait on
+        value = _MISSING if self.store is None else self.store.get(key, _MISSING)
+        if value is _MISSING:
+            if count:
+                self.misses += 1
+            return default
+        self.set(key, value, persist=False)
+        if count:
+            self.hits += 1
+            self.store_hits += 1
+        return value
+
+    def set(self, key, value, persist=True):
+        with self._lock:
+            self._data[key] = (self._clock(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+        if persist and self.store is not None:
+            self.store.set(key, value)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def values(self):
+        """Snapshot of the cached values (not counted as lookups)."""
+        with self._lock:
+            return [entry[1] for entry in self._data.values()]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "store_hits": self.store_hits,
+            "store": self.store.stats() if self.store is not None else None,
+        }
+
+
+# Shared by every Streamlit session in this process, and through the store
+# with every other process on the host; a new process starts warm
+RESULT_CACHE = LRUCache(maxsize=1024, ttl=3600, store=open_store())
+if RESULT_CACHE.store is not None:
+    RESULT_CACHE.store.warm(RESULT_CACHE)
+
+
+@functools.lru_cache(maxsize=64)
+def _file_digest(path, mtime_ns):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()[:16]
+
+
+def code_version(func):
+    """Hash of the source file defining ``func`` (``""`` when it has none)."""
+    code = getattr(inspect.unwrap(func), "__code__", None)
+    if code is None:
+        return ""
+    try:
+        return _file_digest(code.co_filename, os.stat(code.co_filename).st_mtime_ns)
+    except OSError:
+        return ""
+
+
+def memoize(cache, name):
+    """Cache a function's results under ``name`` plus its canonical arguments.
+
+    ``name`` namespaces the keys, so re-decorating the same function on each
+    Streamlit rerun keeps hitting the entries stored by earlier runs, as long
+    as the file defining it is unchanged (see ``code_version``).
+    """
+    def decorator(func):
+        version = code_version(func)
+
+        def cache_key(*args, **kwargs):
+            return canonical_key(name, version, args, kwargs)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cache.get_or_compute(cache_key(*args, **kwargs), lambda: func(*args, **kwargs))
+        wrapper.cache = cache
+        wrapper.cache_key = cache_key
+        return wrapper
+    return decorator
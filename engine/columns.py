@@ -0,0 +1,24 @@
+"""Lookups into a batch of deal params.
+
+The engines take a batch as a dict of equal-length float arrays, one per
+param, where NaN (or a missing key) means a deal leaves that param out.
+"""
+import numpy as np
+
+
+def _rows(columns):
+    return len(next(iter(columns.values())))
+
+
+def present(columns, key):
+    """Whether each row gives ``key``."""
+    if key not in columns:
+        return np.zeros(_rows(columns), dtype=bool)
+    return ~np.isnan(columns[key])
+
+
+def optional(columns, key, default=0.0):
+    """``key`` for every row, ``default`` (a scalar or one value per row) where it is left out."""
+    if key not in columns:
+        return np.broadcast_to(np.asarray(default, dtype=float), (_rows(columns),))
+    return np.where(np.isnan(columns[key]), default, columns[key])
@@ -0,0 +1,60 @@
+"""Side-by-side comparison of a whole scenario library.
+
+Every scenario is a row of one batch, so the library is evaluated in a single
+vectorized pass: one cash-flow build, one NPV per option, and one IRR and
+payback solve over all rows.  Growing the library adds rows to the arrays,
+not passes.
+
+TCO (total cost of ownership) is the pre-tax, undiscounted cost over the
+useful life, as the single-scenario view reports it: the net purchase price
+plus maintenance less the terminal value for buying, the lease payments for
+leasing.  The after-tax cost is the same horizon from the cash flows:
+outlays, payments and maintenance net of tax shields, less the residual
+recovered (discounted, it is minus the NPV).
+"""
+import numpy as np
+import pandas as pd
+
+from engine.cumulative import payback_table
+from engine.irr import irr_table
+from engine.scenario import evaluate, to_columns
+
+COMPARISON_COLUMNS = (
+    "Scenario", "Purchase Price", "Useful Life", "NPV (Buy)", "NPV (Lease)", "NAL", "IRR (Buy)",
+    "IRR (Incremental)", "Payback (Years)", "Discounted Payback (Years)", "TCO (Buy)", "TCO (Lease)",
+    "After-tax Cost (Buy)", "After-tax Cost (Lease)", "Recommendation",
+)
+
+
+def comparison_table(scenarios):
+    """One row per entry of a ``SCENARIOS``-style mapping, in its order.
+
+    IRRs are decimals and paybacks are NaN when they never happen.
+    """
+    names = list(scenarios)
+    if not names:
+        return pd.DataFrame(columns=COMPARISON_COLUMNS)
+    columns = to_columns([scenarios[name]["params"] for name in names])
+    result = evaluate(columns)
+    irrs = irr_table(result.buy_cash_flows, result.lease_cash_flows, result.discount_rate,
+                     periods=result.useful_life + 1)
+    paybacks = payback_table(result.buy_cash_flows, result.lease_cash_flows, result.discount_rate)
+    life = result.useful_life
+    return pd.DataFrame({
+        "Scenario": names,
+        "Purchase Price": columns["purchase_price"],
+        "Useful Life": result.useful_life,
+        "NPV (Buy)": result.npv_buy,
+        "NPV (Lease)": result.npv_lease,
+        "NAL": result.nal,
+        "IRR (Buy)": irrs["irr_buy"],
+        "IRR (Incremental)": irrs["irr_incremental"],
+        "Payback (Years)": paybacks["payback_buy"],
+        "Discounted Payback (Years)": paybacks["discounted_payback_buy"],
+        "TCO (Buy)": result.net_purchase_price + columns["maintenance"] * life - result.terminal_value,
+        "TCO (Lease)": columns["lease_payment"] * life,
+        # Cash flows are zero past each row's life, so whole-row sums are per-life totals
+        "After-tax Cost (Buy)": -result.buy_cash_flows.sum(axis=1),
+        "After-tax Cost (Lease)": -result.lease_cash_flows.sum(axis=1),
+        "Recommendation": np.where(result.nal > 0, "Lease", "Buy"),
+    }, columns=COMPARISON_COLUMNS)
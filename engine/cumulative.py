@@ -0,0 +1,94 @@
+"""Cumulative cash flows, payback and crossover.
+
+Streams use the NPV kernel's layout: 1-D, or ``(streams, periods)`` with
+column 0 at inception.  Each series is one cumulative sum along the periods,
+and paybacks and crossovers are found from it without further passes, so a
+batch costs ``O(streams * periods)`` (a monthly 50-year horizon is just 601
+columns).  Times are in the stream's own periods with linear interpolation
+inside the period in which the crossing happens; divide by the periods per
+year to get years.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from engine.npv import discount_factors
+
+
+@dataclass
+class Cumulative:
+    nominal: np.ndarray
+    discounted: np.ndarray
+    payback: np.ndarray  # periods until the nominal total turns non-negative
+    discounted_payback: np.ndarray
+
+
+def first_crossing(series, start_sign):
+    """Interpolated period at which each row first leaves ``start_sign``.
+
+    ``series`` is ``(n, periods)``; a row crosses at the first period ``t >=
+    1`` where its value no longer has sign ``start_sign`` (-1 or 1).  Rows
+    with a zero ``start_sign`` or that never cross give NaN.
+    """
+    series = np.atleast_2d(series)
+    start_sign = np.broadcast_to(np.asarray(start_sign, dtype=float), series.shape[:1])
+    crossed = series * start_sign[:, None] <= 0
+    crossed[:, 0] = False
+    t = crossed.argmax(axis=1)
+    rows = np.arange(len(series))
+    found = crossed[rows, t] & (start_sign != 0)
+    t = np.where(found, t, 1)
+    before, after = series[rows, t - 1], series[rows, t]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(found, t - 1 + before / (before - after), np.nan)
+
+
+def cumulative(cash_flows, rates):
+    """Nominal and discounted running totals with simple and discounted payback.
+
+    ``rates`` are per-period decimals, a scalar or one per stream.  Payback is
+    only defined for streams that start with a net outlay.
+    """
+    cf = np.asarray(cash_flows, dtype=float)
+    single = cf.ndim == 1
+    cf = np.atleast_2d(cf)
+    rates = np.broadcast_to(np.asarray(rates, dtype=float), cf.shape[:1])
+    nominal = np.cumsum(cf, axis=1)
+    # A shared rate needs one factor row, broadcast over every stream
+    uniform = rates.size and (rates == rates[0]).all()
+    factors = discount_factors(rates[:1] if uniform else rates, cf.shape[1])
+    discounted = cf * (factors[0] if uniform else factors)
+    np.cumsum(discounted, axis=1, out=discounted)
+    outlay = np.where(cf[:, 0] < 0, -1.0, 0.0)
+    result = Cumulative(
+        nominal=nominal,
+        discounted=discounted,
+        payback=first_crossing(nominal, outlay),
+        discounted_payback=first_crossing(discounted, outlay),
+    )
+    if single:
+        return Cumulative(nominal[0], discounted[0], float(result.payback[0]),
+                          float(result.discounted_payback[0]))
+    return result
+
+
+def crossover(first, second):
+    """Period at which running total ``first`` first overtakes ``second`` or falls behind it.
+
+    Both are cumulative series of the same shape; NaN where the lead never
+    changes or both start level.
+    """
+    gap = np.atleast_2d(np.asarray(first, dtype=float) - np.asarray(second, dtype=float))
+    result = first_crossing(gap, np.sign(gap[:, 0]))
+    return float(result[0]) if np.ndim(first) == 1 else result
+
+
+def payback_table(buy, lease, rates, periods_per_year=1):
+    """Buy paybacks and the buy/lease crossover, in years, for a batch."""
+    buy_totals = cumulative(buy, rates)
+    lease_totals = cumulative(lease, rates)
+    return {
+        "payback_buy": buy_totals.payback / periods_per_year,
+        "discounted_payback_buy": buy_totals.discounted_payback / periods_per_year,
+        "crossover_year": crossover(buy_totals.nominal, lease_totals.nominal) / periods_per_year,
+    }
@@ -0,0 +1,87 @@
+"""Incremental recomputation over a small dependency graph.
+
+A ``Graph`` holds named inputs and derived values, each derived value being a
+function of other names.  Setting an input to a new value invalidates only
+the values downstream of it; reading a value recomputes whatever is missing
+along its dependencies and nothing else.  ``counts`` records how many times
+each derived value has been computed, so skipped work can be checked.
+"""
+from collections import Counter
+
+import numpy as np
+
+_MISSING = object()
+
+
+def _same(a, b):
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, np.ndarray):
+        return a.shape == b.shape and bool(np.array_equal(a, b))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return a is b
+
+
+class Graph:
+    def __init__(self):
+        self._inputs = {}
+        self._derived = {}  # name -> (func, deps)
+        self._dependents = {}  # name -> names computed directly from it
+        self._values = {}
+        self.counts = Counter()
+
+    def derive(self, name, deps, func):
+        """Declare ``name = func(*[value of d for d in deps])``."""
+        if name in self._derived or name in self._inputs:
+            raise ValueError(f"'{name}' is already defined")
+        self._derived[name] = (func, tuple(deps))
+        for dep in deps:
+            self._dependents.setdefault(dep, []).append(name)
+
+    def set(self, name, value):
+        """Set an input; returns whether it changed (and so invalidated anything)."""
+        if name in self._derived:
+            raise ValueError(f"'{name}' is derived and cannot be set")
+        old = self._inputs.get(name, _MISSING)
+        if old is not _MISSING and _same(old, value):
+            return False
+        self._inputs[name] = value
+        self._invalidate(name)
+        return True
+
+    def update(self, values):
+        """Set several inputs; returns the names that changed."""
+        return [name for name, value in values.items() if self.set(name, value)]
+
+    def _invalidate(self, name):
+        stack = list(self._dependents.get(name, ()))
+        while stack:
+            dependent = stack.pop()
+            if self._values.pop(dependent, _MISSING) is not _MISSING:
+                stack.extend(self._dependents.get(dependent, ()))
+
+    def get(self, name):
+        if name in self._inputs:
+            return self._inputs[name]
+        value = self._values.get(name, _MISSING)
+        if value is _MISSING:
+            if name not in self._derived:
+                raise KeyError(name)
+            func, deps = self._derived[name]
+            value = func(*(self.get(dep) for dep in deps))
+            self._values[name] = value
+            self.counts[name] += 1
+        return value
+
+    __getitem__ = get
+
+    def is_current(self, name):
+        """Whether ``name`` can be read without recomputing anything."""
+        if name in self._inputs:
+            return True
+        return name in self._values
+
+    def recompute_counts(self):
+        return {name: self.counts[name] for name in self._derived}
@@ -0,0 +1,120 @@
+"""Tax depreciation schedules.
+
+A schedule is a depreciable base times a factor row: the share of the base
+written off in each year, in the cash-flow layout (column 0 at purchase, so
+always zero).  Rows depend only on ``(method, rate, life, allowance)`` and
+are cached, so a batch gathers one row per distinct key and multiplies.
+
+Methods:
+
+* ``straight_line``: ``(cost - residual) / life`` a year;
+* ``declining_balance``: ``rate`` of the written-down cost each year (the
+  remaining value is recovered through the residual at disposal);
+* ``declining_to_straight``: declining balance, switching to straight-line
+  over the remaining life once that writes off more, so the cost is fully
+  written off by the end of the life.
+
+An initial (first-year) allowance, as under the Income Tax Ordinance 2001,
+writes off ``allowance`` of the base in year 1, and the method then runs on
+the rest.  In the scenario params declining balance applies when
+``depreciation_rate_declining`` is non-zero, ``depreciation_switch_to_sl``
+selects the switch and ``initial_allowance`` is a percentage.
+
+``tax_payable`` and ``tax_shield`` are hooks for minimum tax on turnover and
+the Alternative Corporate Tax on accounting profit: tax is the highest of the
+three, so depreciation saves nothing in years a floor binds.
+"""
+import functools
+
+import numpy as np
+
+from engine.columns import optional
+
+METHODS = ("straight_line", "declining_balance", "declining_to_straight")
+
+
+@functools.lru_cache(maxsize=1024)
+def factor_row(method, rate, life, allowance=0.0):
+    """Share of the depreciable base written off in years ``0..life`` (read-only)."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown depreciation method '{method}'; choose from {', '.join(METHODS)}")
+    if life < 1:
+        raise ValueError("life must be at least one year")
+    row = np.zeros(life + 1)
+    remaining = 1.0 - allowance
+    if method == "straight_line":
+        row[1:] = remaining / life
+    else:
+        written_down = remaining
+        for year in range(1, life + 1):
+            charge = written_down * rate
+            if method == "declining_to_straight":
+                charge = max(charge, written_down / (life - year + 1))
+            row[year] = charge
+            written_down -= charge
+    row[1] += allowance
+    row.flags.writeable = False
+    return row
+
+
+def depreciation_factors(methods, rates, lives, allowances, width):
+    """``(n, width)`` factor rows for a batch, zero past each row's life.
+
+    ``methods`` are indices into ``METHODS``; the other arguments are one
+    value per row.
+    """
+    keys = np.broadcast_arrays(
+        np.asarray(methods, dtype=float), np.asarray(rates, dtype=float),
+        np.asarray(lives, dtype=float), np.asarray(allowances, dtype=float))
+    # One integer code per row (mixed radix over each key's distinct values)
+    # is much cheaper to deduplicate than the rows themselves
+    code = np.zeros(keys[0].shape, dtype=np.int64)
+    for key in keys:
+        distinct, inverse = np.unique(key, return_inverse=True)
+        code = code * len(distinct) + inverse.ravel()
+    unique, first, inverse = np.unique(code, return_index=True, return_inverse=True)
+    rows = np.zeros((len(unique), width))
+    for i, row_index in enumerate(first.tolist()):
+        method, rate, life, allowance = (float(key[row_index]) for key in keys)
+        row = factor_row(METHODS[int(method)], rate, int(life), allowance)[:width]
+        rows[i, :len(row)] = row
+    return rows[inverse.ravel()]
+
+
+def schedule_from_columns(columns, width=None):
+    """Yearly tax depreciation ``(n, width)`` for a batch of scenario params."""
+    pp = columns["purchase_price"]
+    ul = columns["useful_life"].astype(int)
+    width = int(ul.max()) + 1 if width is None else width
+    db_rate = optional(columns, "depreciation_rate_declining", 0.0) / 100
+    switch = optional(columns, "depreciation_switch_to_sl", 0.0) != 0
+    methods = np.where(db_rate == 0, 0, np.where(switch, 2, 1))  # indices into METHODS
+    allowance = optional(columns, "initial_allowance", 0.0) / 100
+    # Straight-line writes down to the residual; declining balance runs on the cost
+    base = np.where(db_rate == 0, pp - columns["residual_value"], pp)
+    return base[:, None] * depreciation_factors(methods, db_rate, ul, allowance, width)
+
+
+def tax_payable(taxable_income, tax_rate, turnover=0.0, minimum_tax_rate=0.0,
+                accounting_profit=None, act_rate=0.0):
+    """Highest of normal tax, minimum tax on turnover and ACT on accounting profit.
+
+    Rates are decimals; arguments broadcast, so a whole schedule of years is
+    one call.
+    """
+    taxable_income = np.asarray(taxable_income, dtype=float)
+    accounting_profit = taxable_income if accounting_profit is None else np.asarray(accounting_profit, dtype=float)
+    normal = np.maximum(taxable_income, 0.0) * tax_rate
+    minimum = np.asarray(turnover, dtype=float) * minimum_tax_rate
+    return np.maximum(np.maximum(normal, minimum), np.maximum(accounting_profit, 0.0) * act_rate)
+
+
+def tax_shield(depreciation, taxable_income, tax_rate, **floors):
+    """Tax saved by ``depreciation`` given the rest of the taxable income and any floors.
+
+    Accounting profit (for ACT) is left unchanged, as book depreciation is
+    not the tax schedule.
+    """
+    floors.setdefault("accounting_profit", taxable_income)
+    return (tax_payable(taxable_income, tax_rate, **floors)
+            - tax_payable(np.asarray(taxable_income) - depreciation, tax_rate, **floors))
@@ -0,0 +1,160 @@
+"""Vectorized IRR and MIRR.
+
+Streams use the NPV kernel's layout: 1-D, or ``(streams, periods)`` with
+column 0 at inception.  ``irr`` runs Newton's method on every stream at once,
+evaluating the NPV polynomial and its derivative by Horner's rule in ``1 / (1
++ r)``.  Streams that fail to converge (or step below -100%) fall back to a
+grid bracket plus ``engine.roots.brentq``.  A stream with more than one sign
+change can have several IRRs; ``irr`` returns the one nearest ``guess`` and
+``sign_changes`` lets callers flag such streams.
+"""
+import numpy as np
+
+from engine.npv import npv_grid
+from engine.roots import brentq, first_sign_change
+
+# Rates (decimal) scanned to bracket an IRR when Newton's method fails
+IRR_GRID = np.concatenate([np.arange(-0.99, 1.0, 0.01), [1.5, 2.0, 3.0, 5.0, 10.0]])
+
+
+def _as_streams(cash_flows):
+    cf = np.asarray(cash_flows, dtype=float)
+    return cf.ndim == 1, np.atleast_2d(cf)
+
+
+def _sign_changes(columns):
+    # Walk the periods, carrying the last non-zero sign over zero flows
+    changes = np.zeros(columns.shape[1], dtype=int)
+    carried = np.zeros(columns.shape[1])
+    for flows in columns:
+        signs = np.sign(flows)
+        changes += signs * carried < 0
+        carried = np.where(signs != 0, signs, carried)
+    return changes
+
+
+def sign_changes(cash_flows):
+    """Number of sign changes in each stream, ignoring zero flows."""
+    single, cf = _as_streams(cash_flows)
+    changes = _sign_changes(np.ascontiguousarray(cf.T))
+    return int(changes[0]) if single else changes
+
+
+def _polynomial(columns, x):
+    """NPV ``sum(cf_t * x**t)`` and its derivative in ``x``, per stream.
+
+    ``columns`` is the transposed ``(periods, streams)`` layout, so each
+    Horner step reads one contiguous row.
+    """
+    value = np.zeros(columns.shape[1])
+    slope = np.zeros(columns.shape[1])
+    for flows in columns[::-1]:
+        slope = slope * x + value
+        value = value * x + flows
+    return value, slope
+
+
+def _npv_at(columns, rates):
+    return _polynomial(columns, 1 / (1 + rates))[0]
+
+
+def _starting_rate(cf):
+    # Growth from the flow-weighted mean time of the outflows to that of the inflows
+    inflows = np.where(cf > 0, cf, 0.0)
+    outflows = np.where(cf < 0, -cf, 0.0)
+    t = np.arange(cf.shape[1])
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        total_in, total_out = inflows.sum(axis=1), outflows.sum(axis=1)
+        span = np.maximum(inflows @ t / total_in - outflows @ t / total_out, 0.5)
+        rate = (total_in / total_out) ** (1 / span) - 1
+    return np.clip(np.nan_to_num(rate, nan=0.1, posinf=5.0, neginf=-0.9), -0.9, 5.0)
+
+
+def irr(cash_flows, guess=0.1, tol=1e-10, maxiter=50):
+    """Internal rate of return (decimal) of each stream; NaN where none exists.
+
+    Streams with a single sign change have exactly one IRR, and Newton starts
+    from an estimate of it; others start from ``guess``.
+    """
+    single, cf = _as_streams(cash_flows)
+    n = len(cf)
+    columns = np.ascontiguousarray(cf.T)
+    changes = _sign_changes(columns)
+    has_root = changes > 0
+    rate = np.where(changes == 1, _starting_rate(cf), np.broadcast_to(np.asarray(guess, dtype=float), (n,)))
+    result = np.full(n, np.nan)
+    active = has_root.copy()
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(maxiter):
+            if not active.any():
+                break
+            rows = np.flatnonzero(active)
+            # Gathering the active streams only pays once most have converged
+            subset = columns if len(rows) > n // 2 else columns[:, rows]
+            x = 1 / (1 + rate) if subset is columns else 1 / (1 + rate[rows])
+            value, slope = _polynomial(subset, x)
+            if subset is columns:
+                x, value, slope = x[rows], value[rows], slope[rows]
+            step = value / (-x * x * slope)
+            new_rate = rate[rows] - step
+            bad = ~np.isfinite(new_rate) | (new_rate <= -1)
+            done = ~bad & (np.abs(step) <= tol * (1 + np.abs(new_rate)))
+            result[rows[done]] = new_rate[done]
+            rate[rows] = np.where(bad, rate[rows], new_rate)
+            active[rows[done | bad]] = False
+
+    # Bracketed fallback for streams Newton did not settle
+    failed = np.flatnonzero(has_root & np.isnan(result))
+    if failed.size:
+        sub = columns[:, failed]
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            residuals = npv_grid(IRR_GRID, sub.T)
+        near = np.broadcast_to(np.asarray(guess, dtype=float), (n,))[failed]
+        lo, hi = first_sign_change(IRR_GRID, residuals, near=near)
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            result[failed] = brentq(lambda r: _npv_at(sub, r), lo, hi)
+    return float(result[0]) if single else result
+
+
+def mirr(cash_flows, finance_rate, reinvest_rate, periods=None):
+    """Modified IRR: outflows financed at ``finance_rate``, inflows reinvested.
+
+    Rates are decimals, scalar or per stream.  ``periods`` gives each
+    stream's length when a 2-D batch is zero-padded past shorter lives.
+    NaN where a stream has no inflow or no outflow.
+    """
+    single, cf = _as_streams(cash_flows)
+    n, width = cf.shape
+    periods = np.broadcast_to(np.asarray(width if periods is None else periods, dtype=int), (n,))
+    finance_rate = np.broadcast_to(np.asarray(finance_rate, dtype=float), (n,))
+    reinvest_rate = np.broadcast_to(np.asarray(reinvest_rate, dtype=float), (n,))
+    t = np.arange(width)[None, :]
+    horizon = (periods - 1)[:, None]
+    inside = t <= horizon
+    with np.errstate(divide="ignore", invalid="ignore"):
+        outflows = np.where(inside & (cf < 0), cf, 0.0) / (1 + finance_rate[:, None]) ** t
+        inflows = np.where(inside & (cf > 0), cf, 0.0) * (1 + reinvest_rate[:, None]) ** (horizon - t)
+        pv_out = -outflows.sum(axis=1)
+        fv_in = inflows.sum(axis=1)
+        result = (fv_in / pv_out) ** (1 / (periods - 1)) - 1
+    result = np.where((pv_out > 0) & (fv_in > 0) & (periods > 1), result, np.nan)
+    return float(result[0]) if single else result
+
+
+def irr_table(buy, lease, rates, periods=None):
+    """IRR/MIRR of the buy and lease streams and of buying over leasing.
+
+    ``rates`` (decimal, scalar or per stream) is the finance and reinvestment
+    rate for MIRR, and the starting guess for the incremental IRR, which is
+    the discount rate at which both options have the same NPV.
+    """
+    incremental = np.asarray(buy, dtype=float) - np.asarray(lease, dtype=float)
+    return {
+        "irr_buy": irr(buy),
+        "irr_lease": irr(lease),
+        "irr_incremental": irr(incremental, guess=rates),
+        "mirr_buy": mirr(buy, rates, rates, periods),
+        "mirr_incremental": mirr(incremental, rates, rates, periods),
+        "incremental_sign_changes": sign_changes(incremental),
+    }
@@ -0,0 +1,124 @@
+"""Debt financing of a purchase: amortizing, balloon, bullet and grace-period loans.
+
+A loan of ``principal`` at a per-period ``rate`` runs for ``term`` periods.
+The first ``grace`` periods are interest-only; the rest pay a level
+instalment that brings the balance down to the ``balloon`` amount, which is
+repaid with the last instalment.  A balloon of zero is a plain amortizing
+loan and a balloon equal to the principal is a bullet (interest-only) loan.
+
+Balances come from the closed-form annuity formula at every date, so a batch
+of ``n`` loans over ``T`` periods is a handful of ``(n, T)`` array operations
+with no per-period loop.  Schedules use the cash-flow layout of the other
+engines: ``(n, periods + 1)`` with column 0 at drawdown.
+
+In the scenario params a deal is financed at ``interest_rate`` when it has a
+``down_payment`` (the rest of the price is borrowed) or a non-zero
+``interest_rate`` (the whole price is borrowed).  Loan terms without an
+``interest_rate`` finance nothing: a missing rate is an error (see
+``engine.scenario.row_errors``), never an interest-free loan.  The price is net of any
+``aedb_subsidy`` and ``government_subsidy``: a subsidy is never borrowed.  Optional ``loan_term`` and
+``grace_period`` are in years, the term defaulting to and capped at the
+useful life, and ``balloon`` is a percentage of the principal.  Interest is
+deductible, so the buyer's after-tax flows are the drawdown, less the
+instalments, plus the interest tax shield.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from engine.columns import optional
+
+
+LOAN_TERMS = ("down_payment", "loan_term", "grace_period", "balloon")
+
+
+@dataclass
+class LoanSchedule:
+    principal: np.ndarray
+    balance: np.ndarray  # closing balance after each date's instalment
+    interest: np.ndarray
+    repayment: np.ndarray  # principal repaid
+
+    def __len__(self):
+        return len(self.principal)
+
+    @property
+    def payment(self):
+        return self.interest + self.repayment
+
+    def after_tax_flows(self, tax_rate):
+        """Borrower's flows: drawdown at column 0, then instalments net of the interest tax shield."""
+        tax_rate = np.broadcast_to(np.asarray(tax_rate, dtype=float), self.principal.shape)
+        flows = self.interest * tax_rate[:, None] - self.payment
+        flows[:, 0] += self.principal
+        return flows
+
+
+def loan_schedule(principal, rate, term, grace=0, balloon=0.0, horizon=None):
+    """Schedules for a batch of loans.
+
+    ``rate`` is per period (decimal); ``term`` and ``grace`` are whole
+    periods and ``balloon`` an amount due at maturity.  Every argument is a
+    scalar or one value per loan.  The matrices have ``horizon + 1`` columns
+    (default: the longest term).
+    """
+    principal = np.atleast_1d(np.asarray(principal, dtype=float))
+    n = len(principal)
+    rate, term, grace, balloon = (np.broadcast_to(np.asarray(a, dtype=float), (n,))
+                                  for a in (rate, term, grace, balloon))
+    if (term < 1).any() or (grace < 0).any() or (grace >= term).any():
+        raise ValueError("loans need a term of at least one period and a grace period shorter than the term")
+    horizon = int(term.max()) if horizon is None else int(horizon)
+
+    # Periods of amortization so far at each date, and the level instalment
+    k = (term - grace)[:, None]
+    r = rate[:, None]
+    t = np.arange(horizon + 1)[None, :]
+    s = np.clip(t - grace[:, None], 0, k)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        discount = (1 + r) ** -k
+        instalment = np.where(r != 0, (principal[:, None] - balloon[:, None] * discount) * r / (1 - discount),
+                              (principal[:, None] - balloon[:, None]) / k)
+        growth = (1 + r) ** s
+        balance = np.where(r != 0, principal[:, None] * growth - instalment * (growth - 1) / r,
+                           principal[:, None] - instalment * s)
+    balance = np.where(t >= term[:, None], 0.0, balance)
+
+    interest = np.zeros_like(balance)
+    interest[:, 1:] = balance[:, :-1] * r
+    repayment = np.zeros_like(balance)
+    repayment[:, 1:] = balance[:, :-1] - balance[:, 1:]
+    return LoanSchedule(principal=principal, balance=balance, interest=interest, repayment=repayment)
+
+
+def net_purchase_price(columns):
+    """Purchase price less the subsidies the buyer receives."""
+    subsidy = optional(columns, "aedb_subsidy", 0.0) + optional(columns, "government_subsidy", 0.0)
+    return columns["purchase_price"] - subsidy
+
+
+def loan_principal(columns):
+    """Amount borrowed for each deal (zero when it is bought outright)."""
+    price = np.maximum(net_purchase_price(columns), 0.0)
+    down_payment = optional(columns, "down_payment", np.nan)
+    rate = optional(columns, "interest_rate", np.nan)
+    credit = np.where(np.isnan(rate) | (rate == 0), 0.0, price)
+    financed = np.where(np.isnan(rate), 0.0, np.maximum(price - down_payment, 0.0))
+    return np.where(np.isnan(down_payment), credit, financed)
+
+
+def loan_from_columns(columns, principal=None, periods_per_year=1, horizon=None):
+    """Loan schedules for a batch of deals, on ``periods_per_year`` periods.
+
+    Annual rates are split evenly over the periods of a year (nominal
+    compounding, as banks quote them).
+    """
+    if principal is None:
+        principal = loan_principal(columns)
+    m = int(periods_per_year)
+    ul = columns["useful_life"]
+    term = np.clip(optional(columns, "loan_term", ul), 1, ul).astype(int)
+    grace = np.clip(optional(columns, "grace_period", 0.0), 0, term - 1).astype(int)
+    annual_rate = optional(columns, "interest_rate", 0.0)
+    balloon = principal * np.clip(optional(columns, "balloon", 0.0), 0, 100) / 100
+    return loan_schedule(principal, annual_rate / 100 / m, term * m, grace * m, balloon, horizon)
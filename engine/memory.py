@@ -0,0 +1,110 @@
+"""Memory accounting for per-session state.
+
+``deep_size`` walks an object graph and adds up what it holds: arrays by the
+buffers they own, DataFrames by their deep memory usage, containers and
+plain objects by their contents.  Every object is counted once, and objects
+that are also reachable from the shared roots (the process-wide result cache
+and reference data) are counted as shared rather than as the session's own,
+since they exist once however many sessions point at them.
+"""
+import os
+import sys
+import types
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+# Code and types belong to the process, not to any session
+_OPAQUE = (types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType, type)
+
+
+def _own_size(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes if obj.base is None else sys.getsizeof(obj)
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(index=True, deep=True).sum())
+    if isinstance(obj, (pd.Series, pd.Index)):
+        return int(obj.memory_usage(deep=True))
+    return sys.getsizeof(obj)
+
+
+def _children(obj):
+    if isinstance(obj, (str, bytes, bytearray, int, float, complex, bool, type(None), _OPAQUE,
+                        pd.DataFrame, pd.Series, pd.Index)):
+        return ()
+    if isinstance(obj, np.ndarray):
+        return () if obj.base is None else (obj.base,)
+    if isinstance(obj, Mapping):
+        return [*obj.keys(), *obj.values()]
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        return obj
+    children = list(getattr(obj, "__dict__", {}).values())
+    for name in getattr(type(obj), "__slots__", ()):
+        if hasattr(obj, name):
+            children.append(getattr(obj, name))
+    return children
+
+
+def reachable_ids(*roots):
+    """Ids of every object reachable from ``roots``."""
+    seen = set()
+    stack = list(roots)
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+        stack.extend(_children(obj))
+    return seen
+
+
+def deep_size(obj, shared=frozenset(), seen=None):
+    """``(private, shared)`` bytes held by ``obj``; ``seen`` carries over between calls."""
+    seen = set() if seen is None else seen
+    private = common = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _OPAQUE):
+            continue
+        seen.add(id(item))
+        size = _own_size(item)
+        if id(item) in shared:
+            common += size
+        else:
+            private += size
+        stack.extend(_children(item))
+    return private, common
+
+
+def session_report(state, shared_roots=()):
+    """Bytes per session-state entry, largest first.
+
+    ``state`` maps names to values (e.g. ``st.session_state.to_dict()``).
+    Entries are walked in order with one ``seen`` set, so an object held by
+    two entries is charged to the first.
+    """
+    shared = reachable_ids(*shared_roots)
+    seen = set()
+    rows = []
+    for name, value in state.items():
+        private, common = deep_size(value, shared, seen)
+        rows.append({"Entry": str(name), "Private (KB)": private / 1024, "Shared (KB)": common / 1024})
+    report = pd.DataFrame(rows, columns=["Entry", "Private (KB)", "Shared (KB)"])
+    return report.sort_values("Private (KB)", ascending=False, ignore_index=True)
+
+
+def process_rss():
+    """Resident set size of this process in bytes (the peak where the current one is unknown)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,62 @@
+"""Vectorized NPV kernel.
+
+Cash flows are laid out as ``(streams, periods)`` matrices where column ``t``
+is the cash flow at the end of period ``t`` (column 0 is the upfront flow).
+Discount-factor rows ``1 / (1 + r) ** t`` are cached per ``(rate, periods)``
+so repeated evaluations at the same rate only pay for a multiply-add.
+"""
+import functools
+
+import numpy as np
+
+# Above this many distinct rates the per-rate cache costs more than a single
+# broadcasted power, so the factors are built directly.
+_MAX_CACHED_RATES = 512
+
+
+@functools.lru_cache(maxsize=4096)
+def _discount_row(rate, periods):
+    row = np.power(1.0 + rate, -np.arange(periods, dtype=float))
+    row.flags.writeable = False
+    return row
+
+
+def discount_factors(rates, periods):
+    """Return a ``(len(rates), periods)`` matrix of discount factors."""
+    rates = np.atleast_1d(np.asarray(rates, dtype=float))
+    if rates.size > _MAX_CACHED_RATES:
+        factors = np.empty((rates.size, periods))
+        if periods:
+            factors[:, 0] = 1.0
+            factors[:, 1:] = (1.0 / (1.0 + rates))[:, None]
+            np.cumprod(factors, axis=1, out=factors)
+        return factors
+    unique, inverse = np.unique(rates, return_inverse=True)
+    rows = np.stack([_discount_row(float(r), periods) for r in unique])
+    return rows[inverse.ravel()]
+
+
+def npv(rates, cash_flows):
+    """NPV of each stream at its own rate.
+
+    ``cash_flows`` is a 1-D stream or a 2-D ``(streams, periods)`` matrix;
+    ``rates`` is a scalar or one rate per stream.  Returns a float for a 1-D
+    stream, otherwise an array with one NPV per stream.
+    """
+    cf = np.asarray(cash_flows, dtype=float)
+    single = cf.ndim == 1
+    cf = np.atleast_2d(cf)
+    rates = np.broadcast_to(np.asarray(rates, dtype=float), cf.shape[:1])
+    values = np.einsum("ij,ij->i", cf, discount_factors(rates, cf.shape[1]))
+    return float(values[0]) if single else values
+
+
+def npv_grid(rates, cash_flows):
+    """NPV of every stream at every rate, shaped ``(len(rates), streams)``."""
+    cf = np.atleast_2d(np.asarray(cash_flows, dtype=float))
+    factors = discount_factors(rates, cf.shape[1])
+    return factors @ cf.T
+
+
+def calculate_npv(rate, cash_flows):
+    return npv(rate, cash_flows)
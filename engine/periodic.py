@@ -0,0 +1,257 @@
+"""Period-agnostic buy vs lease cash flows.
+
+The scenario engine works in whole years.  This module evaluates the core deal
+(price net of subsidies, life, residual, maintenance, lease payment, tax, loan
+financing and ``maintenance_included``) on any number of periods per year, with lease
+payments in arrears (end of period) or in advance (start of period) and an
+optional per-period discount-rate curve.  Params keep their annual units; the
+engine spreads annual amounts evenly over the periods of each year.
+
+Within a deal's term every per-period flow except the loan's is constant, so
+NPVs are closed forms over cumulative discount factors and a batch costs
+``O(n)`` once the (few, cached) discount curves exist; financed deals add one
+pass over their loan schedules.  Cash flows, when wanted, are
+``(n, periods + 1)`` matrices with column 0 at inception; ``annual_rollup``
+sums them back into the ``(n, years + 1)`` layout used by the charts and by
+``ScenarioResult``.
+"""
+import functools
+from dataclasses import dataclass
+
+import numpy as np
+
+from engine.columns import optional
+from engine.loan import loan_from_columns, loan_principal, net_purchase_price
+from engine.npv import discount_factors
+from engine.scenario import ScenarioResult, check_rows, to_columns
+
+TIMINGS = ("arrears", "advance")
+
+
+def per_period_rate(annual_rate, periods_per_year):
+    """Per-period rate (decimal) equivalent to an effective annual percentage."""
+    return (1 + np.asarray(annual_rate, dtype=float) / 100) ** (1 / periods_per_year) - 1
+
+
+def curve_factors(rates):
+    """Discount factors ``(n, periods + 1)`` from per-period rates ``(n, periods)``."""
+    rates = np.atleast_2d(np.asarray(rates, dtype=float))
+    factors = np.ones((rates.shape[0], rates.shape[1] + 1))
+    np.cumprod(1 / (1 + rates), axis=1, out=factors[:, 1:])
+    return factors
+
+
+def annual_rollup(flows, periods_per_year):
+    """Sum per-period flows into years; column 0 (inception) stays on its own."""
+    flows = np.atleast_2d(flows)
+    n, width = flows.shape
+    years = -(-(width - 1) // periods_per_year)
+    padded = np.zeros((n, years * periods_per_year))
+    padded[:, :width - 1] = flows[:, 1:]
+    out = np.empty((n, years + 1))
+    out[:, 0] = flows[:, 0]
+    out[:, 1:] = padded.reshape(n, years, periods_per_year).sum(axis=2)
+    return out
+
+
+@dataclass
+class PeriodicResult:
+    """Per-row period amounts, NPVs and lazily built cash-flow matrices.
+
+    Within its term every row's per-period flows are constant, so NPVs come
+    from cumulative discount factors without materializing the matrices;
+    ``buy_cash_flows`` and ``lease_cash_flows`` are built on first access.
+    """
+    periods: np.ndarray
+    periods_per_year: int
+    timing: str
+    useful_life: np.ndarray
+    purchase_price: np.ndarray
+    net_purchase_price: np.ndarray  # paid at inception, after subsidies
+    residual_value: np.ndarray
+    buy_per_period: np.ndarray  # after-tax, end of period
+    payment_per_period: np.ndarray  # after-tax lease payment
+    lease_cost_per_period: np.ndarray  # after-tax maintenance borne by the lessee
+    curves: np.ndarray  # (curves, max_periods + 1) discount factors
+    curve_index: np.ndarray  # curve used by each row
+    npv_buy: np.ndarray
+    npv_lease: np.ndarray
+    nal: np.ndarray
+    financed_amount: np.ndarray
+    financing: np.ndarray = None  # after-tax loan flows, None when nothing is financed
+
+    def __len__(self):
+        return len(self.nal)
+
+    @property
+    def discount_factors(self):
+        return self.curves[self.curve_index]
+
+    @functools.cached_property
+    def buy_cash_flows(self):
+        """``(n, max_periods + 1)``, zero past each row's term."""
+        n = len(self.periods)
+        flows = np.empty((n, self.curves.shape[1]))
+        flows[:, 0] = -self.net_purchase_price
+        flows[:, 1:] = self.buy_per_period[:, None] * self._active
+        flows[np.arange(n), self.periods] += self.residual_value
+        if self.financing is not None:
+            flows[:, :self.financing.shape[1]] += self.financing
+        return flows
+
+    @functools.cached_property
+    def lease_cash_flows(self):
+        flows = np.zeros((len(self.periods), self.curves.shape[1]))
+        flows[:, 1:] = -self.lease_cost_per_period[:, None] * self._active
+        payments = flows[:, :-1] if self.timing == "advance" else flows[:, 1:]
+        payments -= self.payment_per_period[:, None] * self._active
+        return flows
+
+    @property
+    def _active(self):
+        return np.arange(1, self.curves.shape[1])[None, :] <= self.periods[:, None]
+
+    def annual(self):
+        """``(buy, lease)`` rolled up into yearly columns."""
+        m = self.periods_per_year
+        return annual_rollup(self.buy_cash_flows, m), annual_rollup(self.lease_cash_flows, m)
+
+    def result(self, i):
+        """Row ``i`` as a ``ScenarioResult`` with yearly flows and per-period NPVs."""
+        row = evaluate_periodic_row(self, i)
+        end = int(self.useful_life[i]) + 1
+        buy, lease = (annual_rollup(flows, self.periods_per_year)[0, :end]
+                      for flows in (row.buy_cash_flows, row.lease_cash_flows))
+        return ScenarioResult(
+            buy_cash_flows=buy,
+            lease_cash_flows=lease,
+            npv_buy=float(self.npv_buy[i]),
+            npv_lease=float(self.npv_lease[i]),
+            nal=float(self.nal[i]),
+            net_purchase_price=float(self.net_purchase_price[i]),
+            initial_outlay=float(self.net_purchase_price[i] - self.financed_amount[i]),
+            financed_amount=float(self.financed_amount[i]),
+            terminal_value=float(self.residual_value[i]),
+        )
+
+
+def evaluate_periodic_row(result, i):
+    """Row ``i`` of ``result`` as a batch of one (builds only that row's flows)."""
+    take = slice(i, i + 1)
+    return PeriodicResult(
+        periods=result.periods[take],
+        periods_per_year=result.periods_per_year,
+        timing=result.timing,
+        useful_life=result.useful_life[take],
+        purchase_price=result.purchase_price[take],
+        net_purchase_price=result.net_purchase_price[take],
+        residual_value=result.residual_value[take],
+        buy_per_period=result.buy_per_period[take],
+        payment_per_period=result.payment_per_period[take],
+        lease_cost_per_period=result.lease_cost_per_period[take],
+        curves=result.curves[result.curve_index[take], :int(result.periods[i]) + 1],
+        curve_index=np.zeros(1, dtype=int),
+        npv_buy=result.npv_buy[take],
+        npv_lease=result.npv_lease[take],
+        nal=result.nal[take],
+        financed_amount=result.financed_amount[take],
+        financing=None if result.financing is None else result.financing[take, :int(result.periods[i]) + 1],
+    )
+
+
+def evaluate_periodic(columns, periods_per_year=12, timing="arrears", rates=None):
+    """Evaluate a batch of deals on ``periods_per_year`` periods.
+
+    ``rates`` optionally overrides the discount rate with per-period rates
+    (decimal), shaped ``(periods,)`` for every row or ``(n, periods)``;
+    otherwise each row's annual ``discount_rate`` is converted to its
+    per-period equivalent.
+    """
+    if timing not in TIMINGS:
+        raise ValueError(f"Unknown payment timing '{timing}'; choose from {', '.join(TIMINGS)}")
+    m = int(periods_per_year)
+    if m < 1:
+        raise ValueError("periods_per_year must be at least 1")
+    check_rows(columns)
+
+    pp = columns["purchase_price"]
+    ul = columns["useful_life"].astype(int)
+    rv = columns["residual_value"]
+    tr = columns["tax_rate"] / 100
+    n = len(pp)
+    periods = ul * m
+    horizon = int(periods.max()) if n else 0
+
+    # Depreciation and maintenance accrue at the end of each period
+    with np.errstate(divide="ignore", invalid="ignore"):
+        depreciation = (pp - rv) / periods
+    maint = columns["maintenance"] / m
+    buy_per_period = depreciation * tr - maint * (1 - tr)
+    maintenance_excluded = optional(columns, "maintenance_included", 1.0) == 0
+    lease_cost = np.where(maintenance_excluded, maint * (1 - tr), 0.0)
+    payment = columns["lease_payment"] / m * (1 - tr)
+
+    # One discount curve per distinct rate (or per row for a rate matrix)
+    if rates is None:
+        unique, curve_index = np.unique(per_period_rate(columns["discount_rate"], m), return_inverse=True)
+        curves = discount_factors(unique, horizon + 1)
+    else:
+        rates = np.atleast_2d(np.asarray(rates, dtype=float))
+        if rates.shape[0] not in (1, n) or rates.shape[1] < horizon:
+            raise ValueError(f"rates must cover {horizon} periods for 1 or {n} rows, got shape {rates.shape}")
+        curves = curve_factors(rates[:, :horizon])
+        curve_index = np.arange(n) if len(rates) > 1 else np.zeros(n, dtype=int)
+    curve_index = curve_index.ravel()
+
+    # annuity[k] = sum of factors for periods 1..k
+    annuity = np.zeros_like(curves)
+    np.cumsum(curves[:, 1:], axis=1, out=annuity[:, 1:])
+    in_arrears = annuity[curve_index, periods]
+    at_end = curves[curve_index, periods]
+    # Paid at periods 0..P-1: factor 1 for period 0 plus periods 1..P-1
+    payment_annuity = 1 + annuity[curve_index, periods - 1] if timing == "advance" else in_arrears
+
+    net_price = net_purchase_price(columns)
+    npv_buy = -net_price + buy_per_period * in_arrears + rv * at_end
+    npv_lease = -lease_cost * in_arrears - payment * payment_annuity
+
+    financed_amount = loan_principal(columns)
+    financing = None
+    if (financed_amount > 0).any():
+        financing = loan_from_columns(columns, financed_amount, m, horizon).after_tax_flows(tr)
+        npv_buy = npv_buy + np.einsum("ij,ij->i", financing, curves[curve_index])
+
+    return PeriodicResult(
+        periods=periods,
+        periods_per_year=m,
+        timing=timing,
+        useful_life=ul,
+        purchase_price=pp,
+        net_purchase_price=net_price,
+        residual_value=rv,
+        buy_per_period=buy_per_period,
+        payment_per_period=payment,
+        lease_cost_per_period=lease_cost,
+        curves=curves,
+        curve_index=curve_index,
+        npv_buy=npv_buy,
+        npv_lease=npv_lease,
+        nal=npv_buy - npv_lease,
+        financed_amount=financed_amount,
+        financing=financing,
+    )
+
+
+def compute_periodic(params, periods_per_year=12, timing="arrears"):
+    """Single deal as a ``ScenarioResult`` (yearly flows, per-period NPVs)."""
+    return evaluate_periodic(to_columns([params]), periods_per_year, timing).result(0)
+
+
+def period_cash_flows(params, periods_per_year=1, timing="arrears"):
+    """Per-period ``(buy, lease)`` flows of one deal.
+
+    The flows do not depend on the discount rate, so ``params`` need not
+    carry one; discount them with ``per_period_rate`` to get the NPVs.
+    """
+    result = evaluate_periodic(to_columns([dict(params, discount_rate=0.0)]), periods_per_year, timing)
+    return result.buy_cash_flows[0], result.lease_cash_flows[0]
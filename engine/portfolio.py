@@ -0,0 +1,273 @@
+"""Lease-or-buy assignment for a portfolio of assets.
+
+Each asset is a deal row (the ``SCENARIOS`` param names) plus the working
+capital a purchase ties up besides its debt.  Leasing an asset always fits;
+buying it uses its purchase price of debt capacity and its working capital.
+Buying is worth ``-NAL`` over leasing, in the convention used throughout
+(``NAL = NPV(buy) - NPV(lease)``, and NAL > 0 recommends leasing), so
+unconstrained the plan is each asset's own recommendation.
+``optimize_portfolio`` picks the purchases with the largest total advantage:
+
+* the debt constraint is solved exactly by a 0/1 knapsack DP, with each
+  asset's debt rounded up to a grid of ``debt_capacity / steps`` (so plans
+  never exceed the real capacity);
+* the working-capital constraint is relaxed with a Lagrange multiplier found
+  by bisection, and the best feasible plan is topped up greedily.  The dual
+  value bounds the optimum, so ``gap`` says how far from optimal the plan can
+  be; it is zero whenever working capital does not bind;
+* when few enough assets are in play, a branch and bound over both
+  constraints then proves the best plan optimal (``gap`` of zero).
+
+Only assets whose recommendation is to buy (NAL < 0) are ever worth buying,
+so the DP runs over those alone.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from engine.scenario import columns_from_frame, evaluate, row_errors
+
+# Share of an asset's price a purchase ties up as working capital by default
+# (deposit, spares and commissioning stock not covered by the debt)
+WORKING_CAPITAL_SHARE = 0.15
+
+DEBT_STEPS = 2000
+
+# Branch and bound closes the Lagrangian gap when at most this many assets are
+# worth buying, within a budget of search nodes
+EXACT_LIMIT = 60
+MAX_NODES = 200_000
+
+
+@dataclass
+class PortfolioPlan:
+    buy: np.ndarray  # bool per asset
+    npv_buy: np.ndarray
+    npv_lease: np.ndarray
+    debt: np.ndarray
+    working_capital: np.ndarray
+    advantage: float  # sum of -NAL over the purchases: the plan's edge over leasing everything
+    upper_bound: float  # no plan on the debt grid can beat this
+    multiplier: float  # Lagrange multiplier on working capital
+
+    @property
+    def gap(self):
+        return max(self.upper_bound - self.advantage, 0.0)
+
+    @property
+    def debt_used(self):
+        return float(self.debt[self.buy].sum())
+
+    @property
+    def working_capital_used(self):
+        return float(self.working_capital[self.buy].sum())
+
+
+def default_assets(params, seed=0):
+    """Split a portfolio-level deal into ``num_assets`` editable asset rows.
+
+    Prices, residuals, maintenance and lease payments are shared out by
+    uneven weights, lease pricing varies +/-15% around the portfolio's and
+    lives spread around the average, so assets differ in which option wins.
+    """
+    n = max(int(params.get("num_assets", 1)), 1)
+    rng = np.random.default_rng(seed)
+    weights = rng.uniform(0.5, 1.5, n)
+    weights /= weights.sum()
+    life = int(params["useful_life"])
+    lives = np.clip(life + np.round(np.linspace(-2, 2, n)).astype(int), 1, None)
+    pricing = rng.permutation(np.linspace(0.85, 1.15, n))
+    price = params["purchase_price"] * weights
+    return pd.DataFrame({
+        "asset": [f"Asset {i + 1}" for i in range(n)],
+        "purchase_price": price.round(2),
+        "useful_life": lives,
+        "residual_value": (params["residual_value"] * weights).round(2),
+        "maintenance": (params["maintenance"] * weights).round(2),
+        "lease_payment": (params["lease_payment"] * weights * pricing).round(2),
+        "discount_rate": float(params["discount_rate"]),
+        "tax_rate": float(params["tax_rate"]),
+        "working_capital": (price * WORKING_CAPITAL_SHARE).round(2),
+    })
+
+
+def _knapsack(values, weights, capacity):
+    """Exact 0/1 knapsack over integer ``weights``; returns ``(value, chosen)``."""
+    n = len(values)
+    chosen = np.zeros(n, dtype=bool)
+    capacity = int(min(capacity, weights.sum()))
+    if n == 0:
+        return 0.0, chosen
+    if weights.sum() <= capacity:
+        chosen[:] = True
+        return float(values.sum()), chosen
+    best = np.zeros(capacity + 1)  # best[c] = max value with total weight <= c
+    keep = np.zeros((n, capacity + 1), dtype=bool)
+    for i in range(n):
+        w, v = int(weights[i]), values[i]
+        if w == 0:
+            keep[i] = True
+            best += v
+        elif w <= capacity:
+            candidate = best[:-w] + v
+            take = candidate > best[w:]
+            keep[i, w:] = take
+            np.copyto(best[w:], candidate, where=take)
+    c = capacity
+    for i in range(n - 1, -1, -1):
+        if keep[i, c]:
+            chosen[i] = True
+            c -= int(weights[i])
+    return float(best[capacity]), chosen
+
+
+def _fractional_bound(order, gain, weight, start, capacity):
+    # LP relaxation over items ``start..`` of one constraint, best ratio first
+    total = 0.0
+    for i in order:
+        if i < start:
+            continue
+        if weight[i] <= capacity:
+            total += gain[i]
+            capacity -= weight[i]
+        else:
+            return total + gain[i] * capacity / weight[i]
+    return total
+
+
+def _branch_and_bound(gain, debt, wc, debt_limit, wc_limit, incumbent, max_nodes=MAX_NODES):
+    """Exact two-constraint 0/1 knapsack by depth-first search.
+
+    Items must be sorted by ``gain`` descending.  Returns the chosen mask of
+    a plan beating ``incumbent``, ``None`` if none does, or ``False`` if the
+    node budget ran out first.
+    """
+    n = len(gain)
+    gain, debt, wc = gain.tolist(), debt.tolist(), wc.tolist()
+    by_debt = sorted(range(n), key=lambda i: -gain[i] / debt[i] if debt[i] else -np.inf)
+    by_wc = sorted(range(n), key=lambda i: -gain[i] / wc[i] if wc[i] else -np.inf)
+    best_value, best = incumbent, None
+    stack = [(0, 0.0, debt_limit, wc_limit, ())]
+    nodes = 0
+    while stack:
+        nodes += 1
+        if nodes > max_nodes:
+            return False
+        k, value, debt_left, wc_left, taken = stack.pop()
+        if k == n:
+            if value > best_value:
+                best_value, best = value, taken
+            continue
+        bound = value + min(_fractional_bound(by_debt, gain, debt, k, debt_left),
+                            _fractional_bound(by_wc, gain, wc, k, wc_left))
+        if bound <= best_value + 1e-12 * (1 + abs(best_value)):
+            continue
+        stack.append((k + 1, value, debt_left, wc_left, taken))
+        if debt[k] <= debt_left and wc[k] <= wc_left:
+            stack.append((k + 1, value + gain[k], debt_left - debt[k], wc_left - wc[k], taken + (k,)))
+    if best is None:
+        return None
+    chosen = np.zeros(n, dtype=bool)
+    chosen[list(best)] = True
+    return chosen
+
+
+def optimize_portfolio(assets, debt_capacity, working_capital_limit=np.inf,
+                       steps=DEBT_STEPS, iterations=30):
+    """Buy/lease plan with the largest advantage over leasing everything, under both constraints.
+
+    ``assets`` is a DataFrame of deal rows with a ``working_capital`` column
+    (missing means none).  Raises ``ValueError`` if a row is invalid (see
+    ``row_errors``) or the limits are negative.
+    """
+    if debt_capacity < 0 or working_capital_limit < 0:
+        raise ValueError("debt capacity and working capital limit must be non-negative")
+    columns, valid = columns_from_frame(assets)
+    if not valid.all():
+        errors = row_errors(columns)
+        raise ValueError("; ".join(f"asset row {i + 1}: {errors[i]}" for i in np.flatnonzero(~valid)))
+    result = evaluate(columns)
+    debt = columns["purchase_price"]
+    wc = np.nan_to_num(columns.get("working_capital", np.zeros(len(debt))))
+    gain = -result.nal  # advantage of buying over leasing (NAL > 0 recommends leasing)
+
+    # Debt on the capacity grid, rounded up; assets that can never fit drop out
+    unit = debt_capacity / steps if debt_capacity > 0 else 1.0
+    grid_debt = np.ceil(np.maximum(debt, 0) / unit - 1e-9).astype(int)
+    fits = (grid_debt <= steps) & (wc <= working_capital_limit)
+    candidates = np.flatnonzero((gain > 0) & fits)
+
+    def relaxed(multiplier):
+        values = gain[candidates] - multiplier * wc[candidates]
+        useful = values > 0
+        value, chosen = _knapsack(values[useful], grid_debt[candidates][useful], steps)
+        plan = np.zeros(len(gain), dtype=bool)
+        plan[candidates[useful][chosen]] = True
+        bound = value + (multiplier * working_capital_limit if multiplier else 0.0)
+        return plan, bound
+
+    # Greedy order for repairing plans: best gain per unit of working capital first
+    with np.errstate(divide="ignore"):
+        order = candidates[np.argsort(-gain[candidates] / np.maximum(wc[candidates], 1e-12), kind="stable")]
+
+    def repair(plan):
+        # Drop the worst purchases until working capital fits, then top up
+        plan = plan.copy()
+        wc_left = working_capital_limit - wc[plan].sum()
+        for i in order[::-1]:
+            if wc_left >= 0:
+                break
+            if plan[i]:
+                plan[i] = False
+                wc_left += wc[i]
+        debt_left = steps - grid_debt[plan].sum()
+        for i in order:
+            if not plan[i] and grid_debt[i] <= debt_left and wc[i] <= wc_left:
+                plan[i] = True
+                debt_left -= grid_debt[i]
+                wc_left -= wc[i]
+        return plan
+
+    plan, upper = relaxed(0.0)
+    multiplier = 0.0
+    if wc[plan].sum() > working_capital_limit:
+        # Bisect on the multiplier, keeping the best repaired plan and the lowest bound
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lo, hi = 0.0, float(np.nanmax(np.where(wc[candidates] > 0, gain[candidates] / wc[candidates], 0.0)))
+        best = repair(plan)
+        for _ in range(iterations):
+            mid = (lo + hi) / 2
+            trial, bound = relaxed(mid)
+            upper = min(upper, bound)
+            if wc[trial].sum() <= working_capital_limit:
+                hi = mid
+            else:
+                lo = mid
+            trial = repair(trial)
+            if gain[trial].sum() > gain[best].sum():
+                best, multiplier = trial, mid
+            if upper - gain[best].sum() <= 1e-9 * (1 + abs(upper)):
+                break
+        plan = best
+
+        if upper - gain[plan].sum() > 1e-9 * (1 + abs(upper)) and len(candidates) <= EXACT_LIMIT:
+            items = candidates[np.argsort(-gain[candidates], kind="stable")]
+            found = _branch_and_bound(gain[items], grid_debt[items], wc[items], steps,
+                                      working_capital_limit, gain[plan].sum())
+            if found is not False:
+                if found is not None:
+                    plan = np.zeros(len(gain), dtype=bool)
+                    plan[items[found]] = True
+                upper = gain[plan].sum()
+
+    return PortfolioPlan(
+        buy=plan,
+        npv_buy=result.npv_buy,
+        npv_lease=result.npv_lease,
+        debt=debt,
+        working_capital=wc,
+        advantage=float(gain[plan].sum()),
+        upper_bound=float(upper),
+        multiplier=multiplier,
+    )
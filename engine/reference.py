@@ -0,0 +1,61 @@
+"""Reference data shared by every session.
+
+Streamlit reruns ``main.py`` for each session on every interaction, but an
+imported module is built once per server process, so everything here exists
+once however many analysts are connected.  The objects are shared, so
+none can be changed in place: the mappings and tuples are read-only, and the
+historical financials table is handed out as a copy by
+``historic_financials()``, so a stray write never reaches other sessions.
+"""
+from types import MappingProxyType
+
+import pandas as pd
+
+# Fauji Foods baseline financials (PKR million)
+BASE_ASSETS = 160000
+BASE_LIABILITIES = 95000
+BASE_EQUITY = 65000
+BASE_EBIT = 18000
+BASE_NET_PROFIT = 9500
+BASE_DEBT = 70000
+
+BASELINE = MappingProxyType({
+    "Total Assets": BASE_ASSETS,
+    "Total Liabilities": BASE_LIABILITIES,
+    "Total Debt": BASE_DEBT,
+    "Equity": BASE_EQUITY,
+    "EBIT": BASE_EBIT,
+    "Net Profit": BASE_NET_PROFIT,
+})
+
+_HISTORIC_FINANCIALS = pd.DataFrame({"Metric": list(BASELINE), "Value": list(BASELINE.values())})
+
+
+def historic_financials():
+    """The historical financials table, as a copy the caller is free to change."""
+    return _HISTORIC_FINANCIALS.copy()
+
+
+# Scenario groups shown in tab 4, as (column, heading, scenario names)
+SCENARIO_CATEGORIES = (
+    (0, "📦 Equipment & Machinery",
+     ("Production Line Equipment", "Packaging Machinery", "Cold Storage Equipment")),
+    (0, "🚚 Fleet & Transportation", ("Distribution Truck Fleet", "Refrigerated Transport")),
+    (0, "🏭 Real Estate & Facilities",
+     ("Warehouse Facility", "Retail Outlet Expansion", "Factory Land Acquisition")),
+    (0, "💻 Technology & Systems", ("ERP System", "Solar Power System")),
+    (1, "📊 Financial Analysis Tools", ("Multi-Asset Portfolio", "NPV with Inflation", "Cash Flow Forecasting")),
+    (1, "📈 Comparative Scenarios", ("Growth Scenario Analysis", "Economic Downturn", "Technology Obsolescence")),
+    (1, "💰 Tax & Accounting Impact", ("Tax Shield Optimization", "Balance Sheet Impact", "Off-Balance Sheet")),
+    (1, "🎲 Strategic & Risk Assessment", ("Strategic Flexibility",)),
+    (1, "🌐 Specialized Sector Decisions",
+     ("Vendor Dependency Risk", "Market Positioning Strategy", "Food Safety Compliance",
+      "Energy-Intensive Assets", "Cross-Border Islamic Leasing")),
+)
+
+# The category lists pre-rendered as markdown, per column
+CATEGORY_MARKDOWN = tuple(
+    tuple((heading, "\n".join(f"• {name}" for name in names))
+          for col, heading, names in SCENARIO_CATEGORIES if col == column)
+    for column in (0, 1)
+)
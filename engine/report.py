@@ -0,0 +1,32 @@
+"""Excel report assembly."""
+import io
+import time
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+@dataclass
+class Workbook:
+    data: bytes
+    seconds: float  # time taken to build
+
+    @property
+    def size(self):
+        return len(self.data)
+
+
+def excel_bytes(sheets):
+    """Workbook bytes for ``(sheet_name, DataFrame, index)`` tuples, in order."""
+    excel_buffer = io.BytesIO()
+    with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
+        for sheet_name, df, index in sheets:
+            df.to_excel(writer, index=index, sheet_name=sheet_name)
+    return excel_buffer.getvalue()
+
+
+def build_workbook(sheets):
+    """Like ``excel_bytes`` but also records how long the build took."""
+    start = time.perf_counter()
+    data = excel_bytes(sheets)
+    return Workbook(data=data, seconds=time.perf_counter() - start)
@@ -0,0 +1,90 @@
+"""Vectorized bracketed root finding.
+
+``brentq`` runs Brent's method (inverse quadratic / secant steps safeguarded
+by bisection, as in ``scipy.optimize.brentq``) on many independent brackets at
+once: ``f`` maps an array of ``x`` values to an array of residuals, one per
+bracket, and each element converges on its own.
+"""
+import numpy as np
+
+_EPS = np.finfo(float).eps
+
+
+def brentq(f, a, b, xtol=1e-12, rtol=4 * _EPS, maxiter=100):
+    """Roots of ``f`` in ``[a, b]`` element-wise; NaN where not bracketed."""
+    xpre = np.array(a, dtype=float, copy=True)
+    xcur = np.array(b, dtype=float, copy=True)
+    fpre = np.asarray(f(xpre), dtype=float)
+    fcur = np.asarray(f(xcur), dtype=float)
+
+    root = np.full(xcur.shape, np.nan)
+    root = np.where(fpre == 0, xpre, root)
+    root = np.where(fcur == 0, xcur, root)
+    active = (np.sign(fpre) * np.sign(fcur) < 0) & np.isnan(root)
+
+    xblk, fblk = xpre.copy(), fpre.copy()
+    spre = scur = xcur - xpre
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            if not active.any():
+                break
+            new_block = (fpre != 0) & (fcur != 0) & (np.signbit(fpre) != np.signbit(fcur))
+            xblk = np.where(new_block, xpre, xblk)
+            fblk = np.where(new_block, fpre, fblk)
+            spre = np.where(new_block, xcur - xpre, spre)
+            scur = np.where(new_block, xcur - xpre, scur)
+
+            swap = np.abs(fblk) < np.abs(fcur)
+            xpre, xcur, xblk = (np.where(swap, xcur, xpre), np.where(swap, xblk, xcur),
+                                np.where(swap, xcur, xblk))
+            fpre, fcur, fblk = (np.where(swap, fcur, fpre), np.where(swap, fblk, fcur),
+                                np.where(swap, fcur, fblk))
+
+            delta = (xtol + rtol * np.abs(xcur)) / 2
+            sbis = (xblk - xcur) / 2
+            converged = active & ((fcur == 0) | (np.abs(sbis) < delta))
+            root = np.where(converged, xcur, root)
+            active &= ~converged
+            if not active.any():
+                break
+
+            # Secant when the bracket end is the previous point, else inverse quadratic
+            secant = -fcur * (xcur - xpre) / (fcur - fpre)
+            dpre = (fpre - fcur) / (xpre - xcur)
+            dblk = (fblk - fcur) / (xblk - xcur)
+            quadratic = -fcur * (fblk * dblk - fpre * dpre) / (dblk * dpre * (fblk - fpre))
+            stry = np.where(xpre == xblk, secant, quadratic)
+
+            interpolate = (np.abs(spre) > delta) & (np.abs(fcur) < np.abs(fpre))
+            accept = interpolate & (2 * np.abs(stry) < np.minimum(np.abs(spre), 3 * np.abs(sbis) - delta))
+            spre = np.where(accept, scur, sbis)
+            scur = np.where(accept, stry, sbis)
+
+            xpre, fpre = xcur, fcur
+            step = np.where(np.abs(scur) > delta, scur, np.where(sbis > 0, delta, -delta))
+            xcur = np.where(active, xcur + step, xcur)
+            fcur = np.where(active, np.asarray(f(xcur), dtype=float), fcur)
+
+    return root
+
+
+def first_sign_change(grid, values, near=None):
+    """Bracket per column from residuals ``values`` of shape ``(len(grid), n)``.
+
+    Returns ``(lo, hi)`` arrays (NaN where the residual never changes sign).
+    When ``near`` is given, the bracket closest to it is chosen.
+    """
+    grid = np.asarray(grid, dtype=float)
+    sign = np.sign(values)
+    change = sign[:-1] * sign[1:] <= 0
+    has = change.any(axis=0)
+    if near is None:
+        idx = np.argmax(change, axis=0)
+    else:
+        mid = (grid[:-1] + grid[1:]) / 2
+        distance = np.where(change, np.abs(mid[:, None] - np.asarray(near)[None, :]), np.inf)
+        idx = np.argmin(distance, axis=0)
+    lo = np.where(has, grid[idx], np.nan)
+    hi = np.where(has, grid[idx + 1], np.nan)
+    return lo, hi
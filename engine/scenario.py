@@ -0,0 +1,343 @@
+"""Scenario cash-flow engine.
+
+Builds the buy and lease cash flows for the predefined scenarios (tab 4)
+without touching Streamlit.  Parameters are evaluated column-wise: a batch of
+``n`` parameter sets becomes a dict of length-``n`` arrays, missing keys are
+NaN, and every scenario feature (subsidy, loan financing and down payment,
+declining balance, electricity savings, inflation, growth, real options,
+lease escalation, liquidation and obsolescence terminal values) is applied
+with masks over a ``(n, years)`` grid.  A single scenario is simply a batch
+of one.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from engine.columns import optional, present
+from engine.depreciation import schedule_from_columns as depreciation_schedule
+from engine.loan import LOAN_TERMS, loan_from_columns, loan_principal, net_purchase_price
+from engine.npv import npv
+
+REQUIRED_PARAMS = (
+    "purchase_price", "useful_life", "residual_value", "maintenance",
+    "lease_payment", "discount_rate", "tax_rate",
+)
+
+# Numeric params the engines read when present; absent (NaN) turns the feature off
+OPTIONAL_PARAMS = (
+    "aedb_subsidy", "government_subsidy", "interest_rate", "down_payment", "loan_term", "grace_period", "balloon",
+    "depreciation_rate_declining", "depreciation_switch_to_sl", "initial_allowance",
+    "electricity_savings", "tariff_increase", "inflation_rate", "base_growth", "revenue_decline",
+    "lease_escalation", "maintenance_included", "lease_term", "lease_term_vs_useful_life",
+    "liquidation_value", "manufacturer_buyback", "obsolescence_probability",
+    "option_expand_prob", "option_expand_value", "option_upgrade_prob", "option_upgrade_value",
+    "option_switch_prob", "option_abandon_prob",
+)
+
+
+@dataclass
+class ScenarioResult:
+    buy_cash_flows: np.ndarray
+    lease_cash_flows: np.ndarray
+    npv_buy: float
+    npv_lease: float
+    nal: float
+    net_purchase_price: float
+    initial_outlay: float
+    financed_amount: float
+    terminal_value: float
+
+    @property
+    def recommendation(self):
+        return "Lease" if self.nal > 0 else "Buy"
+
+
+@dataclass
+class BatchResult:
+    buy_cash_flows: np.ndarray  # (n, max_life + 1), zero past each row's life
+    lease_cash_flows: np.ndarray
+    useful_life: np.ndarray
+    discount_rate: np.ndarray
+    npv_buy: np.ndarray
+    npv_lease: np.ndarray
+    nal: np.ndarray
+    net_purchase_price: np.ndarray
+    initial_outlay: np.ndarray
+    financed_amount: np.ndarray
+    terminal_value: np.ndarray
+
+    def __len__(self):
+        return len(self.nal)
+
+    def result(self, i):
+        end = int(self.useful_life[i]) + 1
+        return ScenarioResult(
+            buy_cash_flows=self.buy_cash_flows[i, :end],
+            lease_cash_flows=self.lease_cash_flows[i, :end],
+            npv_buy=float(self.npv_buy[i]),
+            npv_lease=float(self.npv_lease[i]),
+            nal=float(self.nal[i]),
+            net_purchase_price=float(self.net_purchase_price[i]),
+            initial_outlay=float(self.initial_outlay[i]),
+            financed_amount=float(self.financed_amount[i]),
+            terminal_value=float(self.terminal_value[i]),
+        )
+
+
+def _is_number(value):
+    # Flags such as ``maintenance_included`` become 0/1 columns
+    return isinstance(value, (int, float, np.number, np.bool_))
+
+
+def to_columns(params_list):
+    """Turn a list of params dicts into a dict of float columns (NaN = absent)."""
+    n = len(params_list)
+    values = {}
+    for i, params in enumerate(params_list):
+        for key, value in params.items():
+            if _is_number(value):
+                values.setdefault(key, ([], []))
+                values[key][0].append(i)
+                values[key][1].append(value)
+    columns = {}
+    for key, (rows, column_values) in values.items():
+        columns[key] = np.full(n, np.nan)
+        columns[key][rows] = column_values
+    for key in REQUIRED_PARAMS:
+        if key not in columns or np.isnan(columns[key]).any():
+            raise KeyError(key)
+    return columns
+
+
+ROW_ERRORS = (
+    "missing required params",
+    "useful_life must be a whole number of years >= 1",
+    "loan_term must be at least 1 year",
+    "loan terms need an interest_rate",
+)
+
+
+def _row_problems(columns):
+    # One mask per entry of ROW_ERRORS
+    n = len(columns["purchase_price"])
+    missing = np.zeros(n, dtype=bool)
+    for key in REQUIRED_PARAMS:
+        missing |= np.isnan(columns[key]) if key in columns else True
+    ul = columns["useful_life"] if "useful_life" in columns else np.ones(n)
+    with np.errstate(invalid="ignore"):
+        bad_life = ~np.isfinite(ul) | (ul < 1) | (ul != np.round(ul))
+    loan_term = columns.get("loan_term")
+    bad_term = np.zeros(n, dtype=bool) if loan_term is None else loan_term < 1
+    has_terms = np.zeros(n, dtype=bool)
+    for key in LOAN_TERMS:
+        has_terms |= present(columns, key)
+    no_rate = has_terms & ~present(columns, "interest_rate")
+    return missing, bad_life, bad_term, no_rate
+
+
+def row_errors(columns):
+    """Why each row of a batch cannot be evaluated (``""`` when it can).
+
+    A required param must be present, ``useful_life`` a whole number of years
+    of at least one, any ``loan_term`` at least one year, and a deal with loan
+    terms needs an ``interest_rate``.  Batch callers drop the rows flagged
+    here so one bad deal does not sink the rest.
+    """
+    return np.select(_row_problems(columns), ROW_ERRORS, default="")
+
+
+def check_rows(columns):
+    """Raise ``ValueError`` for the first row ``row_errors`` would reject."""
+    for mask, message in zip(_row_problems(columns), ROW_ERRORS):
+        if mask.any():
+            row = int(np.argmax(mask))
+            raise ValueError(message if len(mask) == 1 else f"row {row + 1}: {message}")
+
+
+def columns_from_frame(df):
+    """Float columns from a DataFrame of deal rows; non-numeric columns are ignored.
+
+    Rows that ``row_errors`` rejects are reported by ``valid`` rather than
+    raising, so one bad row does not sink a whole batch.
+    """
+    missing = [key for key in REQUIRED_PARAMS if key not in df.columns]
+    if missing:
+        raise KeyError(", ".join(missing))
+    columns = {}
+    for key in df.columns:
+        values = df[key]
+        if pd.api.types.is_bool_dtype(values) or pd.api.types.is_numeric_dtype(values):
+            columns[str(key)] = values.to_numpy(dtype=float, na_value=np.nan)
+    return columns, row_errors(columns) == ""
+
+
+def build_cash_flows(columns):
+    """Return ``(buy, lease, extras)`` for a batch of parameter columns.
+
+    ``buy`` and ``lease`` are ``(n, max_life + 1)`` matrices; ``extras`` holds
+    the per-row scalars the UI reports alongside the flows.  Features that no
+    row uses are skipped entirely, which keeps large homogeneous batches (e.g.
+    Monte Carlo paths of one scenario) cheap.  Raises ``ValueError`` if any
+    row is invalid (see ``row_errors``); batch callers drop those rows first.
+    """
+    check_rows(columns)
+    pp = columns["purchase_price"]
+    ul = columns["useful_life"].astype(int)
+    rv = columns["residual_value"]
+    maint = columns["maintenance"]
+    lp = columns["lease_payment"]
+    tr = columns["tax_rate"] / 100
+    n = len(pp)
+    horizon = int(ul.max()) if n else 0
+
+    year = np.arange(horizon)[None, :]
+    c = lambda a: np.asarray(a)[:, None]
+
+    buy = np.zeros((n, horizon + 1))
+    lease = np.zeros((n, horizon + 1))
+    buy_cf = buy[:, 1:]
+    lease_cf = lease[:, 1:]
+
+    # Depreciation tax shield (straight-line, or declining balance when a rate is given)
+    buy_cf += depreciation_schedule(columns, horizon + 1)[:, 1:] * c(tr)
+
+    # Buy option cash flows (financing is added once the flows are complete)
+    buy_cf -= c(maint * (1 - tr))
+
+    # Lease option cash flows (escalation steps in on every third year)
+    adjusted_lp = np.broadcast_to(c(lp), buy_cf.shape)
+    has_escalation = present(columns, "lease_escalation")
+    if has_escalation.any():
+        escalates = c(has_escalation) & (year > 0) & (year % 3 == 0)
+        adjusted_lp = np.where(
+            escalates,
+            c(lp) * (1 + c(optional(columns, "lease_escalation")) / 100) ** (year // 3),
+            adjusted_lp,
+        )
+    lease_cf -= adjusted_lp * c(1 - tr)
+    maintenance_excluded = optional(columns, "maintenance_included", 1.0) == 0
+    if maintenance_excluded.any():
+        lease_cf -= c(np.where(maintenance_excluded, maint * (1 - tr), 0.0))
+
+    # Shared per-year adjustments
+    has_savings = present(columns, "electricity_savings")
+    if has_savings.any():
+        elec_savings = np.where(
+            c(has_savings),
+            c(optional(columns, "electricity_savings")) * (1 + c(optional(columns, "tariff_increase")) / 100) ** year,
+            0.0,
+        )
+        buy_cf += elec_savings
+        lease_cf += elec_savings
+    has_inflation = present(columns, "inflation_rate")
+    if has_inflation.any():
+        inflation_adj = np.where(
+            c(has_inflation),
+            1 / (1 + c(optional(columns, "inflation_rate")) / 100) ** year,
+            1.0,
+        )
+        buy_cf *= inflation_adj
+        lease_cf *= inflation_adj
+    has_growth = present(columns, "base_growth")
+    if has_growth.any():
+        growth = c(pp * optional(columns, "base_growth") / 100) * (year + 1)
+        growth = np.where(c(has_growth), growth, 0.0)
+        buy_cf += growth * 0.1
+        lease_cf += growth * 0.12  # Higher for lease flexibility
+
+    # Flexibility premium for leasing under an economic downturn
+    has_downturn = present(columns, "revenue_decline")
+    if has_downturn.any():
+        lease_cf += np.where(c(has_downturn), adjusted_lp * 0.15, 0.0)
+
+    # Real options: mid-life option value for buying, flexibility for leasing
+    has_options = present(columns, "option_expand_prob")
+    if has_options.any():
+        expand_prob = optional(columns, "option_expand_prob") / 100
+        option_value = (
+            expand_prob * optional(columns, "option_expand_value") * 0.2
+            + optional(columns, "option_upgrade_prob") / 100 * optional(columns, "option_upgrade_value") * 0.15
+        )
+        if horizon > 3:
+            buy_cf[:, 3] += np.where(has_options, option_value, 0.0)
+        lease_flexibility = (
+            expand_prob * 0.25
+            + optional(columns, "option_abandon_prob") / 100 * 0.30
+            + optional(columns, "option_switch_prob") / 100 * 0.20
+        )
+        lease_cf += np.where(c(has_options), c(lease_flexibility) * adjusted_lp, 0.0)
+
+    # Rows shorter than the batch horizon stop at their own useful life
+    active = year < ul[:, None]
+    if not active.all():
+        buy_cf *= active
+        lease_cf *= active
+
+    # Subsidy, then debt financing: the loan is drawn at inception and repaid within the life
+    net_price = net_purchase_price(columns)
+    financed_amount = loan_principal(columns)
+    initial_outlay = net_price - financed_amount
+    buy[:, 0] = -net_price
+    if (financed_amount > 0).any():
+        buy += loan_from_columns(columns, financed_amount, horizon=horizon).after_tax_flows(tr)
+
+    # Terminal value considerations
+    terminal_value = rv
+    has_liquidation = present(columns, "liquidation_value")
+    if has_liquidation.any():
+        terminal_value = np.where(
+            has_liquidation,
+            optional(columns, "liquidation_value") * 0.5 + rv * 0.5,
+            terminal_value,
+        )
+    has_obsolescence = present(columns, "obsolescence_probability")
+    if has_obsolescence.any():
+        obs_prob = optional(columns, "obsolescence_probability") / 100
+        terminal_value = np.where(
+            has_obsolescence,
+            rv * (1 - obs_prob) + optional(columns, "manufacturer_buyback", rv * 0.5) * obs_prob,
+            terminal_value,
+        )
+    buy[np.arange(n), ul] += terminal_value
+
+    extras = {
+        "useful_life": ul,
+        "net_purchase_price": net_price,
+        "initial_outlay": initial_outlay,
+        "financed_amount": financed_amount,
+        "terminal_value": terminal_value,
+    }
+    return buy, lease, extras
+
+
+def evaluate(columns):
+    """Build and discount a batch of scenarios in one pass."""
+    buy, lease, extras = build_cash_flows(columns)
+    dr = columns["discount_rate"] / 100
+    npv_buy = npv(dr, buy)
+    npv_lease = npv(dr, lease)
+    return BatchResult(
+        buy_cash_flows=buy,
+        lease_cash_flows=lease,
+        discount_rate=dr,
+        npv_buy=npv_buy,
+        npv_lease=npv_lease,
+        nal=npv_buy - npv_lease,
+        **extras,
+    )
+
+
+def compute_batch(params_list):
+    return evaluate(to_columns(list(params_list)))
+
+
+def compute_scenario(params):
+    return compute_batch([params]).result(0)
+
+
+def compute_scenarios(scenarios):
+    """Evaluate every entry of a ``SCENARIOS``-style mapping in one call."""
+    names = list(scenarios)
+    batch = compute_batch(scenarios[name]["params"] for name in names)
+    return {name: batch.result(i) for i, name in enumerate(names)}
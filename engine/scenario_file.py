@@ -0,0 +1,81 @@
+"""Predefined scenarios, loaded from ``scenarios.json``.
+
+The file maps each scenario name to ``{"description", "params"}`` plus an
+optional ``"notes"`` dict of per-param remarks.  It is parsed and validated
+once per process and handed out as nested read-only mappings shared by every
+session; ``load_scenarios`` re-reads it only when the file's mtime changes, so
+scenarios can be edited while the server is running.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from types import MappingProxyType
+
+from engine.scenario import REQUIRED_PARAMS
+
+SCENARIOS_PATH = Path(__file__).resolve().parent.parent / "scenarios.json"
+
+_lock = threading.Lock()
+_loaded = {}  # path -> (mtime_ns, scenarios)
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_scenarios(data, source="scenarios"):
+    """Check the structure of parsed scenario data; raises ``ValueError``."""
+    if not isinstance(data, dict) or not data:
+        raise ValueError(f"{source}: expected a non-empty object of scenarios")
+    for name, scenario in data.items():
+        where = f"{source}: scenario '{name}'"
+        if not isinstance(scenario, dict):
+            raise ValueError(f"{where} must be an object")
+        unknown = set(scenario) - {"description", "params", "notes"}
+        if unknown:
+            raise ValueError(f"{where} has unknown fields: {', '.join(sorted(unknown))}")
+        if not isinstance(scenario.get("description"), str):
+            raise ValueError(f"{where} needs a 'description' string")
+        params = scenario.get("params")
+        if not isinstance(params, dict):
+            raise ValueError(f"{where} needs a 'params' object")
+        for key in REQUIRED_PARAMS:
+            if not _is_number(params.get(key)):
+                raise ValueError(f"{where} needs a numeric '{key}' param")
+        if params["useful_life"] != int(params["useful_life"]) or params["useful_life"] < 1:
+            raise ValueError(f"{where}: 'useful_life' must be a whole number of years >= 1")
+        for key, value in params.items():
+            if not isinstance(value, (int, float, str)):
+                raise ValueError(f"{where}: param '{key}' must be a number, boolean or string")
+        notes = scenario.get("notes", {})
+        if not isinstance(notes, dict) or not all(isinstance(v, str) for v in notes.values()):
+            raise ValueError(f"{where}: 'notes' must map param names to strings")
+        missing = set(notes) - set(params)
+        if missing:
+            raise ValueError(f"{where}: notes for unknown params: {', '.join(sorted(missing))}")
+    return data
+
+
+def _freeze(obj):
+    if isinstance(obj, dict):
+        return MappingProxyType({key: _freeze(value) for key, value in obj.items()})
+    return obj
+
+
+def load_scenarios(path=SCENARIOS_PATH):
+    """Validated, read-only scenarios from ``path``, re-read when its mtime changes."""
+    path = Path(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding="utf-8") as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError as exc:
+                raise ValueError(f"{path.name}: {exc}") from None
+        scenarios = _freeze(validate_scenarios(data, path.name))
+        _loaded[path] = (mtime, scenarios)
+        return scenarios
@@ -0,0 +1,150 @@
+"""Two-dimensional NAL sensitivity surfaces.
+
+``nal_surface`` evaluates NAL over the full ``len(y) x len(x)`` grid of two
+scenario params in one batched pass.  When one axis is the discount rate the
+cash flows do not depend on it, so only the other axis is built and the grid
+is a single ``npv_grid`` matrix product over ``buy - lease``.  ``zero_contour``
+traces the NAL = 0 break-even line by linear interpolation between cells.
+
+``tornado`` is the one-at-a-time view: every numeric param is moved down and
+up by the same fraction with the rest held at base, and the params are
+ranked by how far NAL swings.  The base deal and all ``2K`` perturbed deals
+are one batch, so a scenario with dozens of params is still one ``evaluate``.
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+from engine.npv import npv_grid
+from engine.scenario import build_cash_flows, evaluate, to_columns
+
+SURFACE_PARAMS = (
+    "discount_rate", "lease_payment", "tax_rate", "residual_value",
+    "maintenance", "purchase_price", "lease_escalation", "inflation_rate",
+)
+
+
+def axis_values(params, name, spread=0.5, size=200):
+    """``size`` evenly spaced values of ``name`` within ``+/- spread`` of its current value."""
+    value = float(params[name])
+    span = abs(value) * spread or spread
+    return np.linspace(max(value - span, 0.0), value + span, size)
+
+
+def _tiled(columns, key, values):
+    n = len(values)
+    out = {k: np.repeat(v, n) for k, v in columns.items()}
+    out[key] = np.asarray(values, dtype=float)
+    return out
+
+
+def nal_surface(params, x_param, x_values, y_param, y_values):
+    """NAL for every ``(y, x)`` pair, shape ``(len(y_values), len(x_values))``."""
+    for name in (x_param, y_param):
+        if name not in SURFACE_PARAMS:
+            raise ValueError(f"Cannot vary '{name}'; choose from {', '.join(SURFACE_PARAMS)}")
+    if x_param == y_param:
+        raise ValueError("Choose two different params for the surface")
+
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    base = to_columns([params])
+
+    if "discount_rate" in (x_param, y_param):
+        rates, other, values = (
+            (x_values, y_param, y_values) if x_param == "discount_rate" else (y_values, x_param, x_values)
+        )
+        buy, lease, _ = build_cash_flows(_tiled(base, other, values))
+        grid = npv_grid(rates / 100, buy - lease)  # (rates, other)
+        return grid.T if x_param == "discount_rate" else grid
+
+    columns = _tiled(base, x_param, np.tile(x_values, len(y_values)))
+    columns[y_param] = np.repeat(y_values, len(x_values))
+    return evaluate(columns).nal.reshape(len(y_values), len(x_values))
+
+
+def zero_contour(x_values, y_values, nal):
+    """Points ``(x, y)`` where the surface crosses NAL = 0.
+
+    Crossings are interpolated along both axes so the line is sampled densely
+    whether it runs steep or shallow across the grid.
+    """
+    x_values = np.asarray(x_values, dtype=float)
+    y_values = np.asarray(y_values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Along y, one crossing per column pair of neighbouring rows
+        rows, cols = np.nonzero(np.sign(nal[:-1]) * np.sign(nal[1:]) < 0)
+        lo, hi = nal[rows, cols], nal[rows + 1, cols]
+        y_pts = y_values[rows] + (y_values[rows + 1] - y_values[rows]) * lo / (lo - hi)
+        x_cross = x_values[cols]
+        # Along x
+        rows2, cols2 = np.nonzero(np.sign(nal[:, :-1]) * np.sign(nal[:, 1:]) < 0)
+        lo, hi = nal[rows2, cols2], nal[rows2, cols2 + 1]
+        x_pts = x_values[cols2] + (x_values[cols2 + 1] - x_values[cols2]) * lo / (lo - hi)
+    exact_y, exact_x = np.nonzero(nal == 0)
+    return (
+        np.concatenate([x_cross, x_pts, x_values[exact_x]]),
+        np.concatenate([y_pts, y_values[rows2], y_values[exact_y]]),
+    )
+
+
+@dataclass
+class Tornado:
+    """Per-param NAL at the low and high values, sorted by swing (largest first)."""
+    base_nal: float
+    params: list
+    base: np.ndarray
+    low: np.ndarray
+    high: np.ndarray
+    nal_low: np.ndarray
+    nal_high: np.ndarray
+    swing: np.ndarray
+
+
+def _perturbable(value):
+    # Flags (``maintenance_included``, ``imported_equipment``, ...) have no +/- X%
+    return isinstance(value, (int, float, np.integer, np.floating)) and not isinstance(value, bool)
+
+
+def tornado(params, spread=0.1):
+    """NAL with each numeric param of ``params`` moved ``+/- spread`` (a fraction) alone.
+
+    Integer params such as ``useful_life`` move by whole units, at least one,
+    and counts stay at least one; values never cross zero.  Params the engine
+    does not read are kept, with zero swing.
+    """
+    if spread <= 0:
+        raise ValueError("spread must be positive")
+    names = [key for key, value in params.items() if _perturbable(value)]
+    base = np.array([float(params[key]) for key in names])
+    integer = np.array([isinstance(params[key], (int, np.integer)) for key in names], dtype=bool)
+
+    step = np.abs(base) * spread
+    step = np.where(integer & (base != 0), np.maximum(np.round(step), 1.0), step)
+    low = np.where(base > 0, np.maximum(base - step, 0.0), base - step)
+    low = np.where(integer & (base >= 1), np.maximum(low, 1.0), low)
+    high = np.where(base < 0, np.minimum(base + step, 0.0), base + step)
+
+    # Row 0 is the base deal, rows 1..K move one param down, K+1..2K move it up
+    k = len(names)
+    columns = {key: np.repeat(value, 2 * k + 1) for key, value in to_columns([params]).items()}
+    for i, key in enumerate(names):
+        columns[key][1 + i] = low[i]
+        columns[key][1 + k + i] = high[i]
+    nal = evaluate(columns).nal
+    base_nal, nal_low, nal_high = nal[0], nal[1:k + 1], nal[k + 1:]
+
+    # Range of NAL over low, base and high (a param need not move NAL monotonically)
+    swing = (np.maximum(np.maximum(nal_low, nal_high), base_nal)
+             - np.minimum(np.minimum(nal_low, nal_high), base_nal))
+    order = np.argsort(-swing, kind="stable")
+    return Tornado(
+        base_nal=float(base_nal),
+        params=[names[i] for i in order],
+        base=base[order],
+        low=low[order],
+        high=high[order],
+        nal_low=nal_low[order],
+        nal_high=nal_high[order],
+        swing=swing[order],
+    )
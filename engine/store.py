@@ -0,0 +1,266 @@
+"""Persistent results store shared by every process on the host.
+
+A SQLite database in WAL mode holds pickled engine results (scenario cash
+flows and NPVs, sensitivity grids, reports, ...) under the ``RESULT_CACHE``
+keys, namespaced by ``ENGINE_VERSION`` (a hash of the engine's sources) so a
+change to the engine never serves old numbers (they are the first to be
+evicted).  It sits behind the in-memory LRU: a memory miss
+reads the store before computing, and computed results are written back.
+
+* Readers never block: WAL lets any number of processes read while one
+  writes, and a read is a single indexed ``SELECT``.
+* Writes (new results and access-time updates for eviction) are queued to one
+  writer thread per process that commits them in batches; SQLite's lock plus
+  a busy timeout serializes writers across processes.
+* The store is bounded by ``max_bytes``: after each batch the least recently
+  used entries are deleted until it is back under 90% of the limit.
+* ``warm`` loads the most recently used entries into a memory cache, so a
+  restarted replica answers from memory straight away.
+
+The store is opt-in: set ``LEASE_BUY_STORE`` to the database file (e.g.
+``.cache/results.sqlite3``) to turn it on, and ``LEASE_BUY_STORE_MB`` to cap
+it (default 512 megabytes).  Without it results are cached in memory only.
+"""
+import atexit
+import os
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from engine import ENGINE_VERSION
+
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "results.sqlite3"
+DEFAULT_MAX_MB = 512
+
+# Access times are refreshed at most this often per entry (seconds), which is
+# plenty for LRU ordering and keeps hot reads from turning into writes
+TOUCH_INTERVAL = 60.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    version TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (version, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+"""
+
+
+class ResultStore:
+    """Size-bounded pickle store in SQLite; safe to share between processes."""
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 version=ENGINE_VERSION, clock=time.time):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.version = version
+        self._clock = clock
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        self._reset()
+        db = self._connect()
+        try:
+            db.executescript(_SCHEMA)
+        finally:
+            db.close()
+
+    def _reset(self):
+        # Connections, the queue and the writer thread do not survive a fork
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer = None
+        self._touched = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def _reader(self):
+        if self._pid != os.getpid():
+            self._reset()
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    def get(self, key, default=None):
+        try:
+            row = self._reader().execute(
+                "SELECT value, accessed FROM results WHERE version = ? AND key = ?", (self.version, key)
+            ).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            return default
+        if row is None:
+            self.misses += 1
+            return default
+        try:
+            value = pickle.loads(row[0])
+        except Exception:  # written by an incompatible build; drop it
+            self.errors += 1
+            self._enqueue(("delete", key))
+            return default
+        self.hits += 1
+        now = self._clock()
+        if now - row[1] > TOUCH_INTERVAL and now - self._touched.get(key, 0.0) > TOUCH_INTERVAL:
+            if len(self._touched) > 10_000:
+                self._touched.clear()
+            self._touched[key] = now
+            self._enqueue(("touch", key, now))
+        return value
+
+    def set(self, key, value):
+        """Queue ``value`` to be written; values that cannot be pickled are skipped."""
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            self.errors += 1
+            return
+        if len(blob) > self.max_bytes // 10:
+            return  # one entry may not crowd out the rest
+        self._enqueue(("set", key, blob, self._clock()))
+
+    def _enqueue(self, op):
+        if self._pid != os.getpid():
+            self._reset()
+        self._queue.put(op)
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="result-store-writer",
+                                                daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            ops = [self._queue.get()]
+            while len(ops) < 500:
+                try:
+                    ops.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(db, ops)
+            except sqlite3.Error:
+                self.errors += 1
+            finally:
+                for _ in ops:
+                    self._queue.task_done()
+
+    def _apply(self, db, ops):
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            for op in ops:
+                if op[0] == "set":
+                    _, key, blob, now = op
+                    db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                               (self.version, key, blob, len(blob), now))
+                    self.writes += 1
+                elif op[0] == "touch":
+                    db.execute("UPDATE results SET accessed = ? WHERE version = ? AND key = ?",
+                               (op[2], self.version, op[1]))
+                else:
+                    db.execute("DELETE FROM results WHERE version = ? AND key = ?", (self.version, op[1]))
+            if any(op[0] == "set" for op in ops):
+                self._evict(db)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        target = 0.9 * self.max_bytes
+        doomed = []
+        # Other engine versions' results first (they can only be served to
+        # replicas still running that version), then the least recently used
+        rows = db.execute("SELECT version, key, size FROM results ORDER BY version = ?, accessed",
+                          (self.version,))
+        for version, key, size in rows:
+            if total <= target:
+                break
+            doomed.append((version, key))
+            total -= size
+        db.executemany("DELETE FROM results WHERE version = ? AND key = ?", doomed)
+        self.evictions += len(doomed)
+
+    def flush(self):
+        """Wait until every queued write is committed."""
+        if self._pid == os.getpid():
+            self._queue.join()
+
+    def warm(self, cache, limit=None):
+        """Load the most recently used entries into ``cache``; returns how many."""
+        limit = cache.maxsize if limit is None else limit
+        try:
+            rows = self._reader().execute(
+                "SELECT key, value FROM results WHERE version = ? ORDER BY accessed DESC LIMIT ?",
+                (self.version, int(limit)),
+            ).fetchall()
+        except sqlite3.Error:
+            self.errors += 1
+            return 0
+        loaded = 0
+        for key, blob in reversed(rows):  # oldest first, so the newest end up most recent
+            try:
+                cache.set(key, pickle.loads(blob), persist=False)
+            except Exception:
+                continue
+            loaded += 1
+        return loaded
+
+    def clear(self):
+        self.flush()
+        self._reader().execute("DELETE FROM results WHERE version = ?", (self.version,))
+
+    def stats(self):
+        try:
+            entries, size = self._reader().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results WHERE version = ?", (self.version,)
+            ).fetchone()
+        except sqlite3.Error:
+            entries, size = 0, 0
+        lookups = self.hits + self.misses
+        return {
+            "path": str(self.path),
+            "version": self.version,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "errors": self.errors,
+        }
+
+
+def open_store():
+    """The store configured by the environment, or ``None`` when it is off or unusable."""
+    path = os.environ.get("LEASE_BUY_STORE", "")
+    if not path:
+        return None
+    max_mb = float(os.environ.get("LEASE_BUY_STORE_MB", DEFAULT_MAX_MB))
+    try:
+        store = ResultStore(path, int(max_mb * 1024 * 1024))
+    except (OSError, sqlite3.Error):
+        return None
+    atexit.register(store.flush)
+    return store
@@ -0,0 +1,187 @@
+"""Named timing spans for the app's hot paths.
+
+A *run* is one Streamlit rerun (or a fragment rerunning on its own).  Inside
+it, ``span(name)`` times a block and ``timed(name)`` a function; a name used
+several times in a run adds up, with a call count.  ``lap(name)`` marks the
+start of the next stage of the innermost span, so a long straight-line block
+(the sidebar, or tab 4's chain of scenario sections) is split into stages
+without re-indenting it: each lap lasts until the next one or the end of the
+enclosing span.
+
+When a run finishes, its per-span totals are added to ``RUN_STATS``, which
+keeps the last ``HISTORY`` values of each span across all sessions for
+p50/p95, and logged as one JSON line on the ``lease_buy.timing`` logger.  Set
+``LEASE_BUY_TIMING_LOG`` to a file path to write that log.
+
+The current run lives in a context variable, so concurrent sessions (each
+rerun on its own thread) never mix their spans.  A rerun that is cut short
+leaves its run open; the next ``start_run`` on that thread finishes it.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+HISTORY = 1000
+
+logger = logging.getLogger("lease_buy.timing")
+if os.environ.get("LEASE_BUY_TIMING_LOG"):
+    _handler = logging.FileHandler(os.environ["LEASE_BUY_TIMING_LOG"])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_current = contextvars.ContextVar("timing_run", default=None)
+
+
+class Run:
+    def __init__(self, name, session=None, clock=time.perf_counter):
+        self.name = name
+        self.session = session
+        self._clock = clock
+        self.start = clock()
+        self.seconds = None
+        self.spans = {}  # name -> [calls, seconds]
+        self._laps = [[None, 0.0]]  # per open span: current lap name and start
+
+    def add(self, name, seconds):
+        entry = self.spans.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def lap(self, name):
+        now = self._clock()
+        frame = self._laps[-1]
+        if frame[0] is not None:
+            self.add(frame[0], now - frame[1])
+        frame[0], frame[1] = name, now
+
+    def _enter(self):
+        self._laps.append([None, 0.0])
+
+    def _exit(self):
+        self.lap(None)
+        self._laps.pop()
+
+    def record(self):
+        return {
+            "ts": time.time(),
+            "event": self.name,
+            "session": self.session,
+            "total_ms": round(self.seconds * 1000, 3),
+            "spans": {name: {"calls": calls, "ms": round(seconds * 1000, 3)}
+                      for name, (calls, seconds) in self.spans.items()},
+        }
+
+
+class TimingStats:
+    """Recent per-run totals of every span, shared by all sessions."""
+
+    def __init__(self, history=HISTORY):
+        self.history = history
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def add(self, run):
+        with self._lock:
+            for name, (_, seconds) in [(run.name, (1, run.seconds)), *run.spans.items()]:
+                self._values.setdefault(name, deque(maxlen=self.history)).append(seconds * 1000)
+
+    def summary(self):
+        """One row per span: runs seen, last, p50, p95 and max in milliseconds."""
+        with self._lock:
+            values = {name: np.array(v) for name, v in self._values.items()}
+        rows = [{
+            "Span": name,
+            "Runs": len(v),
+            "Last (ms)": v[-1],
+            "p50 (ms)": np.percentile(v, 50),
+            "p95 (ms)": np.percentile(v, 95),
+            "Max (ms)": v.max(),
+        } for name, v in values.items()]
+        columns = ["Span", "Runs", "Last (ms)", "p50 (ms)", "p95 (ms)", "Max (ms)"]
+        return pd.DataFrame(rows, columns=columns).sort_values("p95 (ms)", ascending=False, ignore_index=True)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+RUN_STATS = TimingStats()
+
+
+def start_run(name="rerun", session=None):
+    """Open a run as the current one.
+
+    A rerun cut short (an exception, ``st.stop`` or ``st.rerun``) never
+    reaches its ``finish_run``, so a run still open here is finished first.
+    """
+    stale = _current.get()
+    if stale is not None:
+        finish_run(stale)
+    run = Run(name, session)
+    _current.set(run)
+    return run
+
+
+def finish_run(run, stats=RUN_STATS):
+    """Close ``run``, add it to ``stats`` and log it; returns its JSON record."""
+    run.lap(None)
+    run.seconds = run._clock() - run.start
+    if _current.get() is run:
+        _current.set(None)
+    stats.add(run)
+    record = run.record()
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps(record, separators=(",", ":")))
+    return record
+
+
+def current_run():
+    return _current.get()
+
+
+@contextmanager
+def span(name):
+    """Time a block.  Outside a run (a fragment rerunning alone) it is a run of its own."""
+    run = _current.get()
+    if run is None:
+        run = start_run(name)
+        try:
+            yield
+        finally:
+            finish_run(run)
+        return
+    run._enter()
+    start = run._clock()
+    try:
+        yield
+    finally:
+        run._exit()
+        run.add(name, run._clock() - start)
+
+
+def timed(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def lap(name):
+    """Start stage ``name`` of the innermost open span (no-op outside a run)."""
+    run = _current.get()
+    if run is not None:
+        run.lap(name)
@@ -1,7 +1,37 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
+import altair as alt
 from datetime import datetime
-import io
+from uuid import uuid4
+
+from engine.breakeven import breakeven_table
+from engine.cache import RESULT_CACHE, memoize
+from engine.comparison import comparison_table
+from engine.cumulative import crossover, cumulative
+from engine.dataflow import Graph
+from engine.depreciation import schedule_from_columns as depreciation_schedule, tax_payable, tax_shield
+from engine.ifrs16 import schedule_from_columns
+from engine.irr import irr_table
+from engine.loan import loan_from_columns
+from engine.memory import process_rss, session_report
+from engine.montecarlo import default_distributions, simulate
+from engine.npv import npv, npv_grid
+from engine.periodic import annual_rollup, per_period_rate, period_cash_flows
+from engine.portfolio import default_assets, optimize_portfolio
+from engine.reference import (
+    BASE_ASSETS, BASE_DEBT, BASE_EBIT, BASE_EQUITY, BASE_LIABILITIES, BASE_NET_PROFIT, BASELINE,
+    CATEGORY_MARKDOWN, historic_financials
+)
+from engine.report import build_workbook
+from engine.scenario import compute_scenario, to_columns
+from engine.scenario_file import load_scenarios
+from engine.sensitivity import SURFACE_PARAMS, axis_values, nal_surface, tornado, zero_contour
+from engine.timing import RUN_STATS, finish_run, lap, start_run, timed
+
+# Every rerun is timed in named spans; see the Diagnostics panel in the sidebar
+diagnostics_run = start_run("rerun", session=st.session_state.setdefault("session_tag", uuid4().hex[:8]))
+lap("page.header")
 
 # ==============================
 # PAGE CONFIG
@@ -37,28 +67,473 @@ This project evaluates a **Lease vs Buy capital investment decision** and its im
 
 st.markdown("---")
 
-# ==============================
-# BASELINE FINANCIALS (PKR million)
-# ==============================
-BASE_ASSETS = 160000
-BASE_LIABILITIES = 95000
-BASE_EQUITY = 65000
-BASE_EBIT = 18000
-BASE_NET_PROFIT = 9500
-BASE_DEBT = 70000
-
 # ==============================
 # HELPER FUNCTIONS
 # ==============================
-def calculate_npv(rate, cash_flows):
-    return sum(cf / ((1 + rate) ** i) for i, cf in enumerate(cash_flows))
-
 def fmt(x):
     return f"₨{x:,.2f} M"
 
+# Results are cached process-wide, keyed by a canonical hash of the inputs.
+# Sessions with the same inputs then hold the same result objects rather than
+# copies of their own, so treat them as read-only.
+compute_scenario_cached = memoize(RESULT_CACHE, "scenario")(compute_scenario)
+sidebar_cash_flows = memoize(RESULT_CACHE, "sidebar_cash_flows")(period_cash_flows)
+sidebar_irr = memoize(RESULT_CACHE, "sidebar_irr")(irr_table)
+shared_default_assets = memoize(RESULT_CACHE, "default_assets")(default_assets)
+build_excel = memoize(RESULT_CACHE, "excel")(timed("excel.build")(build_workbook))
+
+# Table (including Styler formatting) and chart rendering, one span each per rerun
+show_dataframe = timed("render.dataframe")(st.dataframe)
+show_altair_chart = timed("render.chart")(st.altair_chart)
+show_line_chart = timed("render.chart")(st.line_chart)
+
+def excel_download(label, sheets, file_name):
+    # The workbook is only built when the button is clicked, then cached by input hash
+    built = RESULT_CACHE.get(build_excel.cache_key(sheets), count=False)
+    st.download_button(
+        label=label,
+        data=lambda: build_excel(sheets).data,
+        file_name=file_name,
+        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+    if built is None:
+        st.caption("The workbook is generated when you download it.")
+    else:
+        st.caption(f"Workbook: {built.size / 1024:,.1f} KB, built in {built.seconds * 1000:,.0f} ms")
+
+@memoize(RESULT_CACHE, "impact_df")
+def build_impact_df(purchase_price, loan_amount, loan_interest, maintenance, depreciation, dep_tax_shield, tax_rate,
+                    lease_liability, rou_asset, lease_interest, rou_depreciation):
+    # IFRS 16: the lease is on balance sheet; EBIT bears ROU depreciation, interest sits below it
+    return pd.DataFrame({
+        "Metric": ["Total Assets", "Total Liabilities", "Equity", "EBIT", "Net Profit"],
+        "Baseline": [BASE_ASSETS, BASE_LIABILITIES, BASE_EQUITY, BASE_EBIT, BASE_NET_PROFIT],
+        "After BUY": [
+            BASE_ASSETS + purchase_price,
+            BASE_LIABILITIES + loan_amount,
+            BASE_EQUITY,
+            BASE_EBIT - maintenance + depreciation,
+            BASE_NET_PROFIT + dep_tax_shield - (maintenance + loan_interest) * (1 - tax_rate)
+        ],
+        "After LEASE": [
+            BASE_ASSETS + rou_asset,
+            BASE_LIABILITIES + lease_liability,
+            BASE_EQUITY,
+            BASE_EBIT - rou_depreciation,
+            BASE_NET_PROFIT - (lease_interest + rou_depreciation) * (1 - tax_rate)
+        ]
+    })
+
+@memoize(RESULT_CACHE, "sidebar_lease_schedule")
+def sidebar_lease_schedule(ul, lp, dr, m, timing):
+    schedule = schedule_from_columns(
+        {"useful_life": np.array([float(ul)]), "lease_payment": np.array([lp]), "discount_rate": np.array([dr])},
+        m, timing)
+    return schedule, schedule.annual()
+
+@memoize(RESULT_CACHE, "sidebar_loan_schedule")
+def sidebar_loan_schedule(pp, ul, m, *loan):
+    columns = {
+        key: np.array([np.nan if value is None else float(value)])
+        for key, value in zip(("purchase_price", "useful_life", "interest_rate", "down_payment", "loan_term",
+                               "grace_period", "balloon"), (pp, ul) + loan)
+    }
+    return loan_df(loan_from_columns(columns, periods_per_year=m), m)
+
+def build_sidebar_graph():
+    # Rates and the tax rate are graph inputs in percent, as in custom_params.
+    # Cash flows do not depend on the discount rate, so a rate change only
+    # re-discounts them.
+    graph = Graph()
+    graph.derive("depreciation", ("purchase_price", "residual_value", "useful_life"),
+                 lambda pp, rv, ul: (pp - rv) / ul)
+    graph.derive("dep_tax_shield", ("depreciation", "tax_rate"), lambda dep, tr: dep * tr / 100)
+    loan_inputs = ("interest_rate", "down_payment", "loan_term", "grace_period", "balloon")
+    flow_inputs = ("purchase_price", "useful_life", "residual_value", "maintenance", "lease_payment",
+                   "tax_rate", "maintenance_included") + loan_inputs
+    graph.derive(
+        "cash_flows", flow_inputs + ("periods_per_year", "timing"),
+        lambda *args: sidebar_cash_flows(dict(zip(flow_inputs, args[:-2])), args[-2], args[-1])
+    )
+    graph.derive("annual_cash_flows", ("cash_flows", "periods_per_year"),
+                 lambda flows, m: tuple(annual_rollup(f, m)[0] for f in flows))
+    graph.derive("npvs", ("cash_flows", "discount_rate", "periods_per_year"),
+                 lambda flows, dr, m: tuple(npv(per_period_rate(dr, m), np.stack(flows))))
+    graph.derive("nal", ("npvs",), lambda npvs: npvs[0] - npvs[1])
+    graph.derive("irr", ("annual_cash_flows", "discount_rate"), lambda flows, dr: sidebar_irr(*flows, dr / 100))
+    lease_inputs = ("useful_life", "lease_payment", "discount_rate")
+    graph.derive("lease_schedule", lease_inputs + ("periods_per_year", "timing"), sidebar_lease_schedule)
+    graph.derive("annual_lease_schedule", ("lease_schedule",), lambda schedules: schedules[1])
+    # Yearly loan schedule (all zeros when the machine is bought for cash)
+    graph.derive("loan_schedule", ("purchase_price", "useful_life", "periods_per_year") + loan_inputs,
+                 sidebar_loan_schedule)
+    graph.derive(
+        "impact_df",
+        ("purchase_price", "maintenance", "depreciation", "dep_tax_shield",
+         "tax_rate", "loan_schedule", "annual_lease_schedule"),
+        lambda pp, maint, dep, shield, tr, loan, lease: build_impact_df(
+            pp, float(loan["Balance"].iloc[0]), float(loan["Interest"].iloc[1]), maint, dep, shield, tr / 100,
+            float(lease["liability"][0, 0]), float(lease["rou_asset"][0, 0]), float(lease["interest"][0, 1]),
+            float(lease["depreciation"][0, 1]))
+    )
+    return graph
+
+def fmt_rate(rate):
+    return "n/a" if np.isnan(rate) else f"{rate*100:.2f}%"
+
+def render_irr(table):
+    i1, i2, i3, i4 = st.columns(4)
+    i1.metric("IRR (Buy)", fmt_rate(table["irr_buy"]))
+    i2.metric("IRR (Lease)", fmt_rate(table["irr_lease"]))
+    i3.metric("Incremental IRR (Buy − Lease)", fmt_rate(table["irr_incremental"]))
+    i4.metric("Incremental MIRR", fmt_rate(table["mirr_incremental"]))
+    st.caption(
+        "Incremental IRR is the discount rate at which buying and leasing have equal NPV; MIRR finances "
+        "and reinvests at the discount rate. IRR is n/a when a stream's cash flows never change sign."
+    )
+    if table["incremental_sign_changes"] > 1:
+        st.warning(
+            f"The buy − lease cash flows change sign {table['incremental_sign_changes']} times, so they can "
+            "have more than one IRR; the one closest to the discount rate is shown."
+        )
+
+def loan_df(loan, periods_per_year):
+    years = annual_rollup(loan.interest, periods_per_year).shape[1]
+    return pd.DataFrame({
+        "Year": np.arange(years),
+        "Payment": annual_rollup(loan.payment, periods_per_year)[0],
+        "Interest": annual_rollup(loan.interest, periods_per_year)[0],
+        "Principal": annual_rollup(loan.repayment, periods_per_year)[0],
+        "Balance": loan.balance[0, np.minimum(np.arange(years) * periods_per_year, loan.balance.shape[1] - 1)]
+    })
+
+def lease_schedule_df(annual):
+    return pd.DataFrame({
+        "Year": np.arange(annual["payments"].shape[1]),
+        "Payment": annual["payments"][0],
+        "Interest": annual["interest"][0],
+        "Principal": annual["principal"][0],
+        "Lease Liability": annual["liability"][0],
+        "ROU Depreciation": annual["depreciation"][0],
+        "ROU Asset": annual["rou_asset"][0],
+        "P&L Charge": annual["interest"][0] + annual["depreciation"][0]
+    })
+
+@memoize(RESULT_CACHE, "ifrs16")
+def scenario_lease_schedule(params):
+    return lease_schedule_df(schedule_from_columns(to_columns([params])).annual())
+
+@memoize(RESULT_CACHE, "tax_depreciation")
+def scenario_tax_shield(params):
+    dep = depreciation_schedule(to_columns([params]))[0, 1:]
+    floors = {
+        "turnover": params.get("annual_turnover", 0.0),
+        "minimum_tax_rate": params.get("minimum_tax_rate", 0.0) / 100,
+        "act_rate": params.get("act_rate", 0.0) / 100,
+    }
+    tr = params["tax_rate"] / 100
+    shield = tax_shield(dep, BASE_EBIT, tr, **floors)
+    closing = params["purchase_price"] - np.cumsum(dep)
+    return pd.DataFrame({
+        "Year": np.arange(1, len(dep) + 1),
+        "Opening WDV": closing + dep,
+        "Depreciation": dep,
+        "Closing WDV": closing,
+        "Tax Payable": tax_payable(BASE_EBIT - dep, tr, accounting_profit=BASE_EBIT, **floors),
+        "Tax Shield": shield,
+    })
+
+@memoize(RESULT_CACHE, "breakeven")
+def scenario_breakeven(params):
+    return {target: float(values[0]) for target, values in breakeven_table([params]).items()}
+
+@memoize(RESULT_CACHE, "monte_carlo")
+def run_monte_carlo(params, n_paths, seed, periods_per_year=1, timing="arrears"):
+    result = simulate(params, n_paths, seed=seed, periods_per_year=periods_per_year, timing=timing)
+    counts, edges = np.histogram(result.nal, bins=60)
+    histogram = pd.DataFrame({
+        "NAL (PKR M)": np.round((edges[:-1] + edges[1:]) / 2, 2),
+        "Paths": counts
+    })
+    return result.summary(), histogram
+
+@st.fragment
+@timed("monte_carlo")
+def render_monte_carlo(params, key, periods_per_year=1, timing="arrears"):
+    st.subheader("🎲 Monte Carlo Simulation")
+    st.caption("Simulates " + ", ".join(
+        name.replace("_", " ") for name in default_distributions(params)
+    ) + " jointly and reports the distribution of NAL.")
+    mc_col1, mc_col2, mc_col3 = st.columns(3)
+    n_paths = mc_col1.select_slider(
+        "Paths", options=[10_000, 100_000, 250_000, 1_000_000], value=100_000, key=f"{key}_mc_paths"
+    )
+    seed = mc_col2.number_input("Random Seed", value=42, min_value=0, step=1, key=f"{key}_mc_seed")
+    mc_col3.write("")
+    if not mc_col3.checkbox("Run simulation", key=f"{key}_mc_run"):
+        return
+
+    summary, histogram = run_monte_carlo(params, n_paths, int(seed), periods_per_year, timing)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("P(Lease Wins)", f"{summary['p_lease_wins']*100:.1f}%")
+    col2.metric("Mean NAL", fmt(summary["nal_mean"]))
+    col3.metric("NAL 5th Percentile", fmt(summary["nal_p5"]))
+    col4.metric("NAL 95th Percentile", fmt(summary["nal_p95"]))
+
+    st.bar_chart(histogram.set_index("NAL (PKR M)"))
+
+    risk_df = pd.DataFrame([
+        {"Option": option.title(), "VaR (95%)": risk["VaR"], "CVaR (95%)": risk["CVaR"]}
+        for option, risk in summary["risk"].items()
+    ])
+    st.markdown("**Cost at Risk (negative NPV, 95% confidence):**")
+    show_dataframe(
+        risk_df.style.format({"VaR (95%)": "₨{:,.2f}M", "CVaR (95%)": "₨{:,.2f}M"}),
+        width='stretch'
+    )
+
+@memoize(RESULT_CACHE, "surface")
+def sensitivity_surface(params, x_param, y_param, spread, size):
+    x_values = axis_values(params, x_param, spread, size)
+    y_values = axis_values(params, y_param, spread, size)
+    nal = nal_surface(params, x_param, x_values, y_param, y_values)
+    dx = (x_values[-1] - x_values[0]) / (size - 1) / 2
+    dy = (y_values[-1] - y_values[0]) / (size - 1) / 2
+    surface = pd.DataFrame({
+        "x": np.tile(x_values - dx, size),
+        "x2": np.tile(x_values + dx, size),
+        "y": np.repeat(y_values - dy, size),
+        "y2": np.repeat(y_values + dy, size),
+        "NAL": nal.ravel()
+    })
+    contour_x, contour_y = zero_contour(x_values, y_values, nal)
+    contour = pd.DataFrame({"x": contour_x, "y": contour_y})
+    table = pd.DataFrame(nal, index=pd.Index(y_values, name=f"{y_param} \\ {x_param}"), columns=x_values)
+    return surface, contour, table.to_csv().encode("utf-8")
+
+def param_label(name):
+    label = name.replace("_", " ").title()
+    return f"{label} (%)" if name.endswith("_rate") or name == "lease_escalation" else f"{label} (PKR M)"
+
+@st.fragment
+@timed("sensitivity_surface")
+def render_sensitivity_surface(params, key):
+    st.markdown("**NAL Sensitivity Surface:**")
+    options = [name for name in SURFACE_PARAMS if name in params]
+    s_col1, s_col2, s_col3, s_col4 = st.columns(4)
+    x_param = s_col1.selectbox("X Axis", options, index=0, format_func=param_label, key=f"{key}_surface_x")
+    y_options = [name for name in options if name != x_param]
+    y_param = s_col2.selectbox("Y Axis", y_options, index=0, format_func=param_label, key=f"{key}_surface_y")
+    spread = s_col3.slider("Range (± %)", 10, 90, 50, 10, key=f"{key}_surface_spread")
+    size = s_col4.select_slider("Grid Size", options=[25, 50, 100, 200], value=100, key=f"{key}_surface_size")
+
+    surface, contour, table_csv = sensitivity_surface(params, x_param, y_param, spread / 100, size)
+    x_title, y_title = param_label(x_param), param_label(y_param)
+    limit = float(np.abs(surface["NAL"]).max()) or 1.0
+    heatmap = alt.Chart(surface).mark_rect().encode(
+        x=alt.X("x:Q", title=x_title, scale=alt.Scale(zero=False, nice=False)),
+        x2="x2:Q",
+        y=alt.Y("y:Q", title=y_title, scale=alt.Scale(zero=False, nice=False)),
+        y2="y2:Q",
+        color=alt.Color("NAL:Q", title="NAL (PKR M)",
+                        scale=alt.Scale(scheme="redblue", domain=[-limit, limit]))
+    )
+    breakeven_line = alt.Chart(contour).mark_circle(size=8, color="black", opacity=1).encode(
+        x="x:Q", y="y:Q"
+    )
+    show_altair_chart(heatmap + breakeven_line, width='stretch')
+    st.caption("Blue cells favour leasing (NAL > 0), red cells favour buying; the black line marks NAL = 0.")
+    st.download_button(
+        label="⬇️ Download Sensitivity Surface (CSV)",
+        data=table_csv,
+        file_name=f"NAL_Surface_{x_param}_vs_{y_param}.csv",
+        mime="text/csv",
+        key=f"{key}_surface_download"
+    )
+
+@memoize(RESULT_CACHE, "tornado")
+def tornado_table(params, spread):
+    result = tornado(params, spread)
+    base_sign = np.sign(result.base_nal)
+    flips = (np.sign(result.nal_low) != base_sign) | (np.sign(result.nal_high) != base_sign)
+    table = pd.DataFrame({
+        "Parameter": [name.replace("_", " ").title() for name in result.params],
+        "Base Value": result.base,
+        "Low Value": result.low,
+        "High Value": result.high,
+        "NAL (Low)": result.nal_low,
+        "NAL (High)": result.nal_high,
+        "Swing": result.swing,
+        "Flips Decision": np.where(flips, "Yes", "No")
+    })
+    return result.base_nal, table, table.to_csv(index=False).encode("utf-8")
+
+@st.fragment
+@timed("tornado")
+def render_tornado(params, key):
+    st.markdown("**Tornado Analysis (one parameter at a time):**")
+    t_col1, t_col2 = st.columns(2)
+    spread = t_col1.slider("Perturbation (± %)", 5, 50, 10, 5, key=f"{key}_tornado_spread")
+    top = t_col2.slider("Parameters Shown", 3, 20, 10, key=f"{key}_tornado_top")
+
+    base_nal, table, table_csv = tornado_table(params, spread / 100)
+    moving = table[table["Swing"] > 1e-9]
+    shown = moving.head(top)
+    bars = pd.DataFrame({
+        "Parameter": np.concatenate([shown["Parameter"], shown["Parameter"]]),
+        "Case": [f"-{spread}%"] * len(shown) + [f"+{spread}%"] * len(shown),
+        "NAL": np.concatenate([shown["NAL (Low)"], shown["NAL (High)"]]),
+        "Base": base_nal
+    })
+    tornado_chart = alt.Chart(bars).mark_bar().encode(
+        x=alt.X("NAL:Q", title="NAL (PKR M)"),
+        x2="Base:Q",
+        y=alt.Y("Parameter:N", sort=list(shown["Parameter"]), title=None),
+        color=alt.Color("Case:N", title="Change", scale=alt.Scale(range=["#d62728", "#1f77b4"])),
+        tooltip=["Parameter", "Case", alt.Tooltip("NAL:Q", format=",.2f")]
+    )
+    base_rule = alt.Chart(pd.DataFrame({"NAL": [base_nal]})).mark_rule(color="black").encode(x="NAL:Q")
+    show_altair_chart(tornado_chart + base_rule, width='stretch')
+    st.caption(f"Bars run from the base NAL ({fmt(base_nal)}, black line) to the NAL with one parameter "
+               f"moved {spread}% down or up; the widest swings are on top.")
+
+    show_dataframe(
+        moving.style.format({
+            "Base Value": "{:,.2f}",
+            "Low Value": "{:,.2f}",
+            "High Value": "{:,.2f}",
+            "NAL (Low)": "₨{:,.2f}M",
+            "NAL (High)": "₨{:,.2f}M",
+            "Swing": "₨{:,.2f}M"
+        }),
+        hide_index=True,
+        width='stretch'
+    )
+    idle = table["Parameter"][table["Swing"] <= 1e-9]
+    if len(idle):
+        st.caption(f"No effect on NAL: {', '.join(idle)}.")
+    st.download_button(
+        label="⬇️ Download Tornado Analysis (CSV)",
+        data=table_csv,
+        file_name="NAL_Tornado.csv",
+        mime="text/csv",
+        key=f"{key}_tornado_download"
+    )
+
+@st.fragment
+@timed("portfolio")
+def render_portfolio(params, key):
+    st.markdown("**Asset Register** (edit any row; buying an asset uses its price of debt capacity and its working capital):")
+    assets = st.data_editor(shared_default_assets(params), num_rows="dynamic", width='stretch', key=f"{key}_assets")
+    try:
+        plan = optimize_portfolio(assets, params["debt_capacity"], params["working_capital_impact"])
+    except (KeyError, ValueError) as exc:
+        st.warning(f"Cannot optimize this asset register: {exc}")
+        return
+
+    n_buy = int(plan.buy.sum())
+    o_col1, o_col2, o_col3, o_col4 = st.columns(4)
+    o_col1.metric("Optimal Mix", f"{n_buy} Buy / {len(plan.buy) - n_buy} Lease")
+    o_col2.metric("Advantage vs Leasing All", fmt(plan.advantage))
+    o_col3.metric("Debt Used", fmt(plan.debt_used), f"of {fmt(params['debt_capacity'])}", delta_color="off")
+    o_col4.metric("Working Capital Used", fmt(plan.working_capital_used),
+                  f"of {fmt(params['working_capital_impact'])}", delta_color="off")
+
+    plan_df = pd.DataFrame({
+        "Asset": assets.get("asset", pd.Series(range(1, len(assets) + 1))).to_numpy(),
+        "NPV (Buy)": plan.npv_buy,
+        "NPV (Lease)": plan.npv_lease,
+        "NAL": plan.npv_buy - plan.npv_lease,
+        "Recommendation": np.where(plan.npv_buy - plan.npv_lease > 0, "Lease", "Buy"),
+        "Decision": np.where(plan.buy, "Buy", "Lease")
+    })
+    show_dataframe(
+        plan_df.style.format({"NPV (Buy)": "₨{:,.2f}M", "NPV (Lease)": "₨{:,.2f}M", "NAL": "₨{:,.2f}M"}),
+        width='stretch'
+    )
+    st.caption("Decisions follow the same NAL rule as the recommendations (NAL > 0 favours leasing); an asset "
+               "recommended for buying is leased only when debt capacity or working capital runs out.")
+    if plan.gap > 0:
+        st.caption(f"Best plan found is within {fmt(plan.gap)} of the optimum (working-capital bound).")
+    else:
+        st.caption("Plan is optimal for the debt capacity (to 1/2000 of capacity) and working-capital limit.")
+
+@memoize(RESULT_CACHE, "comparison")
+def scenario_comparison(scenarios):
+    table = comparison_table(scenarios)
+    return table, table.to_csv(index=False).encode("utf-8")
+
+@st.fragment
+@timed("tab4.comparison")
+def render_scenario_comparison():
+    # The whole library is one batch, so this costs about as much as a single scenario
+    table, table_csv = scenario_comparison(SCENARIOS)
+    n_lease = int((table["Recommendation"] == "Lease").sum())
+    c_col1, c_col2, c_col3 = st.columns(3)
+    c_col1.metric("Scenarios", len(table))
+    c_col2.metric("Recommend Buy", len(table) - n_lease)
+    c_col3.metric("Recommend Lease", n_lease)
+    money = {name: "₨{:,.2f}M" for name in
+             ("Purchase Price", "NPV (Buy)", "NPV (Lease)", "NAL", "TCO (Buy)", "TCO (Lease)",
+              "After-tax Cost (Buy)", "After-tax Cost (Lease)")}
+    show_dataframe(
+        table.style.format({
+            **money,
+            "IRR (Buy)": "{:.2%}",
+            "IRR (Incremental)": "{:.2%}",
+            "Payback (Years)": "{:.1f}",
+            "Discounted Payback (Years)": "{:.1f}"
+        }, na_rep="–"),
+        hide_index=True,
+        width='stretch'
+    )
+    st.caption("Click a column header to sort. TCO is the pre-tax cost over the useful life, as in the "
+               "scenario view; the after-tax cost nets off tax shields and the residual recovered. Both are "
+               "undiscounted. Payback is blank where the outlay is never recovered.")
+    d_col1, d_col2 = st.columns(2)
+    with d_col1:
+        st.download_button(
+            label="⬇️ Download Comparison (CSV)",
+            data=table_csv,
+            file_name="Fauji_Foods_Scenario_Comparison.csv",
+            mime="text/csv"
+        )
+    with d_col2:
+        excel_download(
+            "⬇️ Download Comparison (Excel)",
+            (("Scenario Comparison", table, False),),
+            "Fauji_Foods_Scenario_Comparison.xlsx"
+        )
+
+def render_diagnostics(record):
+    # Spans are logged for every rerun; the panel only shows them
+    if not st.toggle("Show timings", key="diagnostics_on"):
+        st.caption("Timings are recorded for every rerun; switch on to view them.")
+        return
+    st.markdown(f"**This rerun:** {record['total_ms']:,.1f} ms")
+    spans = pd.DataFrame(
+        [{"Span": name, "Calls": span["calls"], "ms": span["ms"]} for name, span in record["spans"].items()],
+        columns=["Span", "Calls", "ms"]
+    ).sort_values("ms", ascending=False)
+    st.dataframe(spans.style.format({"ms": "{:,.1f}"}), hide_index=True, width='stretch')
+    st.markdown("**Across reruns (all sessions):**")
+    summary = RUN_STATS.summary()
+    st.dataframe(
+        summary.style.format({column: "{:,.1f}" for column in summary.columns if column.endswith("(ms)")}),
+        hide_index=True,
+        width='stretch'
+    )
+    cache = RESULT_CACHE.stats()
+    store = "persistent store off" if cache["store"] is None else f"{cache['store_hits']:,} hits from the persistent store"
+    st.caption(
+        f"Result cache: {cache['size']:,} of {cache['maxsize']:,} entries, {cache['hit_rate']:.0%} hit rate "
+        f"({store})"
+    )
+
 # ==============================
 # SIDEBAR INPUTS
 # ==============================
+lap("sidebar.inputs")
 with st.sidebar:
     st.header("🔧 Model Inputs")
 
@@ -74,604 +549,111 @@ with st.sidebar:
     st.subheader("💳 Purchase Mode")
     purchase_mode = st.radio("Machine Purchased Through:", ["Cash", "Credit"])
     interest_rate = 0.0
+    down_payment = loan_term = grace_period = balloon = None
     if purchase_mode == "Credit":
         interest_rate = st.number_input("Interest Rate (%)", value=14.0) / 100
+        loan_type = st.selectbox("Loan Type", ["Amortizing", "Balloon", "Bullet"])
+        down_payment = st.number_input("Down Payment (PKR million)", value=0.0, min_value=0.0)
+        loan_term = st.number_input("Loan Term (years)", value=int(useful_life), min_value=1,
+                                    max_value=int(useful_life))
+        grace_period = st.number_input("Grace Period (years, interest only)", value=0, min_value=0,
+                                       max_value=int(loan_term) - 1)
+        balloon = {"Amortizing": 0.0, "Bullet": 100.0}.get(loan_type)
+        if balloon is None:
+            balloon = float(st.slider("Balloon (% of loan due at maturity)", 5, 95, 30, 5))
 
     st.subheader("📜 Lease Terms")
     lease_payment = st.number_input("Annual Lease Payment (PKR million)", value=18.0)
     maintenance_included = st.checkbox("Maintenance Included in Lease?", True)
+    payment_frequency = st.selectbox("Payment Frequency", ["Annual", "Quarterly", "Monthly"])
+    payment_timing = st.radio("Lease Payments Made:", ["In Arrears", "In Advance"], horizontal=True)
 
 # ==============================
-# BUY OPTION CASH FLOWS
+# BUY & LEASE OPTION CASH FLOWS
 # ==============================
-depreciation = (purchase_price - residual_value) / useful_life
-dep_tax_shield = depreciation * tax_rate
+periods_per_year = {"Annual": 1, "Quarterly": 4, "Monthly": 12}[payment_frequency]
+timing = "advance" if payment_timing == "In Advance" else "arrears"
 
-buy_cash_flows = [-purchase_price]
-for _ in range(useful_life):
-    interest_expense = purchase_price * interest_rate if purchase_mode == "Credit" else 0
-    cf = dep_tax_shield - maintenance * (1 - tax_rate) - interest_expense * (1 - tax_rate)
-    buy_cash_flows.append(cf)
+# The sidebar model is a plain scenario: straight-line depreciation, a loan
+# only in Credit mode, maintenance added to the lease unless included
+custom_params = {
+    "purchase_price": purchase_price,
+    "useful_life": useful_life,
+    "residual_value": residual_value,
+    "maintenance": maintenance,
+    "lease_payment": lease_payment,
+    "discount_rate": discount_rate * 100,
+    "tax_rate": tax_rate * 100,
+    "interest_rate": interest_rate * 100 if purchase_mode == "Credit" else 0.0,
+    "maintenance_included": maintenance_included,
+    "down_payment": down_payment,
+    "loan_term": loan_term,
+    "grace_period": grace_period,
+    "balloon": balloon
+}
 
-buy_cash_flows[-1] += residual_value
-npv_buy = calculate_npv(discount_rate, buy_cash_flows)
+# Only the values downstream of a changed input are recomputed this run
+lap("sidebar.graph")
+if "sidebar_graph" not in st.session_state:
+    st.session_state.sidebar_graph = build_sidebar_graph()
+sidebar_graph = st.session_state.sidebar_graph
+sidebar_graph.update({
+    **custom_params,
+    "periods_per_year": periods_per_year,
+    "timing": timing
+})
 
-# ==============================
-# LEASE OPTION CASH FLOWS
-# ==============================
-lease_cash_flows = [0]
-for _ in range(useful_life):
-    cf = -lease_payment * (1 - tax_rate)
-    if not maintenance_included:
-        cf += -maintenance * (1 - tax_rate)
-    lease_cash_flows.append(cf)
+depreciation = sidebar_graph["depreciation"]
+dep_tax_shield = sidebar_graph["dep_tax_shield"]
+buy_cash_flows, lease_cash_flows = sidebar_graph["annual_cash_flows"]
+npv_buy, npv_lease = sidebar_graph["npvs"]
+nal = sidebar_graph["nal"]
+
+historic_df = historic_financials()
+impact_df = sidebar_graph["impact_df"]
+sidebar_lease_df = lease_schedule_df(sidebar_graph["annual_lease_schedule"])
+
+lap("sidebar.panels")
+with st.sidebar.expander("🔁 Recomputations This Session"):
+    show_dataframe(
+        pd.DataFrame(sidebar_graph.recompute_counts().items(), columns=["Value", "Computed"]),
+        hide_index=True,
+        width='stretch'
+    )
 
-npv_lease = calculate_npv(discount_rate, lease_cash_flows)
-nal = npv_buy - npv_lease
+@st.fragment
+def render_session_memory():
+    # Shared objects (cached results, reference data) exist once per process
+    if not st.checkbox("Measure this session's memory", key="session_memory_measure"):
+        st.caption("Walks the session's state, so it is off by default.")
+        return
+    report = session_report(st.session_state.to_dict(),
+                            shared_roots=(RESULT_CACHE.values(), BASELINE, CATEGORY_MARKDOWN))
+    show_dataframe(
+        report.style.format({"Private (KB)": "{:,.1f}", "Shared (KB)": "{:,.1f}"}),
+        hide_index=True,
+        width='stretch'
+    )
+    rss = process_rss()
+    st.caption(
+        f"Private: {report['Private (KB)'].sum():,.1f} KB · shared: {report['Shared (KB)'].sum():,.1f} KB"
+        + (f" · process RSS: {rss / 2**20:,.0f} MB" if rss else "")
+    )
+
+with st.sidebar.expander("🧠 Session Memory"):
+    render_session_memory()
 
 # ==============================
 # PREDEFINED SCENARIOS
 # ==============================
-SCENARIOS = {
-    "Production Line Equipment": {
-        "description": """**Production Line Equipment Analysis**
-        
-Create a comprehensive lease vs buy analysis for a new corn flakes production line worth PKR 150 million. 
-Include: upfront costs, monthly lease payments of PKR 2.5 million over 5 years, depreciation benefits 
-(15% declining balance), tax shields at 29% corporate tax rate, maintenance costs (3% annually for owned, 
-included in lease), salvage value (20% after 5 years), and opportunity cost of capital at 15%. 
-Present NPV comparison and break-even analysis.""",
-        "params": {
-            "purchase_price": 150.0,
-            "useful_life": 5,
-            "residual_value": 30.0,  # 20% salvage
-            "maintenance": 4.5,  # 3% annually
-            "lease_payment": 30.0,  # 2.5M monthly * 12
-            "discount_rate": 15.0,
-            "tax_rate": 29.0,
-            "depreciation_method": "Declining Balance (15%)"
-        }
-    },
-    "Packaging Machinery": {
-        "description": """**Packaging Machinery Decision**
-        
-Analyze whether Fauji Foods should lease or purchase automated packaging equipment for PKR 45 million. 
-Compare: 4-year lease at PKR 1.2 million/month vs purchase with 20% down payment and bank financing at 
-18% KIBOR+3%. Include technological obsolescence risk (equipment may be outdated in 3 years), production 
-capacity utilization (currently 65%), and flexibility to upgrade. Provide recommendation with sensitivity analysis.""",
-        "params": {
-            "purchase_price": 45.0,
-            "useful_life": 4,
-            "residual_value": 9.0,  # 20% after 4 years
-            "maintenance": 1.35,  # 3% annually
-            "lease_payment": 14.4,  # 1.2M monthly * 12
-            "discount_rate": 21.0,  # 18% + 3%
-            "tax_rate": 29.0,
-            "down_payment": 9.0,  # 20%
-            "capacity_utilization": 65
-        }
-    },
-    "Cold Storage Equipment": {
-        "description": """**Cold Storage Equipment**
-        
-Evaluate lease vs buy for cold storage refrigeration units (PKR 80 million). Consider: energy efficiency 
-improvements every 2 years, maintenance complexity, regulatory compliance costs, lease terms of 6 years at 
-PKR 1.4 million/month, and potential government subsidies for owned energy-efficient equipment (15% subsidy). 
-Calculate total cost of ownership vs leasing over 10-year horizon.""",
-        "params": {
-            "purchase_price": 80.0,
-            "useful_life": 10,
-            "residual_value": 16.0,  # 20% salvage
-            "maintenance": 2.4,  # 3% annually
-            "lease_payment": 16.8,  # 1.4M monthly * 12
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "government_subsidy": 12.0,  # 15% subsidy
-            "lease_term": 6
-        }
-    },
-    "Distribution Truck Fleet": {
-        "description": """**Distribution Truck Fleet**
-        
-Create a decision model for 25 distribution trucks (PKR 8 million each). Compare: operating lease vs 
-finance lease vs outright purchase. Include fuel costs (PKR 180/liter, 6 km/liter), driver salaries, 
-insurance (4% of vehicle value), maintenance (owned: PKR 15,000/month/truck, leased: included), resale 
-value depreciation (30% year 1, 15% year 2-5), and working capital impact. Show monthly cash flow comparison.""",
-        "params": {
-            "purchase_price": 200.0,  # 25 trucks * 8M
-            "useful_life": 5,
-            "residual_value": 64.0,  # After depreciation
-            "maintenance": 4.5,  # 15K/month/truck * 12 * 25 trucks
-            "lease_payment": 48.0,  # Estimated
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "insurance": 8.0,  # 4% of value
-            "fuel_cost_annual": 27.0  # Estimated
-        }
-    },
-    "Refrigerated Transport": {
-        "description": """**Refrigerated Transport Vehicles**
-        
-Analyze lease vs buy for 10 refrigerated trucks (PKR 12 million each) for cold chain distribution. 
-Consider: specialized maintenance requirements, technological upgrades for GPS tracking and temperature 
-monitoring, lease options (full-service vs dry lease), fuel efficiency improvements in newer models, and 
-expansion plans for 15 more trucks in year 3. Recommend optimal financing mix.""",
-        "params": {
-            "purchase_price": 120.0,  # 10 trucks * 12M
-            "useful_life": 7,
-            "residual_value": 36.0,  # 30% salvage
-            "maintenance": 7.2,  # Higher for refrigerated
-            "lease_payment": 30.0,  # Full service lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "gps_upgrade": 2.0,
-            "expansion_year_3": 180.0  # 15 trucks * 12M
-        }
-    },
-    "Warehouse Facility": {
-        "description": """**Warehouse Facility Decision**
-        
-Evaluate leasing vs purchasing a 100,000 sq ft warehouse in Lahore. Purchase price: PKR 400 million, 
-lease: PKR 250/sq ft/month. Include: property appreciation (8% annually), renovation costs (PKR 50 million 
-for owned, landlord's responsibility for leased), tax benefits of mortgage interest, flexibility for business 
-expansion/contraction, and alternative investment returns. Provide 15-year comparative analysis.""",
-        "params": {
-            "purchase_price": 400.0,
-            "useful_life": 15,
-            "residual_value": 1268.0,  # With 8% appreciation
-            "maintenance": 8.0,  # Annual maintenance
-            "lease_payment": 300.0,  # 250 * 100K sq ft / 12 * 12
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "renovation": 50.0,
-            "appreciation_rate": 8.0
-        }
-    },
-    "Retail Outlet Expansion": {
-        "description": """**Retail Outlet Expansion**
-        
-Analyze lease vs buy decisions for 20 new retail outlets across Pakistan. Average purchase cost: PKR 25 
-million/outlet, lease: PKR 350,000/month. Consider: location-specific factors, lease escalation clauses 
-(10% every 3 years), exit flexibility if outlet underperforms, working capital preservation for inventory, 
-and brand presence strategy. Create a decision matrix with city-wise recommendations.""",
-        "params": {
-            "purchase_price": 500.0,  # 20 outlets * 25M
-            "useful_life": 10,
-            "residual_value": 350.0,  # 70% retention
-            "maintenance": 10.0,
-            "lease_payment": 84.0,  # 350K * 20 * 12
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "lease_escalation": 10.0,  # Every 3 years
-            "working_capital_saved": 100.0
-        }
-    },
-    "Factory Land Acquisition": {
-        "description": """**Factory Land Acquisition**
-        
-Should Fauji Foods lease or buy 50 acres of industrial land for new production facility in Hattar 
-Industrial Estate? Purchase: PKR 500 million, lease: PKR 4 million/month (20-year lease). Include: land 
-appreciation potential, regulatory requirements for owned land, lease renewal risks, expansion possibilities, 
-and collateral value for future financing. Provide strategic recommendation.""",
-        "params": {
-            "purchase_price": 500.0,
-            "useful_life": 20,
-            "residual_value": 1165.0,  # With appreciation
-            "maintenance": 5.0,  # Land maintenance
-            "lease_payment": 48.0,  # 4M * 12
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "appreciation_rate": 4.5,
-            "collateral_value": 500.0
-        }
-    },
-    "ERP System": {
-        "description": """**ERP System Implementation**
-        
-Compare purchasing perpetual licenses vs SaaS subscription for SAP ERP system. Perpetual license: PKR 120 
-million upfront + 18% annual maintenance, SaaS: PKR 2.5 million/month. Include: implementation costs, 
-upgrade flexibility, scalability for 30% business growth, IT staff requirements, data security considerations, 
-and vendor lock-in risks. Calculate 7-year TCO comparison.""",
-        "params": {
-            "purchase_price": 120.0,
-            "useful_life": 7,
-            "residual_value": 0.0,  # Software has no salvage
-            "maintenance": 21.6,  # 18% annually
-            "lease_payment": 30.0,  # 2.5M * 12 (SaaS)
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "implementation_cost": 25.0,
-            "scalability_factor": 30.0
-        }
-    },
-    "Solar Power System": {
-        "description": """**Solar Power System**
-        
-Analyze lease vs buy for 1.5 MW rooftop solar installation at manufacturing plant. Purchase cost: PKR 180 
-million (with 30% AEDB subsidy), lease: PKR 2.2 million/month for 15 years. Include: current electricity 
-costs (PKR 3.5 million/month), tariff increase projections (12% annually), maintenance, panel degradation, 
-net metering benefits, and carbon credit potential. Show payback period for each option.""",
-        "params": {
-            "purchase_price": 180.0,
-            "useful_life": 15,
-            "residual_value": 18.0,  # 10% salvage
-            "maintenance": 3.6,  # 2% annually
-            "lease_payment": 26.4,  # 2.2M * 12
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "aedb_subsidy": 54.0,  # 30% subsidy
-            "electricity_savings": 42.0,  # 3.5M * 12
-            "tariff_increase": 12.0
-        }
-    },
-    "Multi-Asset Portfolio": {
-        "description": """**Multi-Asset Portfolio Analyzer**
-        
-Create a comprehensive lease vs buy analyzer for Fauji Foods' annual capital expenditure plan (PKR 500 million 
-across 15 different assets). Include: weighted average cost of capital (WACC), debt capacity constraints, 
-working capital impact, tax optimization strategy, asset life cycles, and strategic importance ranking. 
-Generate an optimal lease-buy mix recommendation.""",
-        "params": {
-            "purchase_price": 500.0,  # Total portfolio
-            "useful_life": 8,  # Average life
-            "residual_value": 75.0,  # 15% average salvage
-            "maintenance": 15.0,  # 3% annually
-            "lease_payment": 90.0,  # Portfolio lease cost
-            "discount_rate": 13.5,  # WACC
-            "tax_rate": 29.0,
-            "num_assets": 15,
-            "debt_capacity": 750.0,  # Maximum debt limit
-            "working_capital_impact": 50.0,
-            "strategic_importance_score": 8.5
-        }
-    },
-    "NPV with Inflation": {
-        "description": """**NPV Calculator with Inflation**
-        
-Build an NPV calculator for lease vs buy decisions that incorporates: Pakistan's inflation rate (25-30%), 
-currency devaluation impact on imported equipment, variable interest rates (3-month KIBOR fluctuations), 
-tax rate changes, and depreciation schedules. Apply to a PKR 200 million imported processing equipment 
-decision with 10-year useful life.""",
-        "params": {
-            "purchase_price": 200.0,
-            "useful_life": 10,
-            "residual_value": 30.0,  # 15% salvage
-            "maintenance": 6.0,  # 3% annually
-            "lease_payment": 36.0,  # Annual lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "inflation_rate": 27.5,  # Average 25-30%
-            "currency_devaluation": 8.0,  # Annual PKR devaluation
-            "kibor_fluctuation": 3.5,  # KIBOR volatility
-            "imported_equipment": True
-        }
-    },
-    "Cash Flow Forecasting": {
-        "description": """**Cash Flow Forecasting Model**
-        
-Develop a 5-year monthly cash flow forecast comparing lease vs buy for PKR 300 million in capital equipment. 
-Include: seasonal revenue variations (Ramadan spikes), working capital cycles, debt service coverage ratios 
-(minimum 1.25x), dividend payment constraints, and credit facility utilization. Show which option optimizes 
-cash availability.""",
-        "params": {
-            "purchase_price": 300.0,
-            "useful_life": 5,
-            "residual_value": 60.0,  # 20% salvage
-            "maintenance": 9.0,  # 3% annually
-            "lease_payment": 72.0,  # Annual lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "seasonal_variance": 35.0,  # Ramadan spike %
-            "min_dscr": 1.25,  # Minimum debt service coverage
-            "dividend_payout": 15.0,  # Annual dividend
-            "credit_facility": 200.0,  # Available credit line
-            "working_capital_requirement": 75.0
-        }
-    },
-    "Growth Scenario Analysis": {
-        "description": """**Growth Scenario Analysis**
-        
-Analyze lease vs buy under three growth scenarios for production equipment: conservative (5% annual growth), 
-base case (12% growth), aggressive (25% growth). Consider: capacity utilization, scalability needs, 
-obsolescence risks, and financial flexibility. For a PKR 250 million investment, recommend optimal strategy 
-for each scenario with trigger points for switching.""",
-        "params": {
-            "purchase_price": 250.0,
-            "useful_life": 7,
-            "residual_value": 50.0,  # 20% salvage
-            "maintenance": 7.5,  # 3% annually
-            "lease_payment": 48.0,  # Annual lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "conservative_growth": 5.0,
-            "base_growth": 12.0,
-            "aggressive_growth": 25.0,
-            "current_capacity_utilization": 72.0,
-            "obsolescence_risk_score": 6.5
-        }
-    },
-    "Economic Downturn": {
-        "description": """**Economic Downturn Simulation**
-        
-Model lease vs buy decision under economic stress scenario: 30% revenue decline, 20% currency devaluation, 
-interest rate spike to 25%, and tighter credit conditions. For a PKR 180 million cold storage expansion, 
-evaluate: payment flexibility, asset liquidation options, covenant compliance, and strategic reversibility. 
-Which option provides better downside protection?""",
-        "params": {
-            "purchase_price": 180.0,
-            "useful_life": 10,
-            "residual_value": 36.0,  # 20% salvage
-            "maintenance": 5.4,  # 3% annually
-            "lease_payment": 32.4,  # Annual lease
-            "discount_rate": 25.0,  # Stress scenario rate
-            "tax_rate": 29.0,
-            "revenue_decline": 30.0,
-            "currency_devaluation": 20.0,
-            "interest_rate_spike": 25.0,
-            "covenant_debt_to_equity_max": 1.5,
-            "liquidation_value": 126.0,  # 70% of purchase price
-            "payment_flexibility_score": 7.0
-        }
-    },
-    "Technology Obsolescence": {
-        "description": """**Technology Obsolescence Analysis**
-        
-Compare lease vs buy for technology-intensive food processing equipment (PKR 220 million) with high 
-obsolescence risk. Analyze: 3-year, 5-year, and 7-year replacement cycles, residual value uncertainty, 
-operating lease with upgrade options, manufacturer buyback programs, and competitive advantage from latest 
-technology. Create a decision tree model.""",
-        "params": {
-            "purchase_price": 220.0,
-            "useful_life": 5,  # Base case
-            "residual_value": 22.0,  # 10% due to obsolescence
-            "maintenance": 6.6,  # 3% annually
-            "lease_payment": 52.8,  # Annual lease with upgrade option
-            "discount_rate": 15.0,  # Higher due to tech risk
-            "tax_rate": 29.0,
-            "cycle_3_year_residual": 88.0,  # 40% residual
-            "cycle_5_year_residual": 22.0,  # 10% residual
-            "cycle_7_year_residual": 11.0,  # 5% residual
-            "manufacturer_buyback": 55.0,  # 25% guaranteed buyback
-            "obsolescence_probability": 65.0,  # High risk
-            "competitive_advantage_value": 30.0
-        }
-    },
-    "Tax Shield Optimization": {
-        "description": """**Tax Shield Optimization**
-        
-Calculate optimal lease vs buy decision from tax perspective for PKR 400 million in assets. Include: 
-depreciation tax shields (15% declining balance), lease payment deductibility, Alternative Corporate Tax 
-(ACT) implications, minimum tax considerations (1.25% of turnover), and timing of tax benefits. Show which 
-option minimizes effective tax rate.""",
-        "params": {
-            "purchase_price": 400.0,
-            "useful_life": 10,
-            "residual_value": 40.0,  # 10% salvage
-            "maintenance": 12.0,  # 3% annually
-            "lease_payment": 72.0,  # Annual lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "depreciation_rate_declining": 15.0,  # Declining balance
-            "act_rate": 17.0,  # Alternative Corporate Tax
-            "minimum_tax_rate": 1.25,  # % of turnover
-            "annual_turnover": 5000.0,
-            "minimum_tax": 62.5,  # 1.25% of 5000M
-            "tax_loss_carryforward": 25.0
-        }
-    },
-    "Balance Sheet Impact": {
-        "description": """**Balance Sheet Impact Analysis**
-        
-Evaluate how lease vs buy affects Fauji Foods' key financial ratios for PKR 350 million equipment purchase. 
-Analyze impact on: debt-to-equity ratio (current 1.2:1, covenant maximum 1.5:1), current ratio, return on 
-assets, interest coverage ratio, and IFRS 16 lease liability recognition. Determine which option maintains 
-optimal capital structure.""",
-        "params": {
-            "purchase_price": 350.0,
-            "useful_life": 8,
-            "residual_value": 52.5,  # 15% salvage
-            "maintenance": 10.5,  # 3% annually
-            "lease_payment": 63.0,  # Annual lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "current_debt_to_equity": 1.2,
-            "covenant_max_debt_to_equity": 1.5,
-            "current_ratio": 1.8,
-            "current_roa": 5.6,  # Return on Assets %
-            "current_interest_coverage": 4.5,
-            "ifrs16_lease_liability": 315.0,  # PV of lease payments
-            "current_total_assets": BASE_ASSETS,
-            "current_total_equity": BASE_EQUITY
-        }
-    },
-    "Off-Balance Sheet": {
-        "description": """**Off-Balance Sheet Financing**
-        
-Assess viability of operating leases to keep assets off balance sheet for PKR 500 million expansion 
-(10 different assets). Consider: IFRS 16 requirements, lender covenant calculations, credit rating impact, 
-financial statement presentation, and investor perception. Is off-balance sheet treatment still achievable 
-and beneficial?""",
-        "params": {
-            "purchase_price": 500.0,
-            "useful_life": 7,
-            "residual_value": 75.0,  # 15% salvage
-            "maintenance": 15.0,  # 3% annually
-            "lease_payment": 90.0,  # Annual operating lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "num_assets": 10,
-            "ifrs16_applicable": True,
-            "lease_term_vs_useful_life": 71.0,  # 5 years / 7 years = 71%
-            "pv_lease_payments": 450.0,
-            "credit_rating_current": "A-",
-            "covenant_exclusion_possible": False,  # IFRS 16 impact
-            "investor_transparency_score": 7.5
-        }
-    },
-    "Strategic Flexibility": {
-        "description": """**Strategic Flexibility Valuation**
-        
-Quantify the value of flexibility in lease vs buy for PKR 280 million asset portfolio. Use real options 
-approach to value: option to expand (20% probability), option to abandon (15% probability), option to switch 
-suppliers (30% probability), and option to upgrade technology (40% probability). Apply to decision between 
-7-year lease and purchase.""",
-        "params": {
-            "purchase_price": 280.0,
-            "useful_life": 7,
-            "residual_value": 56.0,  # 20% salvage
-            "maintenance": 8.4,  # 3% annually
-            "lease_payment": 56.0,  # Annual lease
-            "discount_rate": 15.0,  # Higher for real options
-            "tax_rate": 29.0,
-            "option_expand_prob": 20.0,
-            "option_expand_value": 140.0,  # 50% additional investment
-            "option_abandon_prob": 15.0,
-            "option_abandon_value": 84.0,  # 30% recovery
-            "option_switch_prob": 30.0,
-            "option_switch_value": 42.0,  # Switching cost
-            "option_upgrade_prob": 40.0,
-            "option_upgrade_value": 112.0,  # Upgrade investment
-            "volatility": 35.0  # Business volatility for options
-        }
-    },
-    "Vendor Dependency Risk": {
-        "description": """**Vendor Dependency Risk**
-        
-Analyze lease vs buy for critical production equipment (PKR 160 million) considering: single-supplier 
-dependency, geopolitical risks (equipment from China), spare parts availability, technical support quality, 
-and alternative vendor options. Evaluate whether ownership provides better operational security vs lease 
-convenience.""",
-        "params": {
-            "purchase_price": 160.0,
-            "useful_life": 8,
-            "residual_value": 32.0,  # 20% salvage
-            "maintenance": 4.8,  # 3% annually
-            "lease_payment": 32.0,  # Annual lease
-            "discount_rate": 14.0,  # Higher due to vendor risk
-            "tax_rate": 29.0,
-            "vendor_dependency_score": 8.5,  # High dependency (out of 10)
-            "geopolitical_risk_premium": 3.5,  # Additional risk %
-            "spare_parts_lead_time_days": 90,  # From China
-            "technical_support_score": 6.0,  # Limited local support
-            "alternative_vendors_available": 2,
-            "supply_chain_disruption_prob": 25.0,  # 25% probability
-            "downtime_cost_per_day": 0.5,  # PKR 0.5M per day
-            "operational_security_premium": 15.0  # Value of ownership control
-        }
-    },
-    "Market Positioning Strategy": {
-        "description": """**Market Positioning Strategy**
-        
-Create decision framework for lease vs buy that aligns with Fauji Foods' market leadership strategy. For 
-PKR 600 million in new capacity additions, evaluate: first-mover advantage timing, competitor response 
-implications, market share targets (25% to 30%), capital intensity vs asset-light model, and investor 
-expectations. Recommend strategic approach.""",
-        "params": {
-            "purchase_price": 600.0,
-            "useful_life": 10,
-            "residual_value": 120.0,  # 20% salvage
-            "maintenance": 18.0,  # 3% annually
-            "lease_payment": 96.0,  # Annual lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "current_market_share": 25.0,
-            "target_market_share": 30.0,
-            "first_mover_advantage_value": 80.0,  # Market timing premium
-            "competitor_response_lag_months": 18,
-            "capital_intensity_ratio": 0.65,  # Assets/Revenue
-            "asset_light_target_ratio": 0.45,  # Target for asset-light model
-            "investor_roe_expectation": 18.0,  # Expected ROE %
-            "brand_premium_value": 45.0,  # Market leadership premium
-            "time_to_market_months": 12  # Implementation timeline
-        }
-    },
-    "Food Safety Compliance": {
-        "description": """**Food Safety Equipment Compliance**
-        
-Evaluate lease vs buy for HACCP-compliant food safety equipment and laboratory testing systems (PKR 95 
-million). Include: regulatory update frequency, certification costs, technology evolution pace, audit 
-readiness, and quality assurance ROI. Consider that leasing may include compliance updates while ownership 
-requires separate upgrade investments.""",
-        "params": {
-            "purchase_price": 95.0,
-            "useful_life": 6,
-            "residual_value": 14.25,  # 15% salvage (tech-intensive)
-            "maintenance": 2.85,  # 3% annually
-            "lease_payment": 21.0,  # Annual lease with updates included
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "regulatory_update_frequency_years": 2,
-            "certification_cost_per_update": 3.5,  # PKR 3.5M per update
-            "haccp_compliance_cost_annual": 4.0,
-            "audit_readiness_score": 9.0,  # High importance (out of 10)
-            "quality_assurance_roi": 25.0,  # 25% ROI from QA improvements
-            "technology_evolution_rate": 15.0,  # 15% annual tech improvement
-            "lease_includes_updates": True,
-            "compliance_risk_penalty": 50.0,  # Cost of non-compliance
-            "brand_reputation_value": 30.0  # Reputation protection value
-        }
-    },
-    "Energy-Intensive Assets": {
-        "description": """**Energy-Intensive Asset Decision**
-        
-Analyze lease vs buy for energy-intensive baking ovens and dryers (PKR 270 million) during Pakistan's 
-energy crisis. Factor in: electricity tariff volatility, gas supply interruptions, solar/alternative energy 
-integration, energy efficiency improvements (3% annually), and government industrial package benefits. 
-Calculate total energy-adjusted cost of ownership.""",
-        "params": {
-            "purchase_price": 270.0,
-            "useful_life": 12,
-            "residual_value": 54.0,  # 20% salvage
-            "maintenance": 8.1,  # 3% annually
-            "lease_payment": 45.0,  # Annual lease
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "annual_electricity_cost": 48.0,  # PKR 48M annually
-            "annual_gas_cost": 36.0,  # PKR 36M annually
-            "electricity_tariff_increase": 15.0,  # 15% annual increase
-            "gas_supply_interruption_days": 45,  # Days per year
-            "solar_integration_cost": 35.0,  # PKR 35M for solar
-            "solar_energy_offset": 40.0,  # 40% energy from solar
-            "energy_efficiency_improvement": 3.0,  # 3% annual improvement
-            "govt_industrial_package_subsidy": 25.0,  # PKR 25M subsidy
-            "production_downtime_cost": 1.2,  # PKR 1.2M per day
-            "alternative_fuel_option_value": 18.0  # Value of fuel flexibility
-        }
-    },
-    "Cross-Border Islamic Leasing": {
-        "description": """**Cross-Border Leasing Opportunity**
-        
-Evaluate an Islamic Ijarah (leasing) structure from Middle Eastern lessor for PKR 320 million food 
-processing equipment vs conventional purchase financing from local banks. Compare: Shariah compliance, 
-forex exposure (USD-denominated lease vs PKR loan), political risk insurance, profit rates (8% Ijarah vs 
-21% bank loan), and reputational considerations for Fauji Foods' brand. Provide comprehensive recommendation.""",
-        "params": {
-            "purchase_price": 320.0,
-            "useful_life": 8,
-            "residual_value": 64.0,  # 20% salvage
-            "maintenance": 9.6,  # 3% annually
-            "lease_payment": 38.4,  # Annual Ijarah (8% profit rate)
-            "discount_rate": 12.0,
-            "tax_rate": 29.0,
-            "ijarah_profit_rate": 8.0,  # Islamic lease rate
-            "conventional_loan_rate": 21.0,  # Local bank rate
-            "usd_denomination": True,
-            "usd_pkr_rate": 278.0,  # Current exchange rate
-            "forex_volatility": 12.0,  # 12% annual PKR volatility
-            "political_risk_insurance_cost": 2.5,  # PKR 2.5M annually
-            "shariah_compliance_value": 20.0,  # Brand/reputation value
-            "middle_east_lessor_rating": "AA",
-            "local_bank_rating": "A+",
-            "hedging_cost_percentage": 3.0,  # 3% of exposure
-            "reputational_premium": 15.0,  # Islamic finance brand boost
-            "cross_border_transaction_cost": 4.0  # One-time cost
-        }
-    }
-}
+# Parsed and validated once per process; edits to scenarios.json are picked up on
+# the next run
+SCENARIOS = load_scenarios()
 
 # ==============================
 # TABS
 # ==============================
+lap("tabs")
 tab1, tab2, tab3, tab4 = st.tabs([
     "📊 Decision Analysis",
     "📜 Historical Financials",
@@ -679,10 +661,15 @@ tab1, tab2, tab3, tab4 = st.tabs([
     "🎯 Predefined Scenarios"
 ])
 
+# Each tab is a fragment: its widgets rerun only the tab, not the whole script.
+# Sidebar changes still rerun everything, fragments included.
+
 # ==============================
 # TAB 1: DECISION ANALYSIS + GRAPH
 # ==============================
-with tab1:
+@st.fragment
+@timed("tab1.decision_analysis")
+def decision_analysis_tab():
     c1, c2, c3 = st.columns(3)
     c1.metric("NPV (Buy)", fmt(npv_buy))
     c2.metric("NPV (Lease)", fmt(npv_lease))
@@ -690,6 +677,21 @@ with tab1:
 
     st.success("Leasing is preferable" if nal > 0 else "Buying is preferable")
 
+    render_irr(sidebar_graph["irr"])
+
+    if purchase_mode == "Credit":
+        st.subheader("🏦 Loan Schedule")
+        loan_schedule = sidebar_graph["loan_schedule"]
+        show_dataframe(
+            loan_schedule.style.format({column: "₨{:,.2f}" for column in loan_schedule.columns if column != "Year"}),
+            hide_index=True,
+            width='stretch'
+        )
+        st.caption(
+            f"{loan_type} loan of {fmt(loan_schedule['Balance'].iloc[0])} drawn at purchase; the buy cash flows "
+            "include the drawdown, the instalments and the interest tax shield."
+        )
+
     st.subheader("📈 Cash Flow Comparison")
 
     years = list(range(0, useful_life + 1))
@@ -699,46 +701,39 @@ with tab1:
         "Lease": lease_cash_flows
     }).set_index("Year")
 
-    st.line_chart(cf_chart)
+    show_line_chart(cf_chart)
+    if periods_per_year > 1 or timing == "advance":
+        st.caption(
+            f"{payment_frequency} periods, lease payments {payment_timing.lower()}: NPVs discount each "
+            "period's cash flow, and the chart shows yearly totals."
+        )
+
+    render_monte_carlo(custom_params, "custom", periods_per_year, timing)
+
+with tab1:
+    decision_analysis_tab()
 
 # ==============================
 # TAB 2: HISTORICAL DATA
 # ==============================
-with tab2:
-    historic_df = pd.DataFrame({
-        "Metric": ["Total Assets", "Total Liabilities", "Total Debt", "Equity", "EBIT", "Net Profit"],
-        "Value": [BASE_ASSETS, BASE_LIABILITIES, BASE_DEBT, BASE_EQUITY, BASE_EBIT, BASE_NET_PROFIT]
-    })
-
-    st.dataframe(
+@st.fragment
+@timed("tab2.historical_financials")
+def historical_financials_tab():
+    show_dataframe(
         historic_df.style.format({"Value": "₨{:,.2f}"}),
         width='stretch'
     )
 
+with tab2:
+    historical_financials_tab()
+
 # ==============================
 # TAB 3: FINANCIAL IMPACT + GRAPH
 # ==============================
-with tab3:
-    impact_df = pd.DataFrame({
-        "Metric": ["Total Assets", "Total Liabilities", "Equity", "EBIT", "Net Profit"],
-        "Baseline": [BASE_ASSETS, BASE_LIABILITIES, BASE_EQUITY, BASE_EBIT, BASE_NET_PROFIT],
-        "After BUY": [
-            BASE_ASSETS + purchase_price,
-            BASE_LIABILITIES + (purchase_price if purchase_mode == "Credit" else 0),
-            BASE_EQUITY,
-            BASE_EBIT - maintenance + depreciation,
-            BASE_NET_PROFIT + dep_tax_shield - maintenance * (1 - tax_rate)
-        ],
-        "After LEASE": [
-            BASE_ASSETS + purchase_price,
-            BASE_LIABILITIES + purchase_price,
-            BASE_EQUITY,
-            BASE_EBIT - lease_payment,
-            BASE_NET_PROFIT - lease_payment * (1 - tax_rate)
-        ]
-    })
-
-    st.dataframe(
+@st.fragment
+@timed("tab3.financial_impact")
+def financial_impact_tab():
+    show_dataframe(
         impact_df.style.format({
             "Baseline": "₨{:,.2f}",
             "After BUY": "₨{:,.2f}",
@@ -750,10 +745,30 @@ with tab3:
     st.subheader("📊 Financial Impact Comparison")
     st.bar_chart(impact_df.set_index("Metric"))
 
+    st.subheader("📋 IFRS 16 Lease Schedule")
+    st.caption(
+        "The lease liability is the present value of the remaining payments at the discount rate and "
+        "unwinds by the effective-interest method; the right-of-use asset is depreciated straight-line. "
+        "Year 0 is commencement."
+    )
+    show_dataframe(
+        sidebar_lease_df.style.format({
+            column: "₨{:,.2f}" for column in sidebar_lease_df.columns if column != "Year"
+        }),
+        hide_index=True,
+        width='stretch'
+    )
+    show_line_chart(sidebar_lease_df.set_index("Year")[["Lease Liability", "ROU Asset"]])
+
+with tab3:
+    financial_impact_tab()
+
 # ==============================
 # TAB 4: PREDEFINED SCENARIOS
 # ==============================
-with tab4:
+@st.fragment
+@timed("tab4.predefined_scenarios")
+def predefined_scenarios_tab():
     st.header("🎯 Predefined Lease vs Buy Scenarios")
     st.markdown("""
     Select from comprehensive, real-world scenarios tailored for Fauji Foods Limited. 
@@ -763,35 +778,16 @@ with tab4:
     # Scenario Categories
     col_left, col_right = st.columns(2)
     
-    with col_left:
-        st.subheader("📦 Equipment & Machinery")
-        st.markdown("• Production Line Equipment\n• Packaging Machinery\n• Cold Storage Equipment")
-        
-        st.subheader("🚚 Fleet & Transportation")
-        st.markdown("• Distribution Truck Fleet\n• Refrigerated Transport")
-        
-        st.subheader("🏭 Real Estate & Facilities")
-        st.markdown("• Warehouse Facility\n• Retail Outlet Expansion\n• Factory Land Acquisition")
-        
-        st.subheader("💻 Technology & Systems")
-        st.markdown("• ERP System\n• Solar Power System")
-    
-    with col_right:
-        st.subheader("📊 Financial Analysis Tools")
-        st.markdown("• Multi-Asset Portfolio\n• NPV with Inflation\n• Cash Flow Forecasting")
-        
-        st.subheader("📈 Comparative Scenarios")
-        st.markdown("• Growth Scenario Analysis\n• Economic Downturn\n• Technology Obsolescence")
-        
-        st.subheader("💰 Tax & Accounting Impact")
-        st.markdown("• Tax Shield Optimization\n• Balance Sheet Impact\n• Off-Balance Sheet")
-        
-        st.subheader("🎲 Strategic & Risk Assessment")
-        st.markdown("• Strategic Flexibility")
-        
-        st.subheader("🌐 Specialized Sector Decisions")
-        st.markdown("• Vendor Dependency Risk\n• Market Positioning Strategy\n• Food Safety Compliance\n• Energy-Intensive Assets\n• Cross-Border Islamic Leasing")
-    
+    for column, categories in zip((col_left, col_right), CATEGORY_MARKDOWN):
+        with column:
+            for heading, markdown in categories:
+                st.subheader(heading)
+                st.markdown(markdown)
+
+    # All scenarios side by side
+    with st.expander("📋 Compare All Scenarios"):
+        render_scenario_comparison()
+
     # Scenario Selection
     st.markdown("---")
     scenario_choice = st.selectbox(
@@ -815,134 +811,24 @@ with tab4:
         # Extract parameters
         pp = params["purchase_price"]
         ul = params["useful_life"]
-        rv = params["residual_value"]
         maint = params["maintenance"]
         lp = params["lease_payment"]
         dr = params["discount_rate"] / 100
         tr = params["tax_rate"] / 100
         
-        # Buy option cash flows
-        # Check for declining balance depreciation
-        if params.get("depreciation_rate_declining"):
-            dep_rate = params["depreciation_rate_declining"] / 100
-            dep_scenario = None  # Variable depreciation
-        else:
-            dep_scenario = (pp - rv) / ul
-            dep_tax_scenario = dep_scenario * tr
-        
-        # Check if subsidy exists
-        subsidy = params.get("aedb_subsidy", 0) + params.get("government_subsidy", 0)
-        net_purchase_price = pp - subsidy
-        
-        # Adjust for down payment
-        if "down_payment" in params:
-            initial_outlay = params["down_payment"]
-            financed_amount = pp - initial_outlay
-        else:
-            initial_outlay = net_purchase_price
-            financed_amount = 0
-        
-        buy_cf_scenario = [-initial_outlay]
-        book_value = pp
-        
-        for year in range(ul):
-            # Handle declining balance depreciation
-            if params.get("depreciation_rate_declining"):
-                dep_year = book_value * dep_rate
-                dep_tax_year = dep_year * tr
-                book_value -= dep_year
-            else:
-                dep_tax_year = dep_tax_scenario
-            
-            # Base cash flow
-            cf = dep_tax_year - maint * (1 - tr)
-            
-            # Add electricity savings for solar
-            if "electricity_savings" in params:
-                elec_savings = params["electricity_savings"] * ((1 + params["tariff_increase"]/100) ** year)
-                cf += elec_savings
-            
-            # Adjust for inflation
-            if "inflation_rate" in params:
-                inflation_adj = 1 / ((1 + params["inflation_rate"]/100) ** year)
-                cf *= inflation_adj
-            
-            # Add growth scenario benefits
-            if "base_growth" in params:
-                growth_benefit = pp * (params["base_growth"]/100) * (year + 1) * 0.1
-                cf += growth_benefit
-            
-            # Add strategic flexibility value (real options)
-            if "option_expand_prob" in params and year == 3:  # Mid-life option
-                option_value = (
-                    params["option_expand_prob"]/100 * params["option_expand_value"] * 0.2 +
-                    params["option_upgrade_prob"]/100 * params["option_upgrade_value"] * 0.15
-                )
-                cf += option_value
-            
-            buy_cf_scenario.append(cf)
+        lap("tab4.scenario_engine")
+        # Buy and lease cash flows from the scenario engine
+        scenario_result = compute_scenario_cached(params)
+        buy_cf_scenario = scenario_result.buy_cash_flows
+        lease_cf_scenario = scenario_result.lease_cash_flows
+        net_purchase_price = scenario_result.net_purchase_price
+        terminal_value = scenario_result.terminal_value
         
-        # Terminal value considerations
-        terminal_value = rv
-        
-        # Adjust for economic downturn scenario
-        if "liquidation_value" in params:
-            terminal_value = params["liquidation_value"] * 0.5 + rv * 0.5
-        
-        # Adjust for technology obsolescence
-        if "obsolescence_probability" in params:
-            obs_prob = params["obsolescence_probability"] / 100
-            terminal_value = rv * (1 - obs_prob) + params.get("manufacturer_buyback", rv * 0.5) * obs_prob
-        
-        buy_cf_scenario[-1] += terminal_value
-        npv_scenario_buy = calculate_npv(dr, buy_cf_scenario)
-        
-        # Lease option cash flows
-        lease_cf_scenario = [0]
-        for year in range(ul):
-            # Check for lease escalation
-            if "lease_escalation" in params and year > 0 and year % 3 == 0:
-                escalation_factor = (1 + params["lease_escalation"]/100) ** (year // 3)
-                adjusted_lp = lp * escalation_factor
-            else:
-                adjusted_lp = lp
-            
-            cf = -adjusted_lp * (1 - tr)
-            
-            # Add electricity savings for solar lease option
-            if "electricity_savings" in params:
-                elec_savings = params["electricity_savings"] * ((1 + params["tariff_increase"]/100) ** year)
-                cf += elec_savings
-            
-            # Adjust for inflation
-            if "inflation_rate" in params:
-                inflation_adj = 1 / ((1 + params["inflation_rate"]/100) ** year)
-                cf *= inflation_adj
-            
-            # Add growth scenario benefits (leasing offers flexibility)
-            if "base_growth" in params:
-                growth_benefit = pp * (params["base_growth"]/100) * (year + 1) * 0.12  # Higher for lease flexibility
-                cf += growth_benefit
-            
-            # Flexibility premium for leasing under uncertainty
-            if "revenue_decline" in params:  # Economic downturn scenario
-                flexibility_premium = adjusted_lp * 0.15  # 15% flexibility value
-                cf += flexibility_premium
-            
-            # Strategic flexibility value for leasing
-            if "option_expand_prob" in params:
-                lease_flexibility = (
-                    params["option_expand_prob"]/100 * 0.25 * adjusted_lp +
-                    params["option_abandon_prob"]/100 * 0.30 * adjusted_lp +
-                    params["option_switch_prob"]/100 * 0.20 * adjusted_lp
-                )
-                cf += lease_flexibility
-            
-            lease_cf_scenario.append(cf)
-        
-        npv_scenario_lease = calculate_npv(dr, lease_cf_scenario)
-        nal_scenario = npv_scenario_buy - npv_scenario_lease
+        npv_scenario_buy = scenario_result.npv_buy
+        npv_scenario_lease = scenario_result.npv_lease
+        nal_scenario = scenario_result.nal
         
+        lap("tab4.metrics")
         # Display metrics
         col1, col2, col3, col4 = st.columns(4)
         col1.metric("Purchase Price", fmt(pp))
@@ -958,6 +844,8 @@ with tab4:
         else:
             st.success(f"✅ **Recommendation: BUY** - Purchasing provides a net advantage of {fmt(abs(nal_scenario))} in NPV terms.")
         
+        render_irr(irr_table(buy_cf_scenario, lease_cf_scenario, dr))
+        
         # Additional scenario-specific metrics
         st.markdown("---")
         st.subheader("📈 Scenario-Specific Metrics")
@@ -979,19 +867,28 @@ with tab4:
         
         with metrics_col2:
             st.markdown("**Financial Ratios:**")
-            # Payback period (simplified)
-            if npv_scenario_buy > 0:
-                annual_benefit = (npv_scenario_buy + net_purchase_price) / ul
-                payback_buy = net_purchase_price / annual_benefit if annual_benefit > 0 else 0
-                st.write(f"- **Payback Period (Buy):** {payback_buy:.2f} years")
+            # Payback period, interpolated within the year it is reached
+            buy_totals = cumulative(buy_cf_scenario, dr)
+            lease_totals = cumulative(lease_cf_scenario, dr)
+            payback_buy = buy_totals.payback
+            discounted_payback_buy = buy_totals.discounted_payback
+            st.write(f"- **Payback Period (Buy):** {'not reached' if np.isnan(payback_buy) else f'{payback_buy:.2f} years'}")
+            st.write(f"- **Discounted Payback (Buy):** {'not reached' if np.isnan(discounted_payback_buy) else f'{discounted_payback_buy:.2f} years'}")
             
             if npv_scenario_lease > 0:
                 annual_lease_cost = lp
                 st.write(f"- **Annual Lease Cost:** {fmt(annual_lease_cost)}")
             
-            # Break-even analysis
-            breakeven_rate = (lp / pp) * 100
-            st.write(f"- **Break-even Rate:** {breakeven_rate:.2f}%")
+            # Break-even analysis: parameter values at which NAL = 0
+            lease_cost_rate = (lp / pp) * 100
+            st.write(f"- **Annual Lease Cost (% of Price):** {lease_cost_rate:.2f}%")
+            breakeven = scenario_breakeven(params)
+            be_lp = breakeven["lease_payment"]
+            be_rv = breakeven["residual_value"]
+            be_dr = breakeven["discount_rate"]
+            st.write(f"- **Break-even Lease Payment:** {'n/a' if np.isnan(be_lp) else fmt(be_lp)}")
+            st.write(f"- **Break-even Residual Value:** {'n/a' if np.isnan(be_rv) else fmt(be_rv)}")
+            st.write(f"- **Break-even Discount Rate:** {'none in -50% to 500%' if np.isnan(be_dr) else f'{be_dr:.2f}%'}")
             
             # Total cost of ownership
             tco_buy = net_purchase_price + (maint * ul) - terminal_value
@@ -1008,8 +905,9 @@ with tab4:
         # Advanced scenario-specific analysis
         st.markdown("---")
         
+        lap("tab4.multi_asset_portfolio_analysis")
         # Multi-Asset Portfolio Analysis
-        if "num_assets" in params:
+        if "debt_capacity" in params:
             st.subheader("🎯 Portfolio Optimization Analysis")
             col_p1, col_p2, col_p3 = st.columns(3)
             with col_p1:
@@ -1020,9 +918,9 @@ with tab4:
                 st.metric("Working Capital Impact", fmt(params["working_capital_impact"]))
             with col_p3:
                 st.metric("Strategic Importance", f"{params['strategic_importance_score']}/10")
-                optimal_mix = "60% Buy / 40% Lease" if nal_scenario > 0 else "40% Buy / 60% Lease"
-                st.metric("Optimal Mix", optimal_mix)
+            render_portfolio(params, scenario_choice)
         
+        lap("tab4.inflation_currency_impact")
         # Inflation & Currency Impact
         if "inflation_rate" in params:
             st.subheader("📉 Inflation & Currency Analysis")
@@ -1040,6 +938,7 @@ with tab4:
                 inflation_adjusted_nal = real_npv_buy - real_npv_lease
                 st.metric("Real NAL", fmt(inflation_adjusted_nal))
         
+        lap("tab4.growth_scenario_analysis")
         # Growth Scenario Analysis
         if "conservative_growth" in params:
             st.subheader("📈 Growth Scenario Impact")
@@ -1062,7 +961,7 @@ with tab4:
                     "Lease" if npv_scenario_lease * 1.25 > npv_scenario_buy * 1.35 else "Buy"
                 ]
             })
-            st.dataframe(
+            show_dataframe(
                 growth_df.style.format({
                     "NPV (Buy)": "₨{:,.2f}M",
                     "NPV (Lease)": "₨{:,.2f}M"
@@ -1070,6 +969,7 @@ with tab4:
                 width='stretch'
             )
         
+        lap("tab4.economic_downturn_impact")
         # Economic Downturn Impact
         if "revenue_decline" in params:
             st.subheader("⚠️ Economic Stress Test")
@@ -1086,6 +986,7 @@ with tab4:
             
             st.info(f"Under stress conditions, **{'LEASING' if flexibility_score > 7 else 'BUYING'}** provides better downside protection.")
         
+        lap("tab4.technology_obsolescence")
         # Technology Obsolescence
         if "obsolescence_probability" in params:
             st.subheader("🔄 Technology Lifecycle Analysis")
@@ -1102,42 +1003,50 @@ with tab4:
             
             st.warning("High obsolescence risk favors **LEASING** for technology refresh flexibility.")
         
+        lap("tab4.tax_optimization")
         # Tax Optimization
         if "depreciation_rate_declining" in params:
             st.subheader("💰 Tax Shield Analysis")
             col_tx1, col_tx2, col_tx3 = st.columns(3)
             
-            # Calculate declining balance depreciation schedule
-            db_schedule = []
-            bv = pp
-            for y in range(min(5, ul)):
-                dep = bv * (params['depreciation_rate_declining']/100)
-                tax_shield = dep * tr
-                db_schedule.append({"Year": y+1, "Depreciation": dep, "Tax Shield": tax_shield})
-                bv -= dep
+            schedule = scenario_tax_shield(params)
+            if params.get("depreciation_switch_to_sl"):
+                method = "Declining Balance → Straight-Line"
+            else:
+                method = "Declining Balance" if params['depreciation_rate_declining'] else "Straight-Line"
+            discount = (1 + dr) ** -schedule["Year"].to_numpy()
             
             with col_tx1:
-                st.metric("Depreciation Method", "Declining Balance")
+                st.metric("Depreciation Method", method)
                 st.metric("Rate", f"{params['depreciation_rate_declining']:.0f}%")
             with col_tx2:
-                first_year_shield = db_schedule[0]["Tax Shield"] if db_schedule else 0
+                first_year_shield = schedule["Tax Shield"].iloc[0] if len(schedule) else 0
                 st.metric("First Year Tax Shield", fmt(first_year_shield))
-                total_tax_shield = sum(item["Tax Shield"] for item in db_schedule)
-                st.metric(f"Total Tax Shield ({min(5, ul)}Y)", fmt(total_tax_shield))
+                st.metric(f"Total Tax Shield ({ul}Y)", fmt(schedule["Tax Shield"].sum()))
+                st.metric("PV of Tax Shield", fmt((schedule["Tax Shield"] * discount).sum()))
             with col_tx3:
-                st.metric("Minimum Tax", fmt(params.get('minimum_tax', 0)))
+                minimum_tax = params.get('annual_turnover', 0) * params.get('minimum_tax_rate', 0) / 100
+                st.metric("Minimum Tax", fmt(minimum_tax))
                 st.metric("ACT Rate", f"{params.get('act_rate', 0):.0f}%")
             
-            if db_schedule:
-                st.markdown("**Depreciation Schedule (First 5 Years):**")
-                st.dataframe(
-                    pd.DataFrame(db_schedule).style.format({
-                        "Depreciation": "₨{:,.2f}M",
-                        "Tax Shield": "₨{:,.2f}M"
-                    }),
-                    width='stretch'
+            floor_years = int((schedule["Tax Shield"] < schedule["Depreciation"] * tr - 1e-9).sum())
+            if floor_years:
+                st.warning(
+                    f"Minimum tax or ACT binds in {floor_years} of {len(schedule)} years, "
+                    "so depreciation saves less than the full tax rate there."
                 )
+            else:
+                st.caption(f"Normal tax binds every year (taxable income before depreciation: {fmt(BASE_EBIT)}).")
+            
+            st.markdown("**Tax Depreciation Schedule:**")
+            show_dataframe(
+                schedule.style.format({
+                    column: "₨{:,.2f}M" for column in schedule.columns if column != "Year"
+                }),
+                width='stretch'
+            )
         
+        lap("tab4.balance_sheet_impact")
         # Balance Sheet Impact
         if "current_debt_to_equity" in params:
             st.subheader("📊 Balance Sheet Impact")
@@ -1145,13 +1054,14 @@ with tab4:
             
             # Calculate new ratios
             new_debt_buy = BASE_DEBT + (pp if "Credit" in str(params) else 0)
-            new_debt_lease = BASE_DEBT + params.get('ifrs16_lease_liability', pp * 0.9)
+            lease_schedule_scenario = scenario_lease_schedule(params)
+            new_debt_lease = BASE_DEBT + lease_schedule_scenario["Lease Liability"].iloc[0]
             
             new_de_buy = new_debt_buy / BASE_EQUITY
             new_de_lease = new_debt_lease / BASE_EQUITY
             
             new_assets_buy = BASE_ASSETS + pp
-            new_assets_lease = BASE_ASSETS + params.get('ifrs16_lease_liability', pp * 0.9)
+            new_assets_lease = BASE_ASSETS + lease_schedule_scenario["ROU Asset"].iloc[0]
             
             new_roa_buy = (BASE_NET_PROFIT * 1.1) / new_assets_buy * 100
             new_roa_lease = (BASE_NET_PROFIT * 1.05) / new_assets_lease * 100
@@ -1185,15 +1095,17 @@ with tab4:
             else:
                 st.success("✅ Both options maintain covenant compliance.")
         
+        lap("tab4.ifrs_16_off_balance_sheet")
         # IFRS 16 & Off-Balance Sheet
         if "ifrs16_applicable" in params:
             st.subheader("📋 IFRS 16 & Off-Balance Sheet Analysis")
             col_ifrs1, col_ifrs2 = st.columns(2)
             
+            lease_schedule_scenario = scenario_lease_schedule(params)
             with col_ifrs1:
                 st.markdown("**IFRS 16 Requirements:**")
-                st.write(f"- **Lease Liability:** {fmt(params.get('pv_lease_payments', 0))}")
-                st.write(f"- **Right-of-Use Asset:** {fmt(params.get('pv_lease_payments', 0))}")
+                st.write(f"- **Lease Liability:** {fmt(lease_schedule_scenario['Lease Liability'].iloc[0])}")
+                st.write(f"- **Right-of-Use Asset:** {fmt(lease_schedule_scenario['ROU Asset'].iloc[0])}")
                 st.write(f"- **Lease Term vs Useful Life:** {params.get('lease_term_vs_useful_life', 0):.0f}%")
                 st.write(f"- **Number of Assets:** {params.get('num_assets', 1)}")
                 
@@ -1207,7 +1119,17 @@ with tab4:
                 st.warning("⚠️ **IFRS 16 applies**: Operating leases must be capitalized. True off-balance sheet treatment is no longer achievable.")
             else:
                 st.info("✅ Off-balance sheet treatment may be possible under specific conditions.")
+            
+            st.markdown("**Lease Liability & Right-of-Use Asset Schedule:**")
+            show_dataframe(
+                lease_schedule_scenario.style.format({
+                    column: "₨{:,.2f}M" for column in lease_schedule_scenario.columns if column != "Year"
+                }),
+                hide_index=True,
+                width='stretch'
+            )
         
+        lap("tab4.real_options_strategic_flexibility")
         # Real Options & Strategic Flexibility
         if "option_expand_prob" in params:
             st.subheader("🎲 Real Options Valuation")
@@ -1244,7 +1166,7 @@ with tab4:
                 ]
             })
             
-            st.dataframe(
+            show_dataframe(
                 options_df.style.format({
                     "Potential Value": "₨{:,.2f}M",
                     "Expected Value": "₨{:,.2f}M"
@@ -1261,6 +1183,7 @@ with tab4:
                 st.metric("Flexibility Premium", f"{flexibility_premium:.1f}%")
                 st.info(f"**Leasing** captures {flexibility_premium * 0.7:.1f}% of option value through flexibility.")
         
+        lap("tab4.cash_flow_dscr_analysis")
         # Cash Flow & DSCR Analysis
         if "min_dscr" in params:
             st.subheader("💵 Cash Flow & Debt Service Analysis")
@@ -1281,6 +1204,7 @@ with tab4:
                 st.metric("Projected DSCR", f"{dscr:.2f}x",
                          delta="✅ Compliant" if dscr >= params['min_dscr'] else "⚠️ Below Min")
         
+        lap("tab4.vendor_dependency_supply_chain_risk")
         # Vendor Dependency & Supply Chain Risk
         if "vendor_dependency_score" in params:
             st.subheader("⚠️ Vendor Dependency & Supply Chain Risk")
@@ -1331,6 +1255,7 @@ with tab4:
             })
             st.bar_chart(resilience_df.set_index("Factor"))
         
+        lap("tab4.market_positioning_strategic_impact")
         # Market Positioning & Strategic Impact
         if "current_market_share" in params:
             st.subheader("📊 Market Positioning & Strategic Impact")
@@ -1381,7 +1306,7 @@ with tab4:
             
             col_roe1, col_roe2 = st.columns(2)
             with col_roe1:
-                st.dataframe(
+                show_dataframe(
                     roe_comparison.style.format({
                         "ROE (%)": "{:.1f}%",
                         "Equity Required": "₨{:,.0f}M"
@@ -1391,6 +1316,7 @@ with tab4:
             with col_roe2:
                 st.bar_chart(roe_comparison.set_index("Option")["ROE (%)"])
         
+        lap("tab4.food_safety_regulatory_compliance")
         # Food Safety & Regulatory Compliance
         if "regulatory_update_frequency_years" in params:
             st.subheader("🔬 Food Safety & Regulatory Compliance")
@@ -1434,8 +1360,9 @@ with tab4:
                 "Cumulative Tech Improvement": [params['technology_evolution_rate'] * i for i in range(0, (ul // params['regulatory_update_frequency_years']) + 1)],
                 "Update Required": ["Yes" if i > 0 else "Initial" for i in range(0, (ul // params['regulatory_update_frequency_years']) + 1)]
             })
-            st.dataframe(tech_refresh_df, width='stretch')
+            show_dataframe(tech_refresh_df, width='stretch')
         
+        lap("tab4.energy_cost_analysis")
         # Energy Cost Analysis
         if "annual_electricity_cost" in params:
             st.subheader("⚡ Energy Cost & Efficiency Analysis")
@@ -1494,7 +1421,7 @@ with tab4:
                 "Average Annual": [total_energy_buy/ul, total_energy_lease/ul, (total_energy_lease - total_energy_buy)/ul]
             })
             
-            st.dataframe(
+            show_dataframe(
                 energy_comparison.style.format({
                     "Total Energy Cost": "₨{:,.2f}M",
                     "Average Annual": "₨{:,.2f}M"
@@ -1520,6 +1447,7 @@ with tab4:
             st.metric("Energy Security Score", f"{security_score:.0f}/100",
                      help="Based on supply reliability, energy independence, and fuel flexibility")
         
+        lap("tab4.islamic_finance_cross_border_analysis")
         # Islamic Finance & Cross-Border Analysis
         if "ijarah_profit_rate" in params:
             st.subheader("🕌 Islamic Finance & Cross-Border Analysis")
@@ -1592,7 +1520,7 @@ with tab4:
                 ]
             })
             
-            st.dataframe(
+            show_dataframe(
                 cost_comparison_df.style.format({
                     "Total Cost (PKR M)": "₨{:,.2f}M"
                 }),
@@ -1675,8 +1603,9 @@ with tab4:
                 "Conventional Loan Cost": loan_costs
             }).set_index("PKR Depreciation (%)")
             
-            st.line_chart(forex_chart)
+            show_line_chart(forex_chart)
         
+        lap("tab4.cash_flow_charts")
         # Cash flow comparison chart
         st.markdown("---")
         st.subheader("💰 Cash Flow Comparison")
@@ -1688,21 +1617,28 @@ with tab4:
             "Lease": lease_cf_scenario
         }).set_index("Year")
         
-        st.line_chart(cf_chart_scenario)
+        show_line_chart(cf_chart_scenario)
         
         # Cumulative cash flow
         st.subheader("📊 Cumulative Cash Flow Analysis")
-        cumulative_buy = [sum(buy_cf_scenario[:i+1]) for i in range(len(buy_cf_scenario))]
-        cumulative_lease = [sum(lease_cf_scenario[:i+1]) for i in range(len(lease_cf_scenario))]
-        
         cumulative_df = pd.DataFrame({
             "Year": years_scenario,
-            "Cumulative Buy": cumulative_buy,
-            "Cumulative Lease": cumulative_lease
+            "Cumulative Buy": buy_totals.nominal,
+            "Cumulative Lease": lease_totals.nominal,
+            "Discounted Buy": buy_totals.discounted,
+            "Discounted Lease": lease_totals.discounted
         }).set_index("Year")
         
-        st.line_chart(cumulative_df)
+        show_line_chart(cumulative_df)
         
+        crossover_year = crossover(buy_totals.nominal, lease_totals.nominal)
+        discounted_crossover_year = crossover(buy_totals.discounted, lease_totals.discounted)
+        c_col1, c_col2 = st.columns(2)
+        c_col1.metric("Cumulative Crossover", "None" if np.isnan(crossover_year) else f"Year {crossover_year:.2f}")
+        c_col2.metric("Discounted Crossover", "None" if np.isnan(discounted_crossover_year) else f"Year {discounted_crossover_year:.2f}")
+        st.caption("Crossover: when one option's running total overtakes the other's.")
+        
+        lap("tab4.sensitivity")
         # Sensitivity Analysis
         st.markdown("---")
         st.subheader("🎚️ Sensitivity Analysis")
@@ -1710,23 +1646,19 @@ with tab4:
         st.markdown("**Impact of Discount Rate Changes on NPV:**")
         
         sensitivity_rates = [dr - 0.05, dr - 0.025, dr, dr + 0.025, dr + 0.05]
-        sensitivity_results = []
         
-        for rate in sensitivity_rates:
-            npv_buy_sens = calculate_npv(rate, buy_cf_scenario)
-            npv_lease_sens = calculate_npv(rate, lease_cf_scenario)
-            nal_sens = npv_buy_sens - npv_lease_sens
-            
-            sensitivity_results.append({
-                "Discount Rate": f"{rate*100:.1f}%",
-                "NPV Buy": npv_buy_sens,
-                "NPV Lease": npv_lease_sens,
-                "NAL": nal_sens,
-                "Recommendation": "Lease" if nal_sens > 0 else "Buy"
-            })
-        
-        sensitivity_df = pd.DataFrame(sensitivity_results)
-        st.dataframe(
+        # One broadcasted pass: rows are rates, columns are (buy, lease)
+        sensitivity_npvs = npv_grid(sensitivity_rates, [buy_cf_scenario, lease_cf_scenario])
+        sensitivity_nal = sensitivity_npvs[:, 0] - sensitivity_npvs[:, 1]
+        
+        sensitivity_df = pd.DataFrame({
+            "Discount Rate": [f"{rate*100:.1f}%" for rate in sensitivity_rates],
+            "NPV Buy": sensitivity_npvs[:, 0],
+            "NPV Lease": sensitivity_npvs[:, 1],
+            "NAL": sensitivity_nal,
+            "Recommendation": ["Lease" if nal_sens > 0 else "Buy" for nal_sens in sensitivity_nal]
+        })
+        show_dataframe(
             sensitivity_df.style.format({
                 "NPV Buy": "₨{:,.2f}M",
                 "NPV Lease": "₨{:,.2f}M",
@@ -1735,6 +1667,16 @@ with tab4:
             width='stretch'
         )
         
+        render_sensitivity_surface(params, "scenario")
+        
+        render_tornado(params, "scenario")
+        
+        lap("tab4.monte_carlo")
+        # Monte Carlo Simulation
+        st.markdown("---")
+        render_monte_carlo(params, "scenario")
+        
+        lap("tab4.report")
         # Download scenario report
         st.markdown("---")
         scenario_report = pd.DataFrame([{
@@ -1749,40 +1691,40 @@ with tab4:
             "Tax Rate": f"{tr*100}%"
         }])
         
-        scenario_buffer = io.BytesIO()
-        with pd.ExcelWriter(scenario_buffer, engine="xlsxwriter") as writer:
-            scenario_report.to_excel(writer, index=False, sheet_name="Scenario Analysis")
-            sensitivity_df.to_excel(writer, index=False, sheet_name="Sensitivity Analysis")
-            cf_chart_scenario.to_excel(writer, sheet_name="Cash Flows")
-        
-        st.download_button(
-            label=f"⬇️ Download {scenario_choice} Analysis Report",
-            data=scenario_buffer.getvalue(),
-            file_name=f"Fauji_Foods_{scenario_choice.replace(' ', '_')}_Analysis.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        excel_download(
+            f"⬇️ Download {scenario_choice} Analysis Report",
+            (
+                ("Scenario Analysis", scenario_report, False),
+                ("Sensitivity Analysis", sensitivity_df, False),
+                ("Cash Flows", cf_chart_scenario, True)
+            ),
+            f"Fauji_Foods_{scenario_choice.replace(' ', '_')}_Analysis.xlsx"
         )
 
+with tab4:
+    predefined_scenarios_tab()
+
 # ==============================
 # FINAL REPORT DOWNLOAD
 # ==============================
-st.markdown("---")
-st.subheader("📄 Final Report")
+@st.fragment
+@timed("final_report")
+def final_report():
+    st.markdown("---")
+    st.subheader("📄 Final Report")
 
-report_df = pd.concat([
-    historic_df.assign(Section="Historical Financials"),
-    impact_df.assign(Section="Financial Impact")
-])
+    report_df = pd.concat([
+        historic_df.assign(Section="Historical Financials"),
+        impact_df.assign(Section="Financial Impact")
+    ])
 
-buffer = io.BytesIO()
-with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
-    report_df.to_excel(writer, index=False, sheet_name="Lease vs Buy Report")
+    excel_download(
+        "⬇️ Download Final Report (Excel)",
+        (("Lease vs Buy Report", report_df, False),),
+        "Fauji_Foods_Lease_vs_Buy_Report.xlsx"
+    )
 
-st.download_button(
-    label="⬇️ Download Final Report (Excel)",
-    data=buffer.getvalue(),
-    file_name="Fauji_Foods_Lease_vs_Buy_Report.xlsx",
-    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-)
+final_report()
 
 # ==============================
 # FOOTER
@@ -1790,3 +1732,10 @@ st.download_button(
 st.caption(
     f"Generated on {datetime.now().strftime('%d %B %Y')} | Strategic Finance Project – Fauji Foods Limited"
 )
+
+# ==============================
+# DIAGNOSTICS
+# ==============================
+rerun_record = finish_run(diagnostics_run)
+with st.sidebar.expander("⏱️ Diagnostics"):
+    render_diagnostics(rerun_record)
@@ -0,0 +1,86 @@
+import asyncio
+import http.client
+import json
+import threading
+
+import pytest
+
+from benchmarks.cases import SIDEBAR_PARAMS
+from engine.api import INLINE_ROWS, ApiServer
+
+
+@pytest.fixture(scope="module")
+def server():
+    """An API server on a free port, with small chunks so batches span several."""
+    api = ApiServer(workers=2, chunk_size=100)
+    started = threading.Event()
+    address = {}
+
+    def ready(s):
+        address["port"] = s.sockets[0].getsockname()[1]
+        started.set()
+
+    threading.Thread(target=lambda: asyncio.run(api.serve("127.0.0.1", 0, ready)), daemon=True).start()
+    assert started.wait(30)
+    return address["port"]
+
+
+def post(port, path, body, headers=None):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    connection.request("POST", path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    return response.status, response.read()
+
+
+@pytest.mark.parametrize("rows", [250, INLINE_ROWS + 350])  # inline and pooled
+def test_batch_rows_follow_input_order(server, rows):
+    deals = [dict(SIDEBAR_PARAMS, lease_payment=10 + i % 20, deal_id=i) for i in range(rows)]
+    status, body = post(server, "/batch?id=deal_id", json.dumps(deals))
+    assert status == 200
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line["row"] for line in lines] == list(range(rows))
+    assert [line["deal_id"] for line in lines] == list(range(rows))
+
+
+def test_batch_ndjson_rows_follow_input_order(server):
+    deals = [dict(SIDEBAR_PARAMS, lease_payment=10 + i % 20) for i in range(250)]
+    status, body = post(server, "/batch", "\n".join(map(json.dumps, deals)),
+                        {"Content-Type": "application/x-ndjson"})
+    assert status == 200
+    assert [json.loads(line)["row"] for line in body.decode().splitlines()] == list(range(250))
+
+
+@pytest.mark.parametrize("field", ["interest_rate", "down_payment", "balloon"])
+def test_non_numeric_optional_param_is_rejected(server, field):
+    deal = {**SIDEBAR_PARAMS, "down_payment": 10.0, "interest_rate": 12.0, field: "abc"}
+    status, body = post(server, "/deal", json.dumps(deal))
+    assert status == 400 and field in json.loads(body)["error"]
+    status, body = post(server, "/batch", json.dumps([deal]))
+    line = json.loads(body)
+    assert line["nal"] is None and field in line["error"]
+
+
+@pytest.mark.parametrize("rows", [3, 2000])  # parsed on the event loop and in a worker
+def test_batch_ids_keep_their_type(server, rows):
+    deals = [dict(SIDEBAR_PARAMS, deal_id=i) for i in range(rows)] + ["junk"]
+    status, body = post(server, "/batch?id=deal_id", json.dumps(deals))
+    assert status == 200
+    lines = [json.loads(line) for line in body.decode().splitlines()]
+    assert [line["deal_id"] for line in lines] == list(range(rows)) + [None]
+    assert all(isinstance(line["deal_id"], int) for line in lines[:-1])
+    assert lines[-1]["error"] == "not a JSON object"
+
+
+def test_batch_rejects_a_large_body_that_is_not_a_list(server):
+    status, body = post(server, "/batch", json.dumps({"deals": "x" * 200_000}))
+    assert status == 400 and "expected a JSON list" in json.loads(body)["error"]
+
+
+def test_loan_terms_without_an_interest_rate_are_rejected(server):
+    deal = {key: value for key, value in SIDEBAR_PARAMS.items() if key != "interest_rate"}
+    deal["down_payment"] = 10.0
+    status, body = post(server, "/deal", json.dumps(deal))
+    assert status == 400 and "interest_rate" in json.loads(body)["error"]
+    status, body = post(server, "/batch", json.dumps([deal]))
+    line = json.loads(body)
+    assert line["nal"] is None and "interest_rate" in line["error"]